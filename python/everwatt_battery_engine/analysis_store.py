@@ -0,0 +1,423 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .battery_catalog import BatteryCatalog
+from .bundles import CandidateTargets, bundles_for_targets, candidate_targets
+from .evaluation import DispatchSummary, build_site_context, evaluate_dispatch, scenario_applies, scenarios_for_rate
+from .intervals import aggregate_to_demand_interval
+from .parallel import DispatchPool, DispatchTask, resolve_worker_count
+from .pricing import make_offer_arrays, make_offers_batch, rank_offer_arrays
+from .tariffs.base import RatePlan
+from .types import BatterySKU, Bundle, OptimizationConfig, OptimizationResult
+
+# OptimizationConfig fields that only change capex and offers, never dispatch.
+PRICING_FIELDS = (
+    "payback_ceiling_years",
+    "price_grid_points",
+    "engine_price_golden_section",
+    "install_adder_frac",
+    "fixed_soft_costs_usd",
+    "close_prob_mid_payback_years",
+    "close_prob_steepness",
+)
+DISPATCH_FIELDS = tuple(f.name for f in fields(OptimizationConfig) if f.name not in PRICING_FIELDS)
+
+
+def changed_dispatch_fields(a: OptimizationConfig, b: OptimizationConfig) -> List[str]:
+    """
+    The DISPATCH_FIELDS on which two configs differ; dispatch outcomes only carry over when empty.
+    """
+    return [name for name in DISPATCH_FIELDS if getattr(a, name) != getattr(b, name)]
+
+
+@dataclass(frozen=True)
+class DispatchSignature:
+    """
+    Everything dispatch depends on for one bundle under one scenario. Prices are not part of it.
+    """
+
+    scenario_id: str
+    total_power_kw: float
+    total_energy_kwh: float
+    round_trip_efficiency: float
+    discharge_throughput_limit_kwh: float | None
+
+
+@dataclass(frozen=True)
+class DispatchOutcome:
+    signature: DispatchSignature
+    savings_usd_per_year: float
+    optimized_bill_usd_per_year: float
+    peak_kw_after: float
+    solver_status: str
+
+
+@dataclass(frozen=True)
+class SiteAnalysis:
+    """
+    Price-independent result of analyzing one site: the sizing targets, every candidate bundle, the
+    dispatch outcome of each distinct signature, and the (bundle, outcome) pairs in canonical task
+    order. Bundle capex reflects the catalog prices at analysis time; reprice_site recomputes it.
+    dispatch_cfg is the config the outcomes were dispatched under (only its DISPATCH_FIELDS are
+    stored); None for analyses stored before it was recorded.
+    """
+
+    site_id: str
+    tariff_rate_code: str
+    baseline_bill_usd_per_year: Dict[str, float]
+    peak_kw_before: Dict[str, float]
+    targets: CandidateTargets
+    variations_per_cap: int
+    option_s_min_kw: float
+    bundles: List[Bundle]
+    outcomes: List[DispatchOutcome]
+    tasks: List[Tuple[int, int]]  # (bundle index, outcome index)
+    dispatch_cfg: OptimizationConfig | None = None
+
+
+def bundle_signature(bundle: Bundle, scenario_id: str) -> DispatchSignature:
+    return DispatchSignature(
+        scenario_id=scenario_id,
+        total_power_kw=float(bundle.total_power_kw),
+        total_energy_kwh=float(bundle.total_energy_kwh),
+        round_trip_efficiency=float(bundle.round_trip_efficiency),
+        discharge_throughput_limit_kwh=(
+            float(bundle.discharge_throughput_limit_kwh) if bundle.discharge_throughput_limit_kwh is not None else None
+        ),
+    )
+
+
+def analyze_site_dispatch(
+    df: pd.DataFrame,
+    interval_hours: float,
+    *,
+    skus: Sequence[BatterySKU],
+    site_id: str = "",
+    tariff_rate_code: str = "B-19",
+    cfg: OptimizationConfig | None = None,
+    candidate_caps: int = 15,
+    variations_per_cap: int = 8,
+    workers: int = 1,
+    rate_plans: Dict[str, RatePlan] | None = None,
+) -> SiteAnalysis:
+    """
+    Solve the dispatch LP once per distinct signature for every candidate bundle x scenario.
+
+    No pruning: which tasks reach the top N depends on prices, and the analysis must stay valid
+    for any later price list. Bundles that share a signature share one solve.
+    """
+    cfg = cfg or OptimizationConfig()
+    h = float(interval_hours)
+    if cfg.demand_interval_minutes is not None:
+        agg = aggregate_to_demand_interval(df, h, cfg.demand_interval_minutes)
+        if agg is not None:
+            df, h = agg.df, agg.interval_hours
+    skus = [s for s in skus if s.active]
+    skus_by_id = {s.id: s for s in skus}
+    scenarios = scenarios_for_rate(tariff_rate_code)
+    targets = candidate_targets(df, h, caps=candidate_caps)
+    bundles = bundles_for_targets(
+        targets,
+        skus,
+        variations_per_cap=variations_per_cap,
+        max_units=200,
+        skus_by_id=skus_by_id,
+        install_adder_frac=cfg.install_adder_frac,
+        fixed_soft_costs_usd=cfg.fixed_soft_costs_usd,
+    )
+    ctx = build_site_context(df, h, scenarios, cfg, rate_plans=rate_plans)
+
+    sig_index: Dict[DispatchSignature, int] = {}
+    solve: List[DispatchTask] = []
+    tasks: List[Tuple[int, int]] = []
+    for bi, bundle in enumerate(bundles):
+        for sc in scenarios:
+            if not scenario_applies(ctx, bundle, sc):
+                continue
+            sig = bundle_signature(bundle, sc.id)
+            if sig not in sig_index:
+                sig_index[sig] = len(solve)
+                solve.append((bi, bundle, sc))
+            tasks.append((bi, sig_index[sig]))
+
+    def outcome(sig: DispatchSignature, s: DispatchSummary) -> DispatchOutcome:
+        # Scalars only: series are dropped as each summary arrives.
+        return DispatchOutcome(
+            signature=sig,
+            savings_usd_per_year=float(s.savings_usd_per_year),
+            optimized_bill_usd_per_year=float(s.optimized_bill_usd_per_year),
+            peak_kw_after=float(s.peak_kw_after),
+            solver_status=s.solver_status,
+        )
+
+    signatures = list(sig_index)
+    n_workers = resolve_worker_count(workers)
+    if n_workers > 1 and len(solve) > 1:
+        with DispatchPool(df=df, interval_hours=h, scenarios=scenarios, cfg=cfg, workers=n_workers) as pool:
+            outcomes = [outcome(sig, s) for sig, s in zip(signatures, pool.map(solve))]
+    else:
+        outcomes = [
+            outcome(sig, evaluate_dispatch(ctx, bi, b, sc, series=False)) for sig, (bi, b, sc) in zip(signatures, solve)
+        ]
+    return SiteAnalysis(
+        site_id=site_id,
+        tariff_rate_code=tariff_rate_code,
+        baseline_bill_usd_per_year={k: float(v) for k, v in ctx.baseline_bill_usd_per_year.items()},
+        peak_kw_before={k: float(v) for k, v in ctx.baseline_peak_kw.items()},
+        targets=targets,
+        variations_per_cap=int(variations_per_cap),
+        option_s_min_kw=float(ctx.option_s_min_kw),
+        bundles=bundles,
+        outcomes=outcomes,
+        tasks=tasks,
+        dispatch_cfg=cfg,
+    )
+
+
+@dataclass(frozen=True)
+class RepricedSite:
+    """
+    reprice_site output. candidate_tasks counts the bundle x scenario tasks the new price list's
+    candidate generation proposes; covered_tasks how many of them have a stored dispatch outcome.
+    """
+
+    results: List[OptimizationResult]
+    candidate_tasks: int
+    covered_tasks: int
+
+    @property
+    def coverage(self) -> float:
+        return float(self.covered_tasks / self.candidate_tasks) if self.candidate_tasks else 1.0
+
+
+def _priceable(bundle: Bundle, catalog: BatteryCatalog) -> bool:
+    return all(k in catalog.by_id and catalog.by_id[k].active for k in bundle.sku_qty)
+
+
+def reprice_site(
+    analysis: SiteAnalysis,
+    catalog: BatteryCatalog,
+    *,
+    cfg: OptimizationConfig | None = None,
+    top_n: int = 10,
+) -> RepricedSite:
+    """
+    Top N for a stored analysis under a (new) catalog price list, without any solver call.
+
+    - Candidates are regenerated from the stored sizing targets with the new prices (SKU choice
+      is price-driven), then the stored bundles are appended; a candidate is kept for every scenario
+      whose dispatch signature is stored. Regenerated tasks without a stored outcome are reported
+      via coverage; a full rerun is needed to evaluate those.
+    - Capex is recomputed from the catalog's tier prices and cfg's adders; offers and ranking follow
+      the orchestrator. Bundles using a SKU that is missing or inactive in the catalog are dropped.
+    - cfg defaults to the analysis's dispatch config with default pricing; a cfg that differs from
+      it on any DISPATCH_FIELDS raises ValueError (the stored outcomes would not apply).
+    Results carry no dispatch series.
+    """
+    if cfg is None:
+        cfg = analysis.dispatch_cfg or OptimizationConfig()
+    elif analysis.dispatch_cfg is not None:
+        changed = changed_dispatch_fields(analysis.dispatch_cfg, cfg)
+        if changed:
+            raise ValueError(
+                f"cfg changes {', '.join(map(repr, changed))}, which the stored dispatch outcomes depend on; "
+                "re-run the analysis instead"
+            )
+    top_n = int(top_n)
+    regenerated = bundles_for_targets(
+        analysis.targets,
+        catalog.active,
+        variations_per_cap=analysis.variations_per_cap,
+        max_units=200,
+        skus_by_id=catalog.by_id,
+    )
+    seen = {tuple(sorted(b.sku_qty.items())) for b in regenerated}
+    extras = [
+        b for b in analysis.bundles if tuple(sorted(b.sku_qty.items())) not in seen and _priceable(b, catalog)
+    ]
+    candidates = regenerated + extras
+
+    outcome_index = {o.signature: k for k, o in enumerate(analysis.outcomes)}
+    scenarios = scenarios_for_rate(analysis.tariff_rate_code)
+    tasks: List[Tuple[int, int]] = []
+    candidate_tasks = 0
+    covered = 0
+    for ci, bundle in enumerate(candidates):
+        if bundle.total_power_kw <= 0 or bundle.total_energy_kwh <= 0:
+            continue
+        for sc in scenarios:
+            if sc.kind == "pge_option_s" and bundle.total_power_kw < analysis.option_s_min_kw:
+                continue
+            oi = outcome_index.get(bundle_signature(bundle, sc.id))
+            if ci < len(regenerated):
+                candidate_tasks += 1
+                covered += int(oi is not None)
+            if oi is not None:
+                tasks.append((ci, oi))
+    if not tasks or top_n <= 0:
+        return RepricedSite(results=[], candidate_tasks=candidate_tasks, covered_tasks=covered)
+
+    qty = catalog.qty_matrix([b.sku_qty for b in candidates])
+    equipment = catalog.equipment_cost(qty).astype(float)
+    capex_by_bundle = equipment * (1.0 + float(cfg.install_adder_frac)) + float(cfg.fixed_soft_costs_usd)
+    units_by_bundle = qty.sum(axis=1).astype(float)
+    c_idx = np.array([ci for ci, _oi in tasks], dtype=int)
+    o_idx = np.array([oi for _ci, oi in tasks], dtype=int)
+
+    savings = np.array([o.savings_usd_per_year for o in analysis.outcomes], dtype=float)[o_idx]
+    sellable, offers = make_offer_arrays(
+        capex_usd=capex_by_bundle[c_idx],
+        savings_usd_per_year=savings,
+        sku_unit_count=units_by_bundle[c_idx],
+        payback_ceiling_years=cfg.payback_ceiling_years,
+        close_prob_mid_payback_years=cfg.close_prob_mid_payback_years,
+        close_prob_steepness=cfg.close_prob_steepness,
+        price_grid_points=cfg.price_grid_points,
+        golden_section=cfg.engine_price_golden_section,
+    )
+    order, ok = rank_offer_arrays(sellable, offers, top_n)
+
+    scenario_by_id = {sc.id: sc for sc in scenarios}
+    picked = order[ok].tolist()
+    # Offers for the reported results, priced in one batch (the arrays above only rank)
+    offers_by_result = make_offers_batch(
+        capex_usd=capex_by_bundle[c_idx[picked]],
+        savings_usd_per_year=savings[picked],
+        sku_unit_count=units_by_bundle[c_idx[picked]],
+        cfg=cfg,
+    )
+    results: List[OptimizationResult] = []
+    for k, offers_k in zip(picked, offers_by_result):
+        ci = int(c_idx[k])
+        outcome = analysis.outcomes[int(o_idx[k])]
+        sc_id = outcome.signature.scenario_id
+        bundle = replace(candidates[ci], capex_usd=float(capex_by_bundle[ci]))
+        results.append(
+            OptimizationResult(
+                scenario=scenario_by_id[sc_id],
+                bundle=bundle,
+                baseline_bill_usd_per_year=float(analysis.baseline_bill_usd_per_year.get(sc_id, 0.0)),
+                optimized_bill_usd_per_year=outcome.optimized_bill_usd_per_year,
+                savings_usd_per_year=outcome.savings_usd_per_year,
+                peak_kw_before=float(analysis.peak_kw_before.get(sc_id, 0.0)),
+                peak_kw_after=outcome.peak_kw_after,
+                offers=offers_k,
+                solver_status=outcome.solver_status,
+            )
+        )
+    return RepricedSite(results=results, candidate_tasks=candidate_tasks, covered_tasks=covered)
+
+
+def site_analysis_to_dict(analysis: SiteAnalysis) -> Dict[str, Any]:
+    return {
+        "siteId": analysis.site_id,
+        "tariffRateCode": analysis.tariff_rate_code,
+        "baselineBillUsdPerYear": dict(analysis.baseline_bill_usd_per_year),
+        "peakKwBefore": dict(analysis.peak_kw_before),
+        "targets": {
+            "powerKw": list(analysis.targets.power_kw),
+            "energyKwh": list(analysis.targets.energy_kwh),
+            "dayCount": analysis.targets.day_count,
+        },
+        "variationsPerCap": analysis.variations_per_cap,
+        "optionSMinKw": analysis.option_s_min_kw,
+        "bundles": [
+            {
+                "skuQty": dict(b.sku_qty),
+                "totalPowerKw": b.total_power_kw,
+                "totalEnergyKwh": b.total_energy_kwh,
+                "capexUsd": b.capex_usd,
+                "roundTripEfficiency": b.round_trip_efficiency,
+                "dischargeThroughputLimitKwh": b.discharge_throughput_limit_kwh,
+            }
+            for b in analysis.bundles
+        ],
+        "outcomes": [
+            {
+                "scenarioId": o.signature.scenario_id,
+                "totalPowerKw": o.signature.total_power_kw,
+                "totalEnergyKwh": o.signature.total_energy_kwh,
+                "roundTripEfficiency": o.signature.round_trip_efficiency,
+                "dischargeThroughputLimitKwh": o.signature.discharge_throughput_limit_kwh,
+                "savingsUsdPerYear": o.savings_usd_per_year,
+                "optimizedBillUsdPerYear": o.optimized_bill_usd_per_year,
+                "peakKwAfter": o.peak_kw_after,
+                "solverStatus": o.solver_status,
+            }
+            for o in analysis.outcomes
+        ],
+        "tasks": [[bi, oi] for bi, oi in analysis.tasks],
+        "dispatchConfig": (
+            {_camel(name): getattr(analysis.dispatch_cfg, name) for name in DISPATCH_FIELDS}
+            if analysis.dispatch_cfg is not None
+            else None
+        ),
+    }
+
+
+def _camel(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(w.capitalize() for w in rest)
+
+
+def _opt_float(v: Any) -> float | None:
+    return float(v) if v is not None else None
+
+
+def site_analysis_from_dict(d: Dict[str, Any]) -> SiteAnalysis:
+    targets: Dict[str, Any] = d.get("targets") or {}
+    stored_cfg: Dict[str, Any] | None = d.get("dispatchConfig")
+    return SiteAnalysis(
+        site_id=str(d["siteId"]),
+        tariff_rate_code=str(d.get("tariffRateCode") or "B-19"),
+        baseline_bill_usd_per_year={str(k): float(v) for k, v in d.get("baselineBillUsdPerYear", {}).items()},
+        peak_kw_before={str(k): float(v) for k, v in d.get("peakKwBefore", {}).items()},
+        targets=CandidateTargets(
+            power_kw=[float(v) for v in targets.get("powerKw", [])],
+            energy_kwh=[float(v) for v in targets.get("energyKwh", [])],
+            day_count=int(targets.get("dayCount", 0)),
+        ),
+        variations_per_cap=int(d.get("variationsPerCap", 8)),
+        option_s_min_kw=float(d.get("optionSMinKw", 0.0)),
+        bundles=[
+            Bundle(
+                sku_qty={str(k): int(v) for k, v in b["skuQty"].items()},
+                total_power_kw=float(b["totalPowerKw"]),
+                total_energy_kwh=float(b["totalEnergyKwh"]),
+                capex_usd=float(b.get("capexUsd", 0.0)),
+                round_trip_efficiency=float(b["roundTripEfficiency"]),
+                discharge_throughput_limit_kwh=_opt_float(b.get("dischargeThroughputLimitKwh")),
+            )
+            for b in d.get("bundles", [])
+        ],
+        outcomes=[
+            DispatchOutcome(
+                signature=DispatchSignature(
+                    scenario_id=str(o["scenarioId"]),
+                    total_power_kw=float(o["totalPowerKw"]),
+                    total_energy_kwh=float(o["totalEnergyKwh"]),
+                    round_trip_efficiency=float(o["roundTripEfficiency"]),
+                    discharge_throughput_limit_kwh=_opt_float(o.get("dischargeThroughputLimitKwh")),
+                ),
+                savings_usd_per_year=float(o["savingsUsdPerYear"]),
+                optimized_bill_usd_per_year=float(o["optimizedBillUsdPerYear"]),
+                peak_kw_after=float(o["peakKwAfter"]),
+                solver_status=str(o.get("solverStatus") or ""),
+            )
+            for o in d.get("outcomes", [])
+        ],
+        tasks=[(int(bi), int(oi)) for bi, oi in d.get("tasks", [])],
+        dispatch_cfg=(
+            OptimizationConfig(
+                **{name: stored_cfg[_camel(name)] for name in DISPATCH_FIELDS if _camel(name) in stored_cfg}
+            )
+            if stored_cfg is not None
+            else None
+        ),
+    )
+
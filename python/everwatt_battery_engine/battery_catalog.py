@@ -1,23 +1,32 @@
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import threading
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Sequence, Tuple
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
 
+import numpy as np
 import pandas as pd
 
 from .types import BatterySKU
 
+# Upper unit count of each volume price tier; quantities above the last bound use the 50+ price.
+PRICE_TIER_MAX_QTY = (10, 20, 50)
+
+
+def _yn(v: object) -> bool:
+    s = str(v).strip().lower()
+    return s in ("yes", "true", "1", "y")
+
 
 def load_battery_catalog_csv(path: str) -> List[BatterySKU]:
     df = pd.read_csv(path)
     skus: List[BatterySKU] = []
 
-    def yn(v: object) -> bool:
-        s = str(v).strip().lower()
-        return s in ("yes", "true", "1", "y")
-
     for row in df.to_dict(orient="records"):
-        active = yn(row.get("Active", "Yes"))
+        active = _yn(row.get("Active", "Yes"))
         sku = BatterySKU(
             id=str(row.get("Model Name")),
             manufacturer=str(row.get("Manufacturer")),
@@ -54,3 +63,151 @@ def equipment_cost_for_bundle(skus_by_id: Dict[str, BatterySKU], sku_qty: Dict[s
         cost += float(qty) * price_per_unit(sku, int(qty))
     return float(cost)
 
+
+def load_battery_catalog_json(path: str) -> List[BatterySKU]:
+    """
+    Battery library JSON (data/library/batteries.json): a list of camelCase records, or
+    {"batteries": [...]}. efficiency is a 0..1 fraction (values above 1 are read as percent).
+    """
+    with open(path, "r", encoding="utf-8-sig") as fh:
+        raw: Any = json.load(fh)
+    rows: List[Dict[str, Any]] = raw.get("batteries", []) if isinstance(raw, dict) else list(raw)
+
+    skus: List[BatterySKU] = []
+    for row in rows:
+        eff = float(row.get("efficiency", 0.0))
+        skus.append(
+            BatterySKU(
+                id=str(row.get("modelName")),
+                manufacturer=str(row.get("manufacturer")),
+                energy_kwh=float(row.get("capacityKwh")),
+                power_kw=float(row.get("powerKw")),
+                c_rate=float(row.get("cRate")),
+                round_trip_efficiency=eff / 100.0 if eff > 1.0 else eff,
+                warranty_years=float(row.get("warrantyYears")),
+                max_cycles_per_day=None,
+                price_1_10=float(row.get("price1_10")),
+                price_11_20=float(row.get("price11_20")),
+                price_21_50=float(row.get("price21_50")),
+                price_50_plus=float(row.get("price50Plus")),
+                active=_yn(row.get("active", True)),
+            )
+        )
+    return skus
+
+
+@dataclass(frozen=True)
+class BatteryCatalog:
+    """
+    Parsed catalog plus per-SKU derived arrays, aligned with skus (file order, inactive included).
+
+    - price_tiers_usd: (n, 4) unit price for 1-10 / 11-20 / 21-50 / 50+ units
+    - usd_per_kw / usd_per_kwh: tier prices per continuous kW / per nameplate kWh
+    Shared by every caller of load_battery_catalog, so the arrays are marked read-only.
+    """
+
+    path: str
+    digest: str
+    skus: List[BatterySKU]
+    active: List[BatterySKU]
+    by_id: Dict[str, BatterySKU]
+    index: Dict[str, int]
+    energy_kwh: np.ndarray
+    power_kw: np.ndarray
+    continuous_kw: np.ndarray
+    round_trip_efficiency: np.ndarray
+    active_mask: np.ndarray
+    price_tiers_usd: np.ndarray
+    usd_per_kw: np.ndarray
+    usd_per_kwh: np.ndarray
+
+    @classmethod
+    def from_skus(cls, skus: Sequence[BatterySKU], *, path: str = "", digest: str = "") -> "BatteryCatalog":
+        skus = list(skus)
+        energy = np.array([s.energy_kwh for s in skus], dtype=float)
+        cont = np.array([s.max_continuous_power_kw() for s in skus], dtype=float)
+        tiers = np.array([[s.price_1_10, s.price_11_20, s.price_21_50, s.price_50_plus] for s in skus], dtype=float)
+        tiers = tiers.reshape(len(skus), 4)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            per_kw = np.where(cont[:, None] > 0, tiers / cont[:, None], np.inf)
+            per_kwh = np.where(energy[:, None] > 0, tiers / energy[:, None], np.inf)
+        arrays = dict(
+            energy_kwh=energy,
+            power_kw=np.array([s.power_kw for s in skus], dtype=float),
+            continuous_kw=cont,
+            round_trip_efficiency=np.array([s.round_trip_efficiency for s in skus], dtype=float),
+            active_mask=np.array([s.active for s in skus], dtype=bool),
+            price_tiers_usd=tiers,
+            usd_per_kw=per_kw,
+            usd_per_kwh=per_kwh,
+        )
+        # The cached catalog is shared process-wide: an in-place write would leak into every caller
+        for arr in arrays.values():
+            arr.flags.writeable = False
+        return cls(
+            path=path,
+            digest=digest,
+            skus=skus,
+            active=[s for s in skus if s.active],
+            by_id={s.id: s for s in skus},
+            index={s.id: k for k, s in enumerate(skus)},
+            **arrays,
+        )
+
+    def qty_matrix(self, sku_qtys: Sequence[Dict[str, int]]) -> np.ndarray:
+        """
+        (bundles, skus) unit counts for a list of bundle sku_qty dicts.
+        """
+        q = np.zeros((len(sku_qtys), len(self.skus)), dtype=np.int64)
+        for r, sku_qty in enumerate(sku_qtys):
+            for sku_id, qty in sku_qty.items():
+                q[r, self.index[sku_id]] = int(qty)
+        return q
+
+    def equipment_cost(self, qty: np.ndarray) -> np.ndarray:
+        """
+        Vectorized equipment_cost_for_bundle: qty has shape (..., n_skus); each SKU is priced at the
+        volume tier of its own unit count.
+        """
+        q = np.asarray(qty)
+        tier = np.searchsorted(np.array(PRICE_TIER_MAX_QTY), q, side="left")
+        unit_price = self.price_tiers_usd[np.arange(len(self.skus)), tier]
+        return np.sum(q * unit_price, axis=-1)
+
+
+# Per-process catalog cache: path -> ((mtime_ns, size), catalog)
+_CATALOG_CACHE: Dict[str, Tuple[Tuple[int, int], BatteryCatalog]] = {}
+_CATALOG_LOCK = threading.Lock()
+
+
+def load_battery_catalog(path: str) -> BatteryCatalog:
+    """
+    Cached catalog load (CSV, or battery library JSON by extension).
+
+    The file is parsed once per process. A changed mtime/size triggers a content hash; the file is
+    only re-parsed when the content actually changed.
+    """
+    key = os.path.abspath(path)
+    st = os.stat(key)
+    stamp = (int(st.st_mtime_ns), int(st.st_size))
+    with _CATALOG_LOCK:
+        hit = _CATALOG_CACHE.get(key)
+        if hit is not None and hit[0] == stamp:
+            return hit[1]
+        with open(key, "rb") as fh:
+            digest = hashlib.sha256(fh.read()).hexdigest()
+        if hit is not None and hit[1].digest == digest:
+            _CATALOG_CACHE[key] = (stamp, hit[1])
+            return hit[1]
+        if key.lower().endswith(".json"):
+            skus = load_battery_catalog_json(key)
+        else:
+            skus = load_battery_catalog_csv(key)
+        catalog = BatteryCatalog.from_skus(skus, path=key, digest=digest)
+        _CATALOG_CACHE[key] = (stamp, catalog)
+        return catalog
+
+
+def clear_battery_catalog_cache() -> None:
+    with _CATALOG_LOCK:
+        _CATALOG_CACHE.clear()
@@ -99,31 +99,32 @@ def _greedy_build(
     return qty
 
 
-def generate_candidate_bundles(
+@dataclass(frozen=True)
+class CandidateTargets:
+    """
+    Price-independent sizing targets behind the candidate bundles: one (power, worst-day energy)
+    need per cap, plus the horizon day count used for throughput limits.
+    """
+
+    power_kw: List[float]
+    energy_kwh: List[float]
+    day_count: int
+
+
+def candidate_targets(
     df_intervals: pd.DataFrame,
     interval_hours: float,
-    battery_skus: Sequence[BatterySKU],
     *,
     caps: int = 15,
-    variations_per_cap: int = 8,
     p_base_percentile: float = 0.5,
-    max_units: int = 200,
-    skus_by_id: Dict[str, BatterySKU] | None = None,
-    install_adder_frac: float = 0.0,
-    fixed_soft_costs_usd: float = 0.0,
-) -> List[Bundle]:
+) -> CandidateTargets:
     """
-    v1: deterministic candidate enumeration described in the PDF:
-    - choose cap targets between peak and baseline percentile
-    - for each cap compute target power and worst-day energy need
-    - map (P,E) to library via greedy recipes (power/energy/balanced) + small variants
+    Choose cap targets between peak and baseline percentile; for each, the power and worst-day
+    energy needed to hold the cap.
     """
-    if skus_by_id is None:
-        skus_by_id = {s.id: s for s in battery_skus}
-
     load = df_intervals["load_kw"].astype(float).to_numpy()
     if load.size == 0:
-        return []
+        return CandidateTargets(power_kw=[], energy_kwh=[], day_count=0)
 
     p_peak = float(np.max(load))
     p_base = float(np.quantile(load, p_base_percentile))
@@ -134,14 +135,10 @@ def generate_candidate_bundles(
     df = df_intervals.copy()
     df["day_key"] = df["day_key"].astype(str)
     days = df["day_key"].unique().tolist()
-    day_count = len(days)
-
-    bundles: Dict[Tuple[Tuple[str, int], ...], Bundle] = {}
 
+    power: List[float] = []
+    energy: List[float] = []
     for cap_kw in caps_kw:
-        # Required shave profile
-        exceed = np.maximum(0.0, load - float(cap_kw))
-
         # worst-day energy need
         e_need = 0.0
         for day, group in df.groupby("day_key"):
@@ -150,8 +147,31 @@ def generate_candidate_bundles(
             e_day = float(np.sum(dexceed) * float(interval_hours))
             e_need = max(e_need, e_day)
 
-        p_need = max(0.0, float(p_peak - cap_kw))
+        power.append(max(0.0, float(p_peak - cap_kw)))
+        energy.append(e_need)
+    return CandidateTargets(power_kw=power, energy_kwh=energy, day_count=len(days))
 
+
+def bundles_for_targets(
+    targets: CandidateTargets,
+    battery_skus: Sequence[BatterySKU],
+    *,
+    variations_per_cap: int = 8,
+    max_units: int = 200,
+    skus_by_id: Dict[str, BatterySKU] | None = None,
+    install_adder_frac: float = 0.0,
+    fixed_soft_costs_usd: float = 0.0,
+) -> List[Bundle]:
+    """
+    Map each (P,E) target to library bundles via greedy recipes (power/energy/balanced) + small
+    variants. SKU choice depends on catalog prices; the targets do not.
+    """
+    if skus_by_id is None:
+        skus_by_id = {s.id: s for s in battery_skus}
+
+    bundles: Dict[Tuple[Tuple[str, int], ...], Bundle] = {}
+
+    for p_need, e_need in zip(targets.power_kw, targets.energy_kwh):
         # Generate a few heuristics
         recipes = ["balanced", "power", "energy"]
         for recipe in recipes:
@@ -173,7 +193,7 @@ def generate_candidate_bundles(
                 rte = _energy_weighted_rte(items)
                 equipment_cost = equipment_cost_for_bundle(skus_by_id, qty2)
                 capex = float(equipment_cost * (1.0 + install_adder_frac) + fixed_soft_costs_usd)
-                throughput_limit = _throughput_limit_kwh(items, day_count)
+                throughput_limit = _throughput_limit_kwh(items, targets.day_count)
 
                 key = tuple(sorted(qty2.items()))
                 bundles[key] = Bundle(
@@ -190,3 +210,33 @@ def generate_candidate_bundles(
     out.sort(key=lambda b: (b.capex_usd, b.total_power_kw, b.total_energy_kwh))
     return out
 
+
+def generate_candidate_bundles(
+    df_intervals: pd.DataFrame,
+    interval_hours: float,
+    battery_skus: Sequence[BatterySKU],
+    *,
+    caps: int = 15,
+    variations_per_cap: int = 8,
+    p_base_percentile: float = 0.5,
+    max_units: int = 200,
+    skus_by_id: Dict[str, BatterySKU] | None = None,
+    install_adder_frac: float = 0.0,
+    fixed_soft_costs_usd: float = 0.0,
+) -> List[Bundle]:
+    """
+    v1: deterministic candidate enumeration described in the PDF:
+    - choose cap targets between peak and baseline percentile
+    - for each cap compute target power and worst-day energy need
+    - map (P,E) to library via greedy recipes (power/energy/balanced) + small variants
+    """
+    targets = candidate_targets(df_intervals, interval_hours, caps=caps, p_base_percentile=p_base_percentile)
+    return bundles_for_targets(
+        targets,
+        battery_skus,
+        variations_per_cap=variations_per_cap,
+        max_units=max_units,
+        skus_by_id=skus_by_id,
+        install_adder_frac=install_adder_frac,
+        fixed_soft_costs_usd=fixed_soft_costs_usd,
+    )
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
@@ -10,6 +10,12 @@ from ortools.linear_solver import pywraplp
 
 from .types import Bundle
 from .tariffs.base import DemandComponent, RatePlan, TariffInterval
+from .tariffs.bill import calculate_bill
+
+
+# coarsen=True: a block's baseline load may span at most this fraction of the discharge limit,
+# since constant charging is capped by the block's highest load
+COARSEN_MAX_SPREAD_FRAC = 0.1
 
 
 @dataclass(frozen=True)
@@ -26,6 +32,10 @@ class DispatchSolution:
     charge_kw_series: List[float]
     discharge_kw_series: List[float]
     soc_kwh_series: List[float]
+    # marginal_values=True only: bill reduction over the horizon per extra kW of bundle power /
+    # per extra kWh of bundle energy (LP sensitivities, valid for small changes)
+    marginal_bill_usd_per_kw: float | None = None
+    marginal_bill_usd_per_kwh: float | None = None
 
 
 def _split_efficiency(round_trip_efficiency: float) -> Tuple[float, float]:
@@ -34,6 +44,101 @@ def _split_efficiency(round_trip_efficiency: float) -> Tuple[float, float]:
     return eta, eta
 
 
+def _component_applies(intervals: Sequence[TariffInterval], rate_plan: RatePlan) -> List[List[bool]]:
+    return [[bool(c.applies(i)) for c in rate_plan.demand_components] for i in intervals]
+
+
+def _demand_groups(
+    intervals: Sequence[TariffInterval], rate_plan: RatePlan, applies: List[List[bool]]
+) -> Dict[Tuple[int, str], np.ndarray]:
+    """
+    Interval indices of every (component position, month/day key) demand group.
+    """
+    groups: Dict[Tuple[int, str], List[int]] = {}
+    for t, it in enumerate(intervals):
+        for ci, c in enumerate(rate_plan.demand_components):
+            if applies[t][ci]:
+                groups.setdefault((ci, it.month_key if c.kind == "monthlyMax" else it.day_key), []).append(t)
+    return {k: np.asarray(v, dtype=int) for k, v in groups.items()}
+
+
+def _reachable_peak_kw(base: np.ndarray, idx: np.ndarray, *, power_kw: float, energy_kwh: float, kwh_per_kw: float) -> float:
+    """
+    Lowest billed level a demand group (interval indices idx) could be shaved to: at most power_kw
+    below its peak, and within every run of consecutive group intervals above the level the battery
+    cannot recharge (that would itself exceed the level), so the run's excess energy must fit in E.
+    """
+    b = base[idx]
+    peak = float(b.max())
+    gap = np.concatenate([[True], np.diff(idx) != 1])
+
+    def fits(level: float) -> bool:
+        excess = np.maximum(0.0, b - level)
+        # A run starts after a gap in the group or after any interval at/below the level
+        run = np.cumsum(gap | np.concatenate([[True], excess[:-1] <= 0]))
+        return float(np.bincount(run, weights=excess).max()) * kwh_per_kw <= energy_kwh
+
+    lo, hi = peak - power_kw, peak
+    if fits(lo):
+        return lo
+    for _ in range(40):
+        mid = 0.5 * (lo + hi)
+        if fits(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
+def coarse_time_blocks(
+    intervals: Sequence[TariffInterval],
+    rate_plan: RatePlan,
+    *,
+    interval_hours: float,
+    power_kw: float,
+    energy_kwh: float,
+    discharge_efficiency: float = 1.0,
+    interval_weights: Sequence[float] | None = None,
+    max_spread_kw: float = float("inf"),
+) -> List[Tuple[int, int]]:
+    """
+    Multi-resolution horizon for optimize_bill_lp(coarsen=True): half-open [start, end) interval
+    runs, each solved as one LP step.
+
+    An interval stays at full resolution when it could set a demand peak, i.e. its baseline kW
+    reaches the lowest level any dispatch could shave one of its demand groups to (see
+    _reachable_peak_kw). The other intervals merge into contiguous runs sharing a day, weight,
+    energy rate and set of applicable demand components, so TOU price changes always fall on a
+    block edge; a block also closes once its baseline load spans more than max_spread_kw.
+    """
+    n = len(intervals)
+    w = [1.0] * n if interval_weights is None else [float(x) for x in interval_weights]
+    base = np.array([i.kW_base for i in intervals], dtype=float)
+    applies = _component_applies(intervals, rate_plan)
+    critical = np.zeros(n, dtype=bool)
+    kwh_per_kw = float(interval_hours) / max(1e-9, float(discharge_efficiency))
+    for idx in _demand_groups(intervals, rate_plan, applies).values():
+        level = _reachable_peak_kw(base, idx, power_kw=power_kw, energy_kwh=energy_kwh, kwh_per_kw=kwh_per_kw)
+        critical[idx[base[idx] >= level - 1e-6]] = True
+
+    signature = [
+        (it.day_key, w[t], float(rate_plan.energy_rate_per_kWh(it)), tuple(applies[t])) for t, it in enumerate(intervals)
+    ]
+
+    blocks: List[Tuple[int, int]] = []
+    start = 0
+    lo = hi = float(base[0]) if n else 0.0
+    for t in range(1, n + 1):
+        if t < n:
+            lo, hi = min(lo, float(base[t])), max(hi, float(base[t]))
+        if t == n or critical[t] or critical[t - 1] or signature[t] != signature[start] or hi - lo > max_spread_kw:
+            blocks.append((start, t))
+            start = t
+            if t < n:
+                lo = hi = float(base[t])
+    return blocks
+
+
 def optimize_bill_lp(
     intervals: Sequence[TariffInterval],
     bundle: Bundle,
@@ -44,6 +149,9 @@ def optimize_bill_lp(
     interconnect_kw: float | None = None,
     initial_soc_frac: float = 0.5,
     degradation_cost_usd_per_mwh: float = 0.0,
+    interval_weights: Sequence[float] | None = None,
+    marginal_values: bool = False,
+    coarsen: bool = False,
 ) -> DispatchSolution:
     """
     Deterministic dispatch LP:
@@ -60,6 +168,17 @@ def optimize_bill_lp(
     - no_export => dis[t] <= base_load[t]
     - interconnect_kw => dis[t] <= min(P_total, interconnect_kw)
     - throughput limit (cycle proxy) if bundle.discharge_throughput_limit_kwh is set
+    - interval_weights (reduced horizons, e.g. representative days): each interval's energy cost,
+      throughput and its day's dailyMax charge count w times; monthlyMax charges are unweighted, and
+      days with w != 1 get a cyclic SOC constraint (end-of-day SOC == start-of-day SOC)
+    - marginal_values => also report the bill's sensitivity to P and E from the optimal basis:
+      reduced costs of the ch/dis (power) and soc (energy) upper bounds, plus the initial-SOC
+      constraint's dual (soc0 scales with E)
+    - coarsen => multi-resolution horizon (see coarse_time_blocks): intervals that cannot set a
+      demand peak merge into blocks with one constant dispatch, constrained by the block's highest
+      load (demand) and lowest load (no export). Every coarse dispatch is feasible at full
+      resolution and the bill is computed per interval, so the result is an exact bill for a
+      (possibly slightly worse) dispatch: savings can only be understated.
     """
     if not intervals:
         return DispatchSolution(
@@ -79,40 +198,79 @@ def optimize_bill_lp(
 
     n = len(intervals)
     h = float(interval_hours)
+    w = np.ones(n, dtype=float) if interval_weights is None else np.asarray(interval_weights, dtype=float)
+    if w.shape != (n,):
+        raise ValueError("interval_weights must have one weight per interval")
+    day_weight: Dict[str, float] = {}
+    for t in range(n):
+        day_weight.setdefault(intervals[t].day_key, float(w[t]))
     P = float(bundle.total_power_kw)
     E = float(bundle.total_energy_kwh)
     eta_c, eta_d = _split_efficiency(bundle.round_trip_efficiency)
     dis_ub = float(min(P, interconnect_kw)) if interconnect_kw is not None else float(P)
 
+    # LP steps: one per interval, or multi-resolution blocks (dispatch is constant within a block)
+    base = np.array([i.kW_base for i in intervals], dtype=float)
+    energy_rate = [float(rate_plan.energy_rate_per_kWh(i)) for i in intervals]
+    if coarsen:
+        blocks = coarse_time_blocks(
+            intervals,
+            rate_plan,
+            interval_hours=h,
+            power_kw=dis_ub,
+            energy_kwh=E,
+            discharge_efficiency=eta_d,
+            interval_weights=w,
+            max_spread_kw=COARSEN_MAX_SPREAD_FRAC * dis_ub,
+        )
+    else:
+        blocks = [(t, t + 1) for t in range(n)]
+    m = len(blocks)
+    first = [intervals[a] for a, _b in blocks]
+    dur = [(b - a) * h for a, b in blocks]
+    # Constant dispatch must respect the block's highest load (demand) and lowest load (no export)
+    base_max = [float(base[a:b].max()) for a, b in blocks]
+    base_min = [float(base[a:b].min()) for a, b in blocks]
+    step_w = [float(w[a]) for a, _b in blocks]
+
     # LP solver
     solver = pywraplp.Solver.CreateSolver("GLOP")
     if solver is None:
         raise RuntimeError("OR-Tools GLOP solver not available")
 
     # Variables
-    ch = [solver.NumVar(0.0, P, f"ch_{t}") for t in range(n)]
-    dis = [solver.NumVar(0.0, dis_ub, f"dis_{t}") for t in range(n)]
-    # SOC boundaries length n+1 is simplest
-    soc = [solver.NumVar(0.0, E, f"soc_{t}") for t in range(n + 1)]
+    ch = [solver.NumVar(0.0, P, f"ch_{t}") for t in range(m)]
+    dis = [solver.NumVar(0.0, dis_ub, f"dis_{t}") for t in range(m)]
+    # SOC boundaries length m+1 is simplest
+    soc = [solver.NumVar(0.0, E, f"soc_{t}") for t in range(m + 1)]
 
     # Initial SOC
     soc0 = float(max(0.0, min(E, initial_soc_frac * E)))
-    solver.Add(soc[0] == soc0)
+    init_soc = solver.Add(soc[0] == soc0)
 
     # SOC dynamics
-    for t in range(n):
-        solver.Add(soc[t + 1] == soc[t] + (eta_c * ch[t] - (dis[t] / eta_d)) * h)
+    for t in range(m):
+        solver.Add(soc[t + 1] == soc[t] + (eta_c * ch[t] - (dis[t] / eta_d)) * dur[t])
+
+    # A day that stands for w != 1 calendar days repeats its own cycle, so it must end where it started
+    if interval_weights is not None:
+        start = 0
+        for t in range(1, m + 1):
+            if t == m or first[t].day_key != first[start].day_key:
+                if step_w[start] != 1.0:
+                    solver.Add(soc[t] == soc[start])
+                start = t
 
     # No export / physical guardrail
     if no_export:
-        for t in range(n):
-            solver.Add(dis[t] <= float(intervals[t].kW_base))
+        for t in range(m):
+            solver.Add(dis[t] <= base_min[t])
 
     # Throughput / cycle proxy
     if bundle.discharge_throughput_limit_kwh is not None:
         limit_kwh = float(bundle.discharge_throughput_limit_kwh)
         # Sum(dis[t] * h) <= limit_kwh
-        solver.Add(solver.Sum([dis[t] * h for t in range(n)]) <= limit_kwh)
+        solver.Add(solver.Sum([dis[t] * (dur[t] * step_w[t]) for t in range(m)]) <= limit_kwh)
 
     # Demand max variables
     monthly_dem: Dict[Tuple[str, str], pywraplp.Variable] = {}
@@ -121,34 +279,33 @@ def optimize_bill_lp(
     for comp in rate_plan.demand_components:
         if comp.kind == "monthlyMax":
             # group by month
-            for t in range(n):
-                it = intervals[t]
+            for t in range(m):
+                it = first[t]
                 if not comp.applies(it):
                     continue
                 key = (comp.name, it.month_key)
                 if key not in monthly_dem:
                     monthly_dem[key] = solver.NumVar(0.0, solver.infinity(), f"Dm_{comp.name}_{it.month_key}")
                 # net[t] <= D  => base + ch - dis <= D
-                solver.Add(it.kW_base + ch[t] - dis[t] <= monthly_dem[key])
+                solver.Add(base_max[t] + ch[t] - dis[t] <= monthly_dem[key])
         else:
-            for t in range(n):
-                it = intervals[t]
+            for t in range(m):
+                it = first[t]
                 if not comp.applies(it):
                     continue
                 key = (comp.name, it.day_key)
                 if key not in daily_dem:
                     daily_dem[key] = solver.NumVar(0.0, solver.infinity(), f"Dd_{comp.name}_{it.day_key}")
-                solver.Add(it.kW_base + ch[t] - dis[t] <= daily_dem[key])
+                solver.Add(base_max[t] + ch[t] - dis[t] <= daily_dem[key])
 
     # Objective: energy + demand + degradation proxy
     deg_per_kwh = float(degradation_cost_usd_per_mwh) / 1000.0
     obj = solver.Objective()
-    for t in range(n):
-        it = intervals[t]
-        er = float(rate_plan.energy_rate_per_kWh(it))
+    for t in range(m):
+        er = energy_rate[blocks[t][0]]
         # net energy term: base load constant ignored; we add (ch - dis) * h * er
-        obj.SetCoefficient(ch[t], er * h)
-        obj.SetCoefficient(dis[t], (-er + deg_per_kwh) * h)
+        obj.SetCoefficient(ch[t], er * dur[t] * step_w[t])
+        obj.SetCoefficient(dis[t], (-er + deg_per_kwh) * dur[t] * step_w[t])
 
     for (name, month), var in monthly_dem.items():
         # Find component rate (by name); safe linear scan (small list)
@@ -157,7 +314,7 @@ def optimize_bill_lp(
 
     for (name, day), var in daily_dem.items():
         rate = next(c.rate_per_kW for c in rate_plan.demand_components if c.kind == "dailyMax" and c.name == name)
-        obj.SetCoefficient(var, float(rate))
+        obj.SetCoefficient(var, float(rate) * day_weight[day])
 
     obj.SetMinimization()
 
@@ -169,16 +326,22 @@ def optimize_bill_lp(
     ch_s = np.array([v.solution_value() for v in ch], dtype=float)
     dis_s = np.array([v.solution_value() for v in dis], dtype=float)
     soc_s = np.array([v.solution_value() for v in soc], dtype=float)
-    net = np.array([intervals[t].kW_base for t in range(n)], dtype=float) + ch_s - dis_s
-
-    energy_charges = float(sum(rate_plan.energy_rate_per_kWh(intervals[t]) * net[t] * h for t in range(n)))
+    if coarsen:
+        # Back to per-interval series; SOC moves linearly within a block
+        step = np.repeat(np.arange(m), [b - a for a, b in blocks])
+        ch_s = ch_s[step]
+        dis_s = dis_s[step]
+        soc_s = np.concatenate([[soc_s[0]], soc_s[0] + np.cumsum((eta_c * ch_s - dis_s / eta_d) * h)])
+    net = base + ch_s - dis_s
+
+    energy_charges = float(sum(energy_rate[t] * net[t] * h * w[t] for t in range(n)))
     demand_charges = 0.0
     for (name, month), var in monthly_dem.items():
         rate = next(c.rate_per_kW for c in rate_plan.demand_components if c.kind == "monthlyMax" and c.name == name)
         demand_charges += float(var.solution_value() * rate)
     for (name, day), var in daily_dem.items():
         rate = next(c.rate_per_kW for c in rate_plan.demand_components if c.kind == "dailyMax" and c.name == name)
-        demand_charges += float(var.solution_value() * rate)
+        demand_charges += float(var.solution_value() * rate * day_weight[day])
 
     months = sorted({i.month_key for i in intervals})
     fixed = float(rate_plan.fixed_monthly_usd) * float(len(months))
@@ -190,7 +353,25 @@ def optimize_bill_lp(
         peak_monthly[it.month_key] = max(peak_monthly.get(it.month_key, 0.0), float(net[t]))
         peak_daily[it.day_key] = max(peak_daily.get(it.day_key, 0.0), float(net[t]))
 
-    throughput_mwh = float(np.sum(dis_s * h) / 1000.0)
+    throughput_mwh = float(np.sum(dis_s * h * w) / 1000.0)
+
+    mv_kw: float | None = None
+    mv_kwh: float | None = None
+    if marginal_values:
+        # d(bill)/d(upper bound) is the reduced cost of a variable sitting at its upper bound (< 0);
+        # positive reduced costs belong to variables at their lower bound (0) and do not move with
+        # P or E. Discharge only scales with P while the interconnect limit is not the tighter one.
+        def at_upper(vs: Sequence[pywraplp.Variable]) -> float:
+            return float(sum(min(0.0, v.reduced_cost()) for v in vs))
+
+        d_bill_d_p = at_upper(ch)
+        if interconnect_kw is None or P <= float(interconnect_kw):
+            d_bill_d_p += at_upper(dis)
+        d_bill_d_e = at_upper(soc)
+        if 0.0 < initial_soc_frac < 1.0:
+            d_bill_d_e += init_soc.dual_value() * float(initial_soc_frac)
+        mv_kw = float(max(0.0, -d_bill_d_p))
+        mv_kwh = float(max(0.0, -d_bill_d_e))
 
     return DispatchSolution(
         solver_status=status_str,
@@ -205,5 +386,145 @@ def optimize_bill_lp(
         charge_kw_series=ch_s.tolist(),
         discharge_kw_series=dis_s.tolist(),
         soc_kwh_series=soc_s.tolist(),
+        marginal_bill_usd_per_kw=mv_kw,
+        marginal_bill_usd_per_kwh=mv_kwh,
     )
 
+
+def optimize_bill_critical_windows(
+    intervals: Sequence[TariffInterval],
+    bundle: Bundle,
+    rate_plan: RatePlan,
+    *,
+    interval_hours: float,
+    no_export: bool = True,
+    interconnect_kw: float | None = None,
+    initial_soc_frac: float = 0.5,
+    degradation_cost_usd_per_mwh: float = 0.0,
+    interval_weights: Sequence[float] | None = None,
+    marginal_values: bool = False,
+    coarsen: bool = False,
+    recharge_hours: float = 12.0,
+    max_rounds: int = 10,
+) -> DispatchSolution:
+    """
+    Critical-window decomposition of optimize_bill_lp for demand-dominated tariffs.
+
+    1. Critical days: days holding an interval that reaches the lowest level any dispatch could
+       shave one of its demand groups to (power and energy limited, see _reachable_peak_kw).
+       dailyMax groups make every day they apply to critical.
+    2. The LP runs on the critical days plus the recharge_hours leading into each; the battery
+       idles everywhere else, carrying its SOC across.
+    3. Verification: on the full horizon, every demand group's maximum must be set inside the
+       windows. A day whose untouched load exceeds its group's dispatched maximum joins the windows
+       and the LP is re-solved (the full horizon is solved once windows cover it or max_rounds run out).
+
+    The result is an exact full-horizon bill for a feasible dispatch: demand charges match the full
+    LP whenever the peak windows are captured, but energy arbitrage outside the windows is forgone,
+    so savings can only be understated. Series cover the full horizon (zeros outside the windows).
+    """
+    n = len(intervals)
+    h = float(interval_hours)
+    full_kwargs = dict(
+        interval_hours=h,
+        no_export=no_export,
+        interconnect_kw=interconnect_kw,
+        initial_soc_frac=initial_soc_frac,
+        degradation_cost_usd_per_mwh=degradation_cost_usd_per_mwh,
+        marginal_values=marginal_values,
+        coarsen=coarsen,
+    )
+    if n == 0:
+        return optimize_bill_lp(intervals, bundle, rate_plan, interval_weights=interval_weights, **full_kwargs)
+    w = np.ones(n, dtype=float) if interval_weights is None else np.asarray(interval_weights, dtype=float)
+    _eta_c, eta_d = _split_efficiency(bundle.round_trip_efficiency)
+    P = float(bundle.total_power_kw)
+    dis_ub = float(min(P, interconnect_kw)) if interconnect_kw is not None else P
+    base = np.array([i.kW_base for i in intervals], dtype=float)
+    day_keys = [i.day_key for i in intervals]
+    day_pos = {d: k for k, d in enumerate(dict.fromkeys(day_keys))}
+    day_of = np.array([day_pos[d] for d in day_keys], dtype=int)
+    day_start = np.searchsorted(day_of, np.arange(len(day_pos)))
+    t_sec = np.array([(i.ts - intervals[0].ts).total_seconds() for i in intervals], dtype=float)
+
+    groups = _demand_groups(intervals, rate_plan, _component_applies(intervals, rate_plan))
+    critical_day = np.zeros(len(day_pos), dtype=bool)
+    for idx in groups.values():
+        level = _reachable_peak_kw(
+            base, idx, power_kw=dis_ub, energy_kwh=float(bundle.total_energy_kwh), kwh_per_kw=h / eta_d
+        )
+        critical_day[day_of[idx[base[idx] >= level - 1e-6]]] = True
+
+    for _round in range(int(max_rounds)):
+        window = critical_day[day_of]
+        for k in np.flatnonzero(critical_day):
+            s0 = int(day_start[k])
+            window[np.searchsorted(t_sec, t_sec[s0] - recharge_hours * 3600.0) : s0] = True
+        if window.all():
+            break
+        sel = np.flatnonzero(window)
+        sub = optimize_bill_lp(
+            [intervals[t] for t in sel],
+            bundle,
+            rate_plan,
+            interval_weights=w[sel] if interval_weights is not None else None,
+            **full_kwargs,
+        )
+        ch_s = np.zeros(n)
+        dis_s = np.zeros(n)
+        ch_s[sel] = sub.charge_kw_series
+        dis_s[sel] = sub.discharge_kw_series
+        net = base + ch_s - dis_s
+
+        missed: List[int] = []
+        for idx in groups.values():
+            inside = idx[critical_day[day_of[idx]]]
+            outside = idx[~critical_day[day_of[idx]]]
+            if outside.size == 0:
+                continue
+            ceiling = float(net[inside].max()) if inside.size else -np.inf
+            missed.extend(day_of[outside[net[outside] > ceiling + 1e-6]].tolist())
+        if not missed:
+            return _full_horizon_solution(intervals, rate_plan, sub, sel, net, ch_s, dis_s, h=h, w=w)
+        critical_day[np.asarray(missed, dtype=int)] = True
+
+    return optimize_bill_lp(intervals, bundle, rate_plan, interval_weights=interval_weights, **full_kwargs)
+
+
+def _full_horizon_solution(
+    intervals: Sequence[TariffInterval],
+    rate_plan: RatePlan,
+    sub: DispatchSolution,
+    sel: np.ndarray,
+    net: np.ndarray,
+    ch_s: np.ndarray,
+    dis_s: np.ndarray,
+    *,
+    h: float,
+    w: np.ndarray,
+) -> DispatchSolution:
+    # Idle between windows: SOC holds its last windowed value
+    soc_after = np.full(len(intervals), np.nan)
+    soc_after[sel] = sub.soc_kwh_series[1:]
+    soc = pd.Series(np.concatenate([[sub.soc_kwh_series[0]], soc_after])).ffill().to_numpy()
+    bill = calculate_bill(
+        [replace(i, kW_base=float(x), kWh_base=float(x) * h) for i, x in zip(intervals, net)],
+        rate_plan,
+        interval_weights=w,
+    )
+    return DispatchSolution(
+        solver_status=sub.solver_status,
+        bill_usd=bill.bill_usd,
+        energy_charges_usd=bill.energy_charges_usd,
+        demand_charges_usd=bill.demand_charges_usd,
+        fixed_charges_usd=bill.fixed_charges_usd,
+        throughput_mwh=sub.throughput_mwh,
+        peak_monthly_kw=bill.peak_monthly_kw,
+        peak_daily_kw=bill.peak_daily_kw,
+        net_load_series=net.tolist(),
+        charge_kw_series=ch_s.tolist(),
+        discharge_kw_series=dis_s.tolist(),
+        soc_kwh_series=soc.tolist(),
+        marginal_bill_usd_per_kw=sub.marginal_bill_usd_per_kw,
+        marginal_bill_usd_per_kwh=sub.marginal_bill_usd_per_kwh,
+    )
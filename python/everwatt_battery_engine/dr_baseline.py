@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .dr_deliverable import DrFrame, dr_frame_from_payload
+
+BASELINE_ADJUSTMENTS = ("multiplicative", "additive", "none")
+
+
+@dataclass(frozen=True)
+class DrEvent:
+    day: date
+    start_hour: float
+    end_hour: float  # exclusive; same UTC day as the rest of the DR module
+
+
+@dataclass(frozen=True)
+class BaselineRule:
+    """
+    Day-matching baseline, CAISO-style 10-in-10 by default: the per-interval mean of the
+    baseline_days most recent eligible prior days within lookback_days, where eligible means
+    the same day type (weekday / weekend), not an event or excluded day, and no missing
+    intervals. The day-of adjustment compares actual and baseline load over adjustment_hours
+    ending adjustment_gap_hours before the event, as a ratio (multiplicative) or kW offset
+    (additive), limited to +/- adjustment_cap of the baseline.
+    """
+
+    baseline_days: int = 10
+    lookback_days: int = 45
+    adjustment: str = "multiplicative"
+    adjustment_hours: float = 3.0
+    adjustment_gap_hours: float = 1.0
+    adjustment_cap: float = 0.2
+
+
+@dataclass(frozen=True)
+class BaselineSettlement:
+    """
+    One row per (site, event) where the site has data on the event day; kW values are means
+    over the event intervals. adjustment is the applied factor (multiplicative), kW offset
+    (additive) or 0 (none). Rows without any eligible baseline day have NaN baselines.
+    """
+
+    site_ids: List[str]
+    events: List[DrEvent]
+    site_index: np.ndarray
+    event_index: np.ndarray
+    baseline_kw: np.ndarray
+    unadjusted_baseline_kw: np.ndarray
+    actual_kw: np.ndarray
+    reduction_kw: np.ndarray
+    adjustment: np.ndarray
+    baseline_days: np.ndarray
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        def num(x: float) -> float | None:
+            return float(x) if np.isfinite(x) else None
+
+        out: List[Dict[str, Any]] = []
+        for r in range(self.site_index.size):
+            ev = self.events[int(self.event_index[r])]
+            out.append(
+                {
+                    "siteId": self.site_ids[int(self.site_index[r])],
+                    "date": ev.day.isoformat(),
+                    "startHour": ev.start_hour,
+                    "endHour": ev.end_hour,
+                    "baselineKw": num(self.baseline_kw[r]),
+                    "unadjustedBaselineKw": num(self.unadjusted_baseline_kw[r]),
+                    "actualKw": num(self.actual_kw[r]),
+                    "reductionKw": num(self.reduction_kw[r]),
+                    "adjustment": num(self.adjustment[r]),
+                    "baselineDays": int(self.baseline_days[r]),
+                }
+            )
+        return out
+
+
+def _day_matrix(frame: DrFrame, slots: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (days x slots) kW with NaN for missing intervals, and each day's ordinal (days since epoch).
+    """
+    ts = frame.ts.to_numpy(dtype="datetime64[ns]")
+    day_ns = ts.astype("datetime64[D]").astype("datetime64[ns]")
+    step_ns = frame.interval_hours * 3600e9
+    slot = np.rint((ts - day_ns).astype(np.int64) / step_ns).astype(int)
+    m = np.full((len(frame.days), slots), np.nan)
+    keep = (slot >= 0) & (slot < slots)
+    m[frame.day_codes[keep], slot[keep]] = frame.kw[keep]
+    ordinal = np.array(frame.days, dtype="datetime64[D]").astype(np.int64)
+    return m, ordinal
+
+
+def _window_mean(values: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    # Row-wise nanmean over columns lo..hi-1 (NaN when the window is empty or all missing)
+    cols = np.arange(values.shape[1])[None, :]
+    inside = (cols >= lo[:, None]) & (cols < hi[:, None]) & ~np.isnan(values)
+    n = inside.sum(axis=1)
+    total = np.where(inside, values, 0.0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, total / np.maximum(n, 1), np.nan)
+
+
+def _settle_group(
+    frames: List[DrFrame],
+    site_of_frame: List[int],
+    events: Sequence[DrEvent],
+    excluded: np.ndarray,
+    rule: BaselineRule,
+) -> Dict[str, np.ndarray]:
+    interval_hours = frames[0].interval_hours
+    slots = int(round(24.0 / interval_hours))
+    if slots <= 0 or abs(slots * interval_hours - 24.0) > 1e-6:
+        raise ValueError(f"interval of {interval_hours} h does not divide a day")
+
+    # Every site's days stacked into one (days x slots) matrix, site by site in date order
+    mats, ords, sites = [], [], []
+    for frame, s in zip(frames, site_of_frame):
+        m, o = _day_matrix(frame, slots)
+        mats.append(m)
+        ords.append(o)
+        sites.append(np.full(o.size, s))
+    load = np.concatenate(mats)
+    ordinal = np.concatenate(ords)
+    site = np.concatenate(sites)
+
+    event_ord = np.array([np.datetime64(e.day, "D").astype(np.int64) for e in events], dtype=np.int64)
+    weekend = (ordinal + 3) % 7 >= 5  # 1970-01-01 was a Thursday
+    base_ok = ~np.isnan(load).any(axis=1) & ~np.isin(ordinal, event_ord) & ~np.isin(ordinal, excluded)
+
+    target = np.flatnonzero(np.isin(ordinal, event_ord))
+    ev_idx = np.searchsorted(np.sort(event_ord), ordinal[target])
+    ev_idx = np.argsort(event_ord, kind="stable")[ev_idx]
+
+    # Rolling selection: the K eligible days just before each target in the stacked order,
+    # kept only when they belong to the same site and fall inside the lookback.
+    K = max(1, int(rule.baseline_days))
+    picks = np.zeros((target.size, K), dtype=int)
+    valid = np.zeros((target.size, K), dtype=bool)
+    for is_weekend in (False, True):
+        rows = np.flatnonzero(weekend[target] == is_weekend)
+        if not rows.size:
+            continue
+        eligible = np.flatnonzero(base_ok & (weekend == is_weekend))
+        n_before = np.searchsorted(eligible, target[rows])
+        pos = n_before[:, None] - K + np.arange(K)[None, :]
+        ok = pos >= 0
+        chosen = eligible[np.clip(pos, 0, max(eligible.size - 1, 0))] if eligible.size else np.zeros_like(pos)
+        ok &= eligible.size > 0
+        t = target[rows][:, None]
+        ok &= (site[chosen] == site[t]) & (ordinal[chosen] >= ordinal[t] - int(rule.lookback_days))
+        picks[rows] = chosen
+        valid[rows] = ok
+
+    n_days = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        profile = np.where(valid[:, :, None], load[picks], 0.0).sum(axis=1) / n_days[:, None]
+    actual = load[target]
+
+    start = np.array([e.start_hour for e in events], dtype=float)[ev_idx]
+    end = np.array([e.end_hour for e in events], dtype=float)[ev_idx]
+    ev_lo = np.rint(start / interval_hours).astype(int)
+    ev_hi = np.rint(end / interval_hours).astype(int)
+    adj_hi = ev_lo - int(round(rule.adjustment_gap_hours / interval_hours))
+    adj_lo = np.maximum(0, adj_hi - int(round(rule.adjustment_hours / interval_hours)))
+    adj_hi = np.maximum(adj_hi, 0)
+
+    unadjusted = _window_mean(profile, ev_lo, ev_hi)
+    actual_kw = _window_mean(actual, ev_lo, ev_hi)
+    base_adj = _window_mean(profile, adj_lo, adj_hi)
+    actual_adj = _window_mean(actual, adj_lo, adj_hi)
+    cap = float(rule.adjustment_cap)
+    usable = np.isfinite(base_adj) & np.isfinite(actual_adj)
+    if rule.adjustment == "multiplicative":
+        usable &= base_adj > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            adjustment = np.where(usable, np.clip(actual_adj / base_adj, 1.0 - cap, 1.0 + cap), 1.0)
+        baseline = unadjusted * adjustment
+    elif rule.adjustment == "additive":
+        limit = cap * np.abs(base_adj)
+        adjustment = np.where(usable, np.clip(actual_adj - base_adj, -limit, limit), 0.0)
+        baseline = unadjusted + adjustment
+    else:
+        adjustment = np.zeros(target.size)
+        baseline = unadjusted
+
+    return {
+        "site_index": site[target],
+        "event_index": ev_idx,
+        "baseline_kw": baseline,
+        "unadjusted_baseline_kw": unadjusted,
+        "actual_kw": actual_kw,
+        "reduction_kw": baseline - actual_kw,
+        "adjustment": adjustment,
+        "baseline_days": n_days,
+    }
+
+
+def settle_events(
+    sites: Mapping[str, DrFrame],
+    events: Sequence[DrEvent],
+    *,
+    rule: BaselineRule = BaselineRule(),
+    excluded_days: Sequence[date] = (),
+) -> BaselineSettlement:
+    """
+    Baselines and event performance for every site and event of a season in one vectorized
+    pass: each site's days become rows of a (days x slots) matrix, all sites are stacked, and
+    every event day's baseline days are picked by index arithmetic over the eligible rows.
+    excluded_days (e.g. holidays) never serve as baseline days. Sites with different interval
+    lengths are settled in one pass per interval length.
+    """
+    if rule.adjustment not in BASELINE_ADJUSTMENTS:
+        raise ValueError(f"adjustment must be one of {BASELINE_ADJUSTMENTS}, got {rule.adjustment!r}")
+    days = [e.day for e in events]
+    if len(set(days)) != len(days):
+        raise ValueError("at most one event per day")
+    site_ids = list(sites)
+    excluded = np.array([np.datetime64(d, "D").astype(np.int64) for d in excluded_days], dtype=np.int64)
+
+    groups: Dict[float, List[int]] = {}
+    for i, sid in enumerate(site_ids):
+        if len(sites[sid].days):
+            groups.setdefault(round(sites[sid].interval_hours, 9), []).append(i)
+
+    fields = [f for f in BaselineSettlement.__dataclass_fields__ if f not in ("site_ids", "events")]
+    parts: Dict[str, List[np.ndarray]] = {f: [] for f in fields}
+    if events:
+        for members in groups.values():
+            got = _settle_group([sites[site_ids[i]] for i in members], members, events, excluded, rule)
+            for f in fields:
+                parts[f].append(got[f])
+
+    cols = {f: np.concatenate(parts[f]) if parts[f] else np.zeros(0) for f in fields}
+    order = np.lexsort((cols["event_index"], cols["site_index"]))
+    cols = {f: v[order] for f, v in cols.items()}
+    for f in ("site_index", "event_index", "baseline_days"):
+        cols[f] = cols[f].astype(int)
+    return BaselineSettlement(site_ids=site_ids, events=list(events), **cols)
+
+
+def compute_dr_baseline_settlement(payload: Dict[str, Any], *, frame: DrFrame | None = None) -> Dict[str, Any]:
+    """
+    One site's event performance. Payload: intervals (as compute_dr_deliverables) plus
+      events: [{date, startHour, endHour}]
+      excludedDays: [date]  (holidays)
+      baseline: {baselineDays, lookbackDays, adjustment, adjustmentHours, adjustmentGapHours, adjustmentCap}
+    """
+    events = [
+        DrEvent(
+            day=pd.Timestamp(e["date"]).date(),
+            start_hour=float(e.get("startHour", 16)),
+            end_hour=float(e.get("endHour", 21)),
+        )
+        for e in payload.get("events") or []
+    ]
+    b = payload.get("baseline") or {}
+    default = BaselineRule()
+    rule = BaselineRule(
+        baseline_days=int(b.get("baselineDays", default.baseline_days)),
+        lookback_days=int(b.get("lookbackDays", default.lookback_days)),
+        adjustment=str(b.get("adjustment", default.adjustment)),
+        adjustment_hours=float(b.get("adjustmentHours", default.adjustment_hours)),
+        adjustment_gap_hours=float(b.get("adjustmentGapHours", default.adjustment_gap_hours)),
+        adjustment_cap=float(b.get("adjustmentCap", default.adjustment_cap)),
+    )
+    if frame is None:
+        frame = dr_frame_from_payload(payload)
+    if frame is None:
+        return {"events": [], "notes": ["no-intervals"]}
+
+    settlement = settle_events(
+        {"site": frame},
+        events,
+        rule=rule,
+        excluded_days=[pd.Timestamp(d).date() for d in payload.get("excludedDays") or []],
+    )
+    records = settlement.to_records()
+    for r in records:
+        r.pop("siteId")
+    notes: List[str] = []
+    if len(records) < len(events):
+        notes.append(f"{len(events) - len(records)} event day(s) have no interval data.")
+    if any(r["baselineDays"] < rule.baseline_days for r in records):
+        notes.append(f"Some events have fewer than {rule.baseline_days} eligible baseline days.")
+    return {"events": records, "notes": notes}
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
 import json
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
-from ortools.linear_solver import pywraplp
+
+from .interval_store import open_interval_store
+
+DR_SOLVERS = ("bisection", "lp")
 
 
 @dataclass(frozen=True)
@@ -35,18 +39,83 @@ def filter_event_window(df: pd.DataFrame, *, ts_col: str, w: EventWindow) -> pd.
     return df.loc[mask].copy()
 
 
-def deliverable_kw_no_battery(df: pd.DataFrame, *, ts_col: str, kw_col: str, w: EventWindow) -> float:
+@dataclass(frozen=True)
+class DrFrame:
+    """
+    Intervals parsed once for the DR computations: rows sorted by time (unparseable timestamps
+    dropped) with the calendar fields event windows test, and integer day codes into days.
+    Each day's rows are contiguous: day_start[c] to day_start[c + 1].
+    interval_hours is the median timestamp step (0.25 when it cannot be measured).
+    """
+
+    ts: pd.Series
+    kw: np.ndarray
+    temp: np.ndarray | None
+    hour: np.ndarray
+    weekday: np.ndarray
+    month: np.ndarray
+    day_codes: np.ndarray
+    days: List[Any]
+    day_start: np.ndarray
+    interval_hours: float
+
+    def event_mask(self, w: EventWindow) -> np.ndarray:
+        mask = (self.hour >= w.start_hour) & (self.hour < w.end_hour)
+        if w.weekdays_only:
+            mask &= self.weekday <= 4
+        if w.months is not None:
+            mask &= np.isin(self.month, list(w.months))
+        return mask
+
+
+def prepare_dr_frame(df: pd.DataFrame, *, ts_col: str = "ts", kw_col: str = "kw", temp_col: str | None = None) -> DrFrame:
+    """
+    Parse df once into a DrFrame; reuse it across windows, batteries and sub-computations.
+    """
+    cols: Dict[str, Any] = {"ts": _ensure_ts(df, ts_col), "kw": df[kw_col]}
+    if temp_col and temp_col in df.columns:
+        cols["temp"] = df[temp_col]
+    rows = pd.DataFrame(cols).dropna(subset=["ts"]).sort_values("ts").reset_index(drop=True)
+    ts = rows["ts"]
+
+    # Cadence: median step between distinct timestamps in time order (assume constant cadence)
+    dt = ts.drop_duplicates().diff().dropna().median()
+    interval_hours = float(dt.total_seconds() / 3600.0) if dt is not None and pd.notna(dt) else 0.25
+    if interval_hours <= 0:
+        raise ValueError(f"interval cadence must be positive, got {interval_hours} h")
+    codes, uniq = pd.factorize(ts.dt.floor("D"), sort=True)
+    codes = np.asarray(codes, dtype=int)
+    return DrFrame(
+        ts=ts,
+        kw=rows["kw"].to_numpy(dtype=float),
+        temp=rows["temp"].to_numpy(dtype=float) if "temp" in rows.columns else None,
+        hour=ts.dt.hour.to_numpy(),
+        weekday=ts.dt.weekday.to_numpy(),  # 0=Mon
+        month=ts.dt.month.to_numpy(),
+        day_codes=codes,
+        days=[d.date() for d in uniq],
+        day_start=np.searchsorted(codes, np.arange(len(uniq) + 1)),
+        interval_hours=interval_hours,
+    )
+
+
+def _as_frame(df: pd.DataFrame | DrFrame, *, ts_col: str, kw_col: str, temp_col: str | None = None) -> DrFrame:
+    return df if isinstance(df, DrFrame) else prepare_dr_frame(df, ts_col=ts_col, kw_col=kw_col, temp_col=temp_col)
+
+
+def deliverable_kw_no_battery(
+    df: pd.DataFrame | DrFrame, *, ts_col: str = "ts", kw_col: str = "kw", w: EventWindow
+) -> float:
     """
     Conservative ops-only deliverable:
       - daily mean kW in event window
       - deliverable = P50 - P20
     """
-    win = filter_event_window(df, ts_col=ts_col, w=w)
-    if win.empty:
+    frame = _as_frame(df, ts_col=ts_col, kw_col=kw_col)
+    mask = frame.event_mask(w)
+    if not mask.any():
         return 0.0
-    ts = _ensure_ts(win, ts_col)
-    win = win.assign(_date=ts.dt.date)
-    daily = win.groupby("_date")[kw_col].mean()
+    daily = pd.Series(frame.kw[mask]).groupby(frame.day_codes[mask]).mean()
     if len(daily) < 3:
         return 0.0
     p50 = float(np.percentile(daily, 50))
@@ -54,42 +123,28 @@ def deliverable_kw_no_battery(df: pd.DataFrame, *, ts_col: str, kw_col: str, w:
     return float(max(0.0, p50 - p20))
 
 
-def _select_hot_days(
-    df: pd.DataFrame,
-    *,
-    ts_col: str,
-    temp_col: str,
-    w: EventWindow,
-    top_n: int,
-) -> set[pd.Timestamp.date]:
+def _hot_day_codes(frame: DrFrame, mask: np.ndarray, top_n: int) -> np.ndarray:
     """
-    Select top-N hottest days based on average temperature within the event window.
-    If temperature is missing/empty, returns empty set (caller falls back).
+    Select top-N hottest days (day codes) based on average temperature within the event window.
+    If temperature is missing/empty, returns no days (caller falls back).
     """
-    if temp_col not in df.columns:
-        return set()
-    win = filter_event_window(df, ts_col=ts_col, w=w)
-    if win.empty:
-        return set()
-    if win[temp_col].isna().all():
-        return set()
-
-    ts = _ensure_ts(win, ts_col)
-    win = win.assign(_date=ts.dt.date)
-    daily_temp = win.groupby("_date")[temp_col].mean().dropna()
+    none = np.zeros(0, dtype=int)
+    if frame.temp is None or not mask.any():
+        return none
+    temp = frame.temp[mask]
+    if np.isnan(temp).all():
+        return none
+    daily_temp = pd.Series(temp).groupby(frame.day_codes[mask]).mean().dropna()
     if daily_temp.empty:
-        return set()
+        return none
     top_n = int(max(1, min(top_n, len(daily_temp))))
-    hottest = daily_temp.sort_values(ascending=False).head(top_n).index.tolist()
-    return set(hottest)
+    return daily_temp.sort_values(ascending=False).head(top_n).index.to_numpy(dtype=int)
 
 
 def _maximize_k_for_day(
-    df_day: pd.DataFrame,
+    base: np.ndarray,
+    is_event: np.ndarray,
     *,
-    ts_col: str,
-    kw_col: str,
-    is_event_col: str,
     interval_hours: float,
     P: float,
     E: float,
@@ -99,21 +154,24 @@ def _maximize_k_for_day(
     soc0_frac: float,
 ) -> float:
     """
-    Solve one LP that maximizes k for this day:
+    Solve one LP that maximizes k for this day (base kW and event mask per interval):
       ch[t] - dis[t] + k <= 0 for event intervals (equiv net <= base - k)
     """
-    n = len(df_day)
+    n = len(base)
     if n < 2:
         return 0.0
-
-    base = df_day[kw_col].astype(float).to_list()
-    is_event = df_day[is_event_col].astype(bool).to_list()
-    if not any(is_event):
+    if not is_event.any():
         return 0.0
+    # Intervals after the last event interval cannot change k (idling there is always feasible).
+    n = int(np.flatnonzero(is_event)[-1]) + 1
+
+    # Imported here so the default (bisection) path never loads OR-Tools
+    from ortools.linear_solver import pywraplp
 
     solver = pywraplp.Solver.CreateSolver("GLOP")
     if solver is None:
         raise RuntimeError("OR-Tools GLOP solver not available")
+    inf = solver.infinity()
 
     # Decision vars
     ch = [solver.NumVar(0.0, P, f"ch_{t}") for t in range(n)]
@@ -122,20 +180,30 @@ def _maximize_k_for_day(
     k = solver.NumVar(0.0, P, "k")
 
     soc0 = float(max(0.0, min(E, soc0_frac * E)))
-    solver.Add(soc[0] == soc0)
+    soc[0].SetBounds(soc0, soc0)
 
+    # Rows are built coefficient by coefficient: the expression API dominates solve time here.
     dt = float(interval_hours)
     for t in range(n):
-        solver.Add(soc[t + 1] == soc[t] + (eta_c * ch[t] - dis[t] / eta_d) * dt)
-
-    for t in range(n):
-        # No export (net >= 0): base + ch - dis >= 0 => dis <= base + ch
+        # soc[t+1] = soc[t] + (eta_c * ch[t] - dis[t] / eta_d) * dt
+        row = solver.Constraint(0.0, 0.0)
+        row.SetCoefficient(soc[t + 1], 1.0)
+        row.SetCoefficient(soc[t], -1.0)
+        row.SetCoefficient(ch[t], -eta_c * dt)
+        row.SetCoefficient(dis[t], dt / eta_d)
+
+        # No export (net >= 0): base + ch - dis >= 0 => dis - ch <= base
         if no_export:
-            solver.Add(dis[t] <= base[t] + ch[t])
+            row = solver.Constraint(-inf, float(base[t]))
+            row.SetCoefficient(dis[t], 1.0)
+            row.SetCoefficient(ch[t], -1.0)
 
         if is_event[t]:
             # ch - dis + k <= 0  (equiv base+ch-dis <= base-k)
-            solver.Add(ch[t] - dis[t] + k <= 0.0)
+            row = solver.Constraint(-inf, 0.0)
+            row.SetCoefficient(ch[t], 1.0)
+            row.SetCoefficient(dis[t], -1.0)
+            row.SetCoefficient(k, 1.0)
 
     # Objective: maximize k, with tiny penalty on total discharge to discourage silly charge+discharge loops.
     obj = solver.Objective()
@@ -151,11 +219,171 @@ def _maximize_k_for_day(
     return float(k.solution_value())
 
 
+def _max_k_bisection(
+    days: List[Tuple[np.ndarray, np.ndarray]],
+    *,
+    interval_hours: float,
+    P: float,
+    E: float,
+    eta_c: float,
+    eta_d: float,
+    no_export: bool,
+    soc0_frac: float,
+) -> List[float]:
+    """
+    The optimum of _maximize_k_for_day for every day at once, without an LP.
+
+    For a given k the best policy is greedy: charge at full power outside the event (more SOC
+    never hurts), and discharge exactly k inside it (charging there only loses energy to
+    efficiency). So k is feasible iff k <= P, k <= every event base kW under no export, and that
+    trajectory never drains below zero. Feasibility is monotone in k, so each day's k is found by
+    bisection, with all days stepped together as one array.
+    """
+    if not days:
+        return []
+    ks = _max_k_bisection_sizes(
+        days,
+        interval_hours=interval_hours,
+        P=np.array([P], dtype=float),
+        E=np.array([E], dtype=float),
+        eta_c=np.array([eta_c], dtype=float),
+        eta_d=np.array([eta_d], dtype=float),
+        no_export=no_export,
+        soc0_frac=soc0_frac,
+    )
+    return ks[0].tolist()
+
+
+def _max_k_bisection_sizes(
+    days: List[Tuple[np.ndarray, np.ndarray]],
+    *,
+    interval_hours: float,
+    P: np.ndarray,
+    E: np.ndarray,
+    eta_c: np.ndarray,
+    eta_d: np.ndarray,
+    no_export: bool,
+    soc0_frac: float,
+) -> np.ndarray:
+    """
+    _max_k_bisection for S battery sizes (P, E, eta_c, eta_d each of shape (S,)) in one pass:
+    returns (S, days) max k. Each size keeps its own tolerance and iteration count, so every
+    row equals a single-size call.
+    """
+    if not interval_hours > 0:
+        raise ValueError(f"interval_hours must be positive, got {interval_hours}")
+    S = P.size
+    D = len(days)
+    if not D:
+        return np.zeros((S, 0))
+    T = max(len(b) for b, _ev in days)
+    base = np.full((D, T), np.inf)
+    ev = np.zeros((D, T), dtype=bool)
+    for d, (b, e) in enumerate(days):
+        base[d, : len(b)] = b
+        ev[d, : len(e)] = e
+    # Outside the LP's domain: too short to dispatch, or no event interval
+    skip = np.array([len(b) < 2 for b, _ev in days]) | ~ev.any(axis=1)
+
+    dt = float(interval_hours)
+    gain = (P * eta_c * dt)[:, None]
+    drain = (dt / eta_d)[:, None]
+    E_col = E[:, None]
+    soc0 = np.clip(soc0_frac * E, 0.0, E)[:, None]
+    cap = np.repeat(P[:, None], D, axis=1)
+    if no_export:
+        cap = np.minimum(cap, np.where(ev, base, np.inf).min(axis=1)[None, :])
+    # A negative event base under no export leaves no feasible k (the LP reports 0)
+    skip = skip[None, :] | (cap < 0)
+    cap = np.maximum(cap, 0.0)
+
+    # Before a day's first event interval the battery only charges, whatever k is: run that
+    # stretch once, then bisect over each day's span from its first to its last event interval.
+    first = np.where(ev.any(axis=1), ev.argmax(axis=1), 0)
+    last = np.where(ev.any(axis=1), T - 1 - ev[:, ::-1].argmax(axis=1), 0)
+    soc_start = np.repeat(soc0, D, axis=1)
+    for t in range(int(first.max())):
+        soc_start = np.where(t < first, np.minimum(E_col, soc_start + gain), soc_start)
+    span = int((last - first).max()) + 1
+    cols = first[:, None] + np.arange(span)[None, :]
+    ev = np.take_along_axis(np.pad(ev, ((0, 0), (0, span))), cols, axis=1)
+
+    def feasible(k: np.ndarray) -> np.ndarray:
+        soc = soc_start
+        ok = np.ones((S, D), dtype=bool)
+        for t in range(span):
+            soc = np.where(ev[:, t], soc - k * drain, np.minimum(E_col, soc + gain))
+            ok &= soc >= 0.0
+        return ok
+
+    lo = np.zeros((S, D))
+    hi = cap.copy()
+    at_cap = feasible(hi)
+    tol = 1e-9 * np.maximum(1.0, P)
+    steps = np.ceil(np.log2(np.maximum(cap.max(axis=1), tol) / tol)).astype(int) + 1
+    for i in range(int(steps.max())):
+        mid = 0.5 * (lo + hi)
+        ok = feasible(mid)
+        active = (i < steps)[:, None]
+        lo = np.where(active & ok, mid, lo)
+        hi = np.where(active & ~ok, mid, hi)
+    k = np.where(at_cap, cap, lo)
+    return np.where(skip, 0.0, k)
+
+
+def _worker_count(workers: int) -> int:
+    from .parallel import resolve_worker_count  # pulls in the dispatch LP (OR-Tools)
+
+    return resolve_worker_count(workers)
+
+
+def _maximize_k_for_days(days: List[Tuple[np.ndarray, np.ndarray]], params: Dict[str, Any]) -> List[float]:
+    # Pool task: a chunk of (base, is_event) days sharing the battery parameters
+    return [_maximize_k_for_day(base, is_event, **params) for base, is_event in days]
+
+
+def _event_day_codes(frame: DrFrame, is_event: np.ndarray, top_hot_days_n: int) -> Tuple[np.ndarray, List[str]]:
+    """
+    Codes of the days the battery deliverable is evaluated on, in day order, plus the note
+    saying how they were chosen.
+    """
+    notes: List[str] = []
+
+    # Hot days selection
+    selected = _hot_day_codes(frame, is_event, top_hot_days_n)
+    if selected.size:
+        notes.append(f"Using top-{selected.size} hottest days by avg temperature in event window.")
+    else:
+        # All days that have at least one event interval
+        selected = np.unique(frame.day_codes[is_event])
+        notes.append("Temperature not available; using all qualifying event-window days.")
+
+    # Keep only days that actually have event intervals
+    has_event = np.zeros(len(frame.days), dtype=bool)
+    has_event[frame.day_codes[is_event]] = True
+    selected = np.sort(selected)
+    return selected[has_event[selected]], notes
+
+
+def _event_days(frame: DrFrame, w: EventWindow, top_hot_days_n: int) -> Tuple[List[Tuple[np.ndarray, np.ndarray]], List[str]]:
+    """
+    The (base kW, event mask) rows of each day the battery deliverable is evaluated on, in day
+    order, plus the note saying how they were chosen.
+    """
+    is_event = frame.event_mask(w)
+    codes, notes = _event_day_codes(frame, is_event, top_hot_days_n)
+    days: List[Tuple[np.ndarray, np.ndarray]] = []
+    for c in codes.tolist():
+        rows = slice(int(frame.day_start[c]), int(frame.day_start[c + 1]))
+        days.append((frame.kw[rows], is_event[rows]))
+    return days, notes
+
+
 def deliverable_total_kw_with_battery(
-    df: pd.DataFrame,
+    df: pd.DataFrame | DrFrame,
     *,
-    ts_col: str,
-    kw_col: str,
+    ts_col: str = "ts",
+    kw_col: str = "kw",
     temp_col: str | None,
     w: EventWindow,
     interval_hours: float,
@@ -165,88 +393,131 @@ def deliverable_total_kw_with_battery(
     no_export: bool = True,
     soc0_frac: float = 0.5,
     top_hot_days_n: int = 10,
+    workers: int = 1,
+    solver: str = "bisection",
 ) -> Tuple[float, int, List[str]]:
     """
-    Commitments-grade total deliverable using day-level LP max-k and P20 aggregation.
+    Commitments-grade total deliverable using day-level max-k and P20 aggregation.
 
     Day selection:
       - if temperature exists and has values, evaluate top-N hottest days (by window avg temp)
       - else evaluate all qualifying window days
+    df may be a prepared DrFrame (ts_col/kw_col/temp_col are then already applied).
+    solver "bisection" finds every day's max k at once (see _max_k_bisection); "lp" solves one
+    GLOP LP per day, in a process pool when workers > 1 (<= 0 = every core).
     """
-    eta = float(np.sqrt(max(0.01, min(0.999, round_trip_efficiency))))
-    eta_c, eta_d = eta, eta
+    totals, n_days, notes = deliverable_curve_kw_with_battery(
+        df,
+        ts_col=ts_col,
+        kw_col=kw_col,
+        temp_col=temp_col,
+        w=w,
+        interval_hours=interval_hours,
+        sizes=[(P, E, round_trip_efficiency)],
+        no_export=no_export,
+        soc0_frac=soc0_frac,
+        top_hot_days_n=top_hot_days_n,
+        workers=workers,
+        solver=solver,
+    )
+    return totals[0], n_days, notes
 
-    df = df.copy()
-    df[ts_col] = _ensure_ts(df, ts_col)
-    df = df.dropna(subset=[ts_col]).sort_values(ts_col).reset_index(drop=True)
-    df["_date"] = df[ts_col].dt.date
 
-    # Event mask for each row
-    win_rows = filter_event_window(df, ts_col=ts_col, w=w)
-    event_idx = set(win_rows.index.tolist())
-    df["_is_event"] = df.index.map(lambda i: i in event_idx)
+def _one_way_efficiency(round_trip_efficiency: float) -> float:
+    return float(np.sqrt(max(0.01, min(0.999, round_trip_efficiency))))
 
-    notes: List[str] = []
 
-    # Hot days selection
-    selected_days: set[pd.Timestamp.date] = set()
-    if temp_col:
-        hottest = _select_hot_days(df, ts_col=ts_col, temp_col=temp_col, w=w, top_n=top_hot_days_n)
-        if hottest:
-            selected_days = hottest
-            notes.append(f"Using top-{len(selected_days)} hottest days by avg temperature in event window.")
-
-    if not selected_days:
-        # All days that have at least one event interval
-        selected_days = set(df.loc[df["_is_event"], "_date"].unique().tolist())
-        notes.append("Temperature not available; using all qualifying event-window days.")
+def _max_k_lp(days: List[Tuple[np.ndarray, np.ndarray]], params: Dict[str, Any], workers: int) -> List[float]:
+    n_workers = min(_worker_count(workers), len(days))
+    if n_workers <= 1:
+        return _maximize_k_for_days(days, params)
+    # Contiguous chunks, results in day order
+    bounds = np.linspace(0, len(days), n_workers + 1).astype(int)
+    chunks = [days[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        return [k for part in pool.map(_maximize_k_for_days, chunks, [params] * len(chunks)) for k in part]
 
-    ks: List[float] = []
-    for day in sorted(selected_days):
-        df_day = df[df["_date"] == day].copy()
-        # Keep only days that actually have event intervals
-        if not df_day["_is_event"].any():
-            continue
-        k_day = _maximize_k_for_day(
-            df_day,
-            ts_col=ts_col,
-            kw_col=kw_col,
-            is_event_col="_is_event",
-            interval_hours=interval_hours,
-            P=float(P),
-            E=float(E),
-            eta_c=float(eta_c),
-            eta_d=float(eta_d),
+
+def deliverable_curve_kw_with_battery(
+    df: pd.DataFrame | DrFrame,
+    *,
+    ts_col: str = "ts",
+    kw_col: str = "kw",
+    temp_col: str | None,
+    w: EventWindow,
+    interval_hours: float,
+    sizes: Sequence[Tuple[float, float, float]],
+    no_export: bool = True,
+    soc0_frac: float = 0.5,
+    top_hot_days_n: int = 10,
+    workers: int = 1,
+    solver: str = "bisection",
+) -> Tuple[List[float], int, List[str]]:
+    """
+    deliverable_total_kw_with_battery for many (P, E, round_trip_efficiency) sizes: the frame,
+    event mask and day selection are shared, and the bisection solver steps every size and day
+    together. Returns (total kW per size, days evaluated, notes).
+    """
+    if solver not in DR_SOLVERS:
+        raise ValueError(f"solver must be one of {DR_SOLVERS}, got {solver!r}")
+    frame = _as_frame(df, ts_col=ts_col, kw_col=kw_col, temp_col=temp_col)
+    days, notes = _event_days(frame, w, top_hot_days_n)
+    if not sizes:
+        return [], len(days), notes
+    if not days:
+        return [0.0] * len(sizes), 0, notes + ["No event days found for the selected window."]
+
+    P = np.array([float(s[0]) for s in sizes])
+    E = np.array([float(s[1]) for s in sizes])
+    eta = np.array([_one_way_efficiency(float(s[2])) for s in sizes])
+    if solver == "bisection":
+        ks = _max_k_bisection_sizes(
+            days,
+            interval_hours=float(interval_hours),
+            P=P,
+            E=E,
+            eta_c=eta,
+            eta_d=eta,
             no_export=bool(no_export),
             soc0_frac=float(soc0_frac),
         )
-        ks.append(float(k_day))
-
-    if not ks:
-        return 0.0, 0, notes + ["No event days found for the selected window."]
+    else:
+        ks = np.array(
+            [
+                _max_k_lp(
+                    days,
+                    dict(
+                        interval_hours=float(interval_hours),
+                        P=float(P[i]),
+                        E=float(E[i]),
+                        eta_c=float(eta[i]),
+                        eta_d=float(eta[i]),
+                        no_export=bool(no_export),
+                        soc0_frac=float(soc0_frac),
+                    ),
+                    workers,
+                )
+                for i in range(len(sizes))
+            ]
+        )
 
-    deliverable = float(np.percentile(ks, 20))
-    return deliverable, int(len(ks)), notes
+    totals = np.percentile(ks, 20, axis=1)
+    return [float(t) for t in totals], len(days), notes
 
 
-def compute_dr_deliverables(payload: Dict[str, Any]) -> Dict[str, Any]:
+def dr_frame_from_payload(payload: Dict[str, Any]) -> DrFrame | None:
     """
-    Payload schema:
-      intervals: [{ts, kw, temp?}]
-      battery: {power_kw, energy_kwh, round_trip_efficiency}
-      window: {startHour, endHour, weekdaysOnly, months}
-      options: {topHotDaysN, noExport, soc0Frac}
+    The payload's intervals (or intervalStore site) as a DrFrame; None when there are none.
+    intervals may be rows ([{ts, kw, temp?}]) or columns ({ts: [...], kw: [...], temp?: [...]});
+    numeric ts are Unix epoch milliseconds.
     """
-    intervals = payload.get("intervals") or []
-    df = pd.DataFrame(intervals)
+    store_ref = payload.get("intervalStore")
+    if store_ref:
+        df = open_interval_store(str(store_ref["root"])).dr_frame(str(store_ref["siteId"]))
+    else:
+        df = pd.DataFrame(payload.get("intervals") or [])
     if df.empty:
-        return {
-            "deliverableOpsKw": 0.0,
-            "deliverableTotalKw": 0.0,
-            "deliverableBatteryKw": 0.0,
-            "daysEvaluated": 0,
-            "notes": ["no-intervals"],
-        }
+        return None
 
     ts_col = "ts"
     if "timestamp" in df.columns and "ts" not in df.columns:
@@ -256,51 +527,83 @@ def compute_dr_deliverables(payload: Dict[str, Any]) -> Dict[str, Any]:
 
     if ts_col not in df.columns or "kw" not in df.columns:
         raise ValueError("intervals must include ts and kw")
+    if pd.api.types.is_numeric_dtype(df[ts_col]):
+        df[ts_col] = pd.to_datetime(df[ts_col], unit="ms", utc=True)
 
-    # interval_hours (assume constant cadence)
-    ts = _ensure_ts(df, ts_col)
-    dt = ts.diff().dropna().median()
-    interval_hours = float(dt.total_seconds() / 3600.0) if dt is not None and pd.notna(dt) else 0.25
+    temp_col = None
+    if "temp" in df.columns:
+        temp_col = "temp"
+    elif "temperature" in df.columns:
+        temp_col = "temperature"
+    return prepare_dr_frame(df, ts_col=ts_col, kw_col="kw", temp_col=temp_col)
 
+
+def _window_from_payload(payload: Dict[str, Any]) -> EventWindow:
     win = payload.get("window") or {}
     months = win.get("months")
-    w = EventWindow(
+    return EventWindow(
         start_hour=int(win.get("startHour", 16)),
         end_hour=int(win.get("endHour", 21)),
         weekdays_only=bool(win.get("weekdaysOnly", True)),
         months=set(int(m) for m in months) if months else None,
     )
 
-    battery = payload.get("battery") or {}
+
+def _battery_size(battery: Dict[str, Any]) -> Tuple[float, float, float]:
     P = float(battery.get("power_kw") or battery.get("powerKw") or 0.0)
     E = float(battery.get("energy_kwh") or battery.get("energyKwh") or 0.0)
     rte = float(battery.get("round_trip_efficiency") or battery.get("roundTripEfficiency") or 0.9)
+    return P, E, rte
+
+
+def compute_dr_deliverables(payload: Dict[str, Any], *, frame: DrFrame | None = None) -> Dict[str, Any]:
+    """
+    Payload schema:
+      intervals: [{ts, kw, temp?}] or columns {ts: [...], kw: [...], temp?: [...]}
+        (ts ISO strings or epoch milliseconds)
+        or intervalStore: {root, siteId} (an IntervalStore site, read without parsing)
+      battery: {power_kw, energy_kwh, round_trip_efficiency}
+      window: {startHour, endHour, weekdaysOnly, months}
+      options: {topHotDaysN, noExport, soc0Frac, solver ("bisection" | "lp"), workers (lp only)}
+
+    frame: the payload's intervals already prepared (see dr_frame_from_payload), e.g. to
+    evaluate several windows or batteries for one site; the payload's intervals are then ignored.
+    """
+    if frame is None:
+        frame = dr_frame_from_payload(payload)
+    if frame is None:
+        return {
+            "deliverableOpsKw": 0.0,
+            "deliverableTotalKw": 0.0,
+            "deliverableBatteryKw": 0.0,
+            "daysEvaluated": 0,
+            "notes": ["no-intervals"],
+        }
+
+    w = _window_from_payload(payload)
+    P, E, rte = _battery_size(payload.get("battery") or {})
 
     opts = payload.get("options") or {}
     no_export = bool(opts.get("noExport", True))
     soc0_frac = float(opts.get("soc0Frac", 0.5))
     top_hot_days_n = int(opts.get("topHotDaysN", 10))
+    workers = int(opts.get("workers", 1))
+    solver = str(opts.get("solver", "bisection"))
 
-    temp_col = None
-    if "temp" in df.columns:
-        temp_col = "temp"
-    elif "temperature" in df.columns:
-        temp_col = "temperature"
-
-    ops = deliverable_kw_no_battery(df, ts_col=ts_col, kw_col="kw", w=w)
+    ops = deliverable_kw_no_battery(frame, w=w)
     total, days, notes = deliverable_total_kw_with_battery(
-        df,
-        ts_col=ts_col,
-        kw_col="kw",
-        temp_col=temp_col,
+        frame,
+        temp_col=None,
         w=w,
-        interval_hours=interval_hours,
+        interval_hours=frame.interval_hours,
         P=P,
         E=E,
         round_trip_efficiency=rte,
         no_export=no_export,
         soc0_frac=soc0_frac,
         top_hot_days_n=top_hot_days_n,
+        workers=workers,
+        solver=solver,
     )
 
     battery_inc = max(0.0, float(total) - float(ops))
@@ -313,6 +616,78 @@ def compute_dr_deliverables(payload: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+def _curve_sizes(payload: Dict[str, Any]) -> List[Tuple[float, float, float]]:
+    if payload.get("batteries") is not None:
+        return [_battery_size(b or {}) for b in payload["batteries"]]
+    grid = payload.get("grid") or {}
+    powers = grid.get("powerKw") or []
+    energies = grid.get("energyKwh") or []
+    rtes = grid.get("roundTripEfficiency") or [0.9]
+    return [(float(p), float(e), float(r)) for p in powers for e in energies for r in rtes]
+
+
+def compute_dr_deliverable_curve(payload: Dict[str, Any], *, frame: DrFrame | None = None) -> Dict[str, Any]:
+    """
+    compute_dr_deliverables for many battery sizes in one call. Payload schema as there, with
+    the single battery replaced by either
+      batteries: [{power_kw, energy_kwh, round_trip_efficiency}]
+      grid: {powerKw: [...], energyKwh: [...], roundTripEfficiency: [...] (default [0.9])}
+        (every combination, power-major)
+    Returns the shared ops deliverable, day count and notes, and one point per size in order:
+      points: [{powerKw, energyKwh, roundTripEfficiency, deliverableTotalKw, deliverableBatteryKw}]
+    """
+    sizes = _curve_sizes(payload)
+    if frame is None:
+        frame = dr_frame_from_payload(payload)
+    if frame is None:
+        return {
+            "deliverableOpsKw": 0.0,
+            "daysEvaluated": 0,
+            "notes": ["no-intervals"],
+            "points": [
+                {
+                    "powerKw": P,
+                    "energyKwh": E,
+                    "roundTripEfficiency": rte,
+                    "deliverableTotalKw": 0.0,
+                    "deliverableBatteryKw": 0.0,
+                }
+                for P, E, rte in sizes
+            ],
+        }
+
+    w = _window_from_payload(payload)
+    opts = payload.get("options") or {}
+    ops = deliverable_kw_no_battery(frame, w=w)
+    totals, days, notes = deliverable_curve_kw_with_battery(
+        frame,
+        temp_col=None,
+        w=w,
+        interval_hours=frame.interval_hours,
+        sizes=sizes,
+        no_export=bool(opts.get("noExport", True)),
+        soc0_frac=float(opts.get("soc0Frac", 0.5)),
+        top_hot_days_n=int(opts.get("topHotDaysN", 10)),
+        workers=int(opts.get("workers", 1)),
+        solver=str(opts.get("solver", "bisection")),
+    )
+    return {
+        "deliverableOpsKw": float(ops),
+        "daysEvaluated": int(days),
+        "notes": notes,
+        "points": [
+            {
+                "powerKw": P,
+                "energyKwh": E,
+                "roundTripEfficiency": rte,
+                "deliverableTotalKw": float(total),
+                "deliverableBatteryKw": max(0.0, float(total) - float(ops)),
+            }
+            for (P, E, rte), total in zip(sizes, totals)
+        ],
+    }
+
+
 def main() -> None:
     payload = json.loads(input())
     out = compute_dr_deliverables(payload)
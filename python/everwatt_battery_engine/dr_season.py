@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from .dr_deliverable import (
+    DR_SOLVERS,
+    DrFrame,
+    EventWindow,
+    _battery_size,
+    _event_day_codes,
+    _max_k_bisection,
+    _maximize_k_for_day,
+    _one_way_efficiency,
+    _window_from_payload,
+    dr_frame_from_payload,
+)
+
+# (is_event, interval count): the season timeline as alternating charge / event runs
+Run = Tuple[bool, int]
+
+
+@dataclass(frozen=True)
+class DrSeasonResult:
+    """
+    Season simulation over the selected event days, with SOC carried from day to day.
+
+    event_kw: each event day's max k given the SOC left by the days before it, every earlier
+      event having delivered its own max (so back-to-back events drain the battery).
+    reset_kw: the same days with SOC reset to soc0_frac each day (deliverable_total_kw_with_battery).
+    soc_start_kwh: SOC when each day's first event interval begins.
+    firm_kw: the largest kW deliverable on every event of the season as one horizon.
+    """
+
+    days: List[date]
+    event_kw: List[float]
+    reset_kw: List[float]
+    soc_start_kwh: List[float]
+    p20_kw: float
+    reset_p20_kw: float
+    firm_kw: float
+    notes: List[str]
+
+
+def _runs(is_event: np.ndarray) -> List[Run]:
+    if not is_event.size:
+        return []
+    edges = np.flatnonzero(np.diff(is_event.astype(np.int8))) + 1
+    starts = np.concatenate([[0], edges])
+    lengths = np.diff(np.concatenate([starts, [is_event.size]]))
+    return [(bool(is_event[s]), int(n)) for s, n in zip(starts, lengths)]
+
+
+def _run_through(runs: List[Run], soc: float, k: float, *, gain: float, drain: float, E: float) -> Tuple[float, bool]:
+    # Greedy dispatch (see _max_k_bisection): full-power charging outside events, exactly k
+    # inside them. SOC falls monotonically within an event run, so checking run ends suffices.
+    ok = True
+    for is_event, n in runs:
+        if is_event:
+            soc -= n * k * drain
+            ok = ok and soc >= 0.0
+        else:
+            soc = min(E, soc + n * gain)
+    return soc, ok
+
+
+def _max_k_runs(runs: List[Run], soc: float, cap: float, *, P: float, gain: float, drain: float, E: float) -> float:
+    # Same bisection and tolerance as _max_k_bisection, for one horizon starting at soc
+    if not drain > 0:
+        raise ValueError(f"interval_hours must be positive (event drain per kW was {drain})")
+    if cap < 0:
+        return 0.0
+    if _run_through(runs, soc, cap, gain=gain, drain=drain, E=E)[1]:
+        return cap
+    lo, hi = 0.0, cap
+    tol = 1e-9 * max(1.0, P)
+    for _ in range(int(np.ceil(np.log2(max(cap, tol) / tol))) + 1):
+        mid = 0.5 * (lo + hi)
+        if _run_through(runs, soc, mid, gain=gain, drain=drain, E=E)[1]:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def simulate_dr_season(
+    frame: DrFrame,
+    *,
+    w: EventWindow,
+    P: float,
+    E: float,
+    round_trip_efficiency: float,
+    no_export: bool = True,
+    soc0_frac: float = 0.5,
+    top_hot_days_n: int = 10,
+    solver: str = "bisection",
+) -> DrSeasonResult:
+    """
+    Carry SOC across the season instead of resetting it every day. The timeline runs from the
+    first to the last selected event day (the days deliverable_total_kw_with_battery picks);
+    days in between only recharge. It is compressed into charge / event runs, so a four-month
+    season is a few hundred steps rather than an LP. solver "lp" solves each day's max k and
+    the season's firm k with GLOP instead of bisection (SOC is still carried greedily).
+    Like the per-day model, rows are treated as back to back (data gaps add no charging time).
+    """
+    if solver not in DR_SOLVERS:
+        raise ValueError(f"solver must be one of {DR_SOLVERS}, got {solver!r}")
+    is_event = frame.event_mask(w)
+    codes, notes = _event_day_codes(frame, is_event, top_hot_days_n)
+    if not codes.size:
+        return DrSeasonResult([], [], [], [], 0.0, 0.0, 0.0, notes + ["No event days found for the selected window."])
+
+    dt = float(frame.interval_hours)
+    eta = _one_way_efficiency(round_trip_efficiency)
+    gain = P * eta * dt
+    drain = dt / eta
+    soc0 = float(max(0.0, min(E, soc0_frac * E)))
+    params: Dict[str, Any] = dict(
+        interval_hours=dt, P=float(P), E=float(E), eta_c=eta, eta_d=eta, no_export=bool(no_export), soc0_frac=soc0_frac
+    )
+
+    # Events only count on selected days; the rest of the timeline recharges
+    lo_row, hi_row = int(frame.day_start[codes[0]]), int(frame.day_start[codes[-1] + 1])
+    selected = np.zeros(len(frame.days), dtype=bool)
+    selected[codes] = True
+    season_event = is_event[lo_row:hi_row] & selected[frame.day_codes[lo_row:hi_row]]
+    season_kw = frame.kw[lo_row:hi_row]
+
+    def day_cap(rows: slice) -> float:
+        if not no_export:
+            return float(P)
+        return min(float(P), float(season_kw[rows][season_event[rows]].min()))
+
+    days_rows = [
+        slice(int(frame.day_start[c]) - lo_row, int(frame.day_start[c + 1]) - lo_row) for c in codes.tolist()
+    ]
+    reset_kw = (
+        _max_k_bisection([(season_kw[r], season_event[r]) for r in days_rows], **params)
+        if solver == "bisection"
+        else [_maximize_k_for_day(season_kw[r], season_event[r], **params) for r in days_rows]
+    )
+
+    # Rolling horizon: one day at a time from the SOC the previous days left
+    event_kw: List[float] = []
+    soc_start: List[float] = []
+    soc = soc0
+    prev_end = 0
+    for rows in days_rows:
+        soc = _run_through(_runs(season_event[prev_end : rows.start]), soc, 0.0, gain=gain, drain=drain, E=E)[0]
+        day_runs = _runs(season_event[rows])
+        if len(season_event[rows]) < 2:
+            k = 0.0
+        elif solver == "bisection":
+            k = _max_k_runs(day_runs, soc, day_cap(rows), P=P, gain=gain, drain=drain, E=E)
+        else:
+            k = _maximize_k_for_day(
+                season_kw[rows], season_event[rows], **{**params, "soc0_frac": soc / E if E > 0 else 0.0}
+            )
+        first = int(np.flatnonzero(season_event[rows])[0])
+        soc_start.append(_run_through(_runs(season_event[rows][:first]), soc, 0.0, gain=gain, drain=drain, E=E)[0])
+        soc = _run_through(day_runs, soc, k, gain=gain, drain=drain, E=E)[0]
+        event_kw.append(float(k))
+        prev_end = rows.stop
+
+    # One horizon: a single k that every event of the season must deliver
+    if solver == "bisection":
+        cap = min(day_cap(r) for r in days_rows)
+        firm = _max_k_runs(_runs(season_event), soc0, cap, P=P, gain=gain, drain=drain, E=E)
+    else:
+        firm = _maximize_k_for_day(season_kw, season_event, **params)
+
+    return DrSeasonResult(
+        days=[frame.days[c] for c in codes.tolist()],
+        event_kw=event_kw,
+        reset_kw=[float(k) for k in reset_kw],
+        soc_start_kwh=soc_start,
+        p20_kw=float(np.percentile(event_kw, 20)),
+        reset_p20_kw=float(np.percentile(reset_kw, 20)),
+        firm_kw=float(firm),
+        notes=notes,
+    )
+
+
+def compute_dr_season(payload: Dict[str, Any], *, frame: DrFrame | None = None) -> Dict[str, Any]:
+    """
+    Season simulation for a compute_dr_deliverables payload (same keys). Returns the season
+    P20 with SOC carried (deliverableTotalKw) next to the per-day reset P20, the firm season
+    kW, and one entry per event day.
+    """
+    if frame is None:
+        frame = dr_frame_from_payload(payload)
+    if frame is None:
+        return {
+            "deliverableTotalKw": 0.0,
+            "resetDeliverableTotalKw": 0.0,
+            "firmSeasonKw": 0.0,
+            "daysEvaluated": 0,
+            "events": [],
+            "notes": ["no-intervals"],
+        }
+    P, E, rte = _battery_size(payload.get("battery") or {})
+    opts = payload.get("options") or {}
+    res = simulate_dr_season(
+        frame,
+        w=_window_from_payload(payload),
+        P=P,
+        E=E,
+        round_trip_efficiency=rte,
+        no_export=bool(opts.get("noExport", True)),
+        soc0_frac=float(opts.get("soc0Frac", 0.5)),
+        top_hot_days_n=int(opts.get("topHotDaysN", 10)),
+        solver=str(opts.get("solver", "bisection")),
+    )
+    return {
+        "deliverableTotalKw": res.p20_kw,
+        "resetDeliverableTotalKw": res.reset_p20_kw,
+        "firmSeasonKw": res.firm_kw,
+        "daysEvaluated": len(res.days),
+        "events": [
+            {"date": d.isoformat(), "deliverableKw": k, "resetDeliverableKw": r, "socStartKwh": s}
+            for d, k, r, s in zip(res.days, res.event_kw, res.reset_kw, res.soc_start_kwh)
+        ],
+        "notes": res.notes,
+    }
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, TextIO
+
+from .dr_baseline import compute_dr_baseline_settlement
+from .dr_codec import dumps, load_payload, loads
+from .dr_deliverable import compute_dr_deliverable_curve, compute_dr_deliverables
+from .dr_season import compute_dr_season
+
+SERVICE_OPS = ("deliverables", "curve", "settlement", "season", "health")
+
+
+def _compute(op: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    if op == "curve":
+        return compute_dr_deliverable_curve(payload)
+    if op == "settlement":
+        return compute_dr_baseline_settlement(payload)
+    if op == "season":
+        return compute_dr_season(payload)
+    return compute_dr_deliverables(payload)
+
+
+def _error_text(exc: BaseException) -> str:
+    return f"{type(exc).__name__}: {exc}"
+
+
+class DrService:
+    """
+    Long-lived DR deliverable service: the interpreter and its imports are paid for once, and
+    each request costs only its computation.
+
+    workers=1 computes on a single background thread; workers > 1 (or <= 0 for every core)
+    uses a process pool (DR days are NumPy/pandas work that does not scale across threads).
+    Health checks are answered on the caller's thread and never wait behind computations.
+    """
+
+    def __init__(self, *, workers: int = 1) -> None:
+        self.workers = int(workers) if int(workers) > 0 else int(os.cpu_count() or 1)
+        self._executor: Executor = (
+            ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else ThreadPoolExecutor(max_workers=1)
+        )
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._in_flight = 0
+        self._served = 0
+        self._failed = 0
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "status": "ok",
+                "pid": os.getpid(),
+                "workers": self.workers,
+                "uptimeSeconds": time.monotonic() - self._started,
+                "inFlight": self._in_flight,
+                "requestsServed": self._served,
+                "requestsFailed": self._failed,
+            }
+
+    def submit(self, payload: Dict[str, Any], op: str = "deliverables") -> "Future[Dict[str, Any]]":
+        with self._lock:
+            self._in_flight += 1
+        fut = self._executor.submit(_compute, op, payload)
+        fut.add_done_callback(self._finished)
+        return fut
+
+    def _finished(self, fut: "Future[Dict[str, Any]]") -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if fut.exception() is None:
+                self._served += 1
+            else:
+                self._failed += 1
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "DrService":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def serve_json_lines(service: DrService, inp: TextIO = sys.stdin, out: TextIO = sys.stdout) -> None:
+    """
+    One JSON request per input line, one JSON response per output line, until EOF.
+
+    Request:  {"id": any, "op": <one of SERVICE_OPS>, "payload": {...}}  (op defaults to deliverables)
+    Response: {"id": <same>, "ok": true, "result": {...}} or {"id": <same>, "ok": false, "error": "..."}
+
+    Computations run concurrently, so responses come back in completion order; match them by id.
+    In-flight requests are finished and written before returning at EOF.
+    """
+    write_lock = threading.Lock()
+
+    def reply(msg: Dict[str, Any]) -> None:
+        # Runs in Future callbacks, which swallow exceptions: a response that cannot be encoded
+        # must still answer its id, or the client waits on it forever
+        try:
+            line = dumps(msg)
+        except Exception as exc:
+            line = dumps({"id": msg.get("id"), "ok": False, "error": f"response not serializable: {_error_text(exc)}"})
+        with write_lock:
+            out.write(line + "\n")
+            out.flush()
+
+    def on_done(req_id: Any) -> Callable[["Future[Dict[str, Any]]"], None]:
+        def done(fut: "Future[Dict[str, Any]]") -> None:
+            exc = fut.exception()
+            if exc is None:
+                reply({"id": req_id, "ok": True, "result": fut.result()})
+            else:
+                reply({"id": req_id, "ok": False, "error": _error_text(exc)})
+
+        return done
+
+    for line in inp:
+        if not line.strip():
+            continue
+        req_id: Any = None
+        try:
+            msg = loads(line)
+            if not isinstance(msg, dict):
+                raise ValueError("request must be a JSON object")
+            req_id = msg.get("id")
+            op = str(msg.get("op") or "deliverables")
+            if op not in SERVICE_OPS:
+                raise ValueError(f"unknown op {op!r}; expected one of {SERVICE_OPS}")
+            if op == "health":
+                reply({"id": req_id, "ok": True, "result": service.health()})
+                continue
+            service.submit(msg.get("payload") or {}, op).add_done_callback(on_done(req_id))
+        except Exception as exc:
+            reply({"id": req_id, "ok": False, "error": _error_text(exc)})
+
+
+def serve_http(service: DrService, *, host: str = "127.0.0.1", port: int = 8765) -> None:
+    """
+    Local HTTP endpoint: GET /health, POST /<op> (any other SERVICE_OPS) with the payload as the body
+    (JSON, or NPZ from dr_codec.payload_to_npz).
+    Errors come back as {"error": "..."} with status 400 (bad request) or 500.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: Dict[str, Any]) -> None:
+            data = dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:
+            if self.path.rstrip("/") == "/health":
+                self._send(200, service.health())
+            else:
+                self._send(404, {"error": f"no route {self.path}"})
+
+        def do_POST(self) -> None:
+            op = self.path.rstrip("/").lstrip("/")
+            if op not in SERVICE_OPS or op == "health":
+                self._send(404, {"error": f"no route {self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = load_payload(self.rfile.read(length))
+            except Exception as exc:
+                # Any body that does not decode (bad JSON, corrupt NPZ: BadZipFile, OSError) is the client's
+                self._send(400, {"error": _error_text(exc)})
+                return
+            try:
+                self._send(200, service.submit(payload, op).result())
+            except ValueError as exc:
+                self._send(400, {"error": _error_text(exc)})
+            except Exception as exc:
+                self._send(500, {"error": _error_text(exc)})
+
+        def log_message(self, format: str, *args: Any) -> None:
+            # Keep stderr for real failures
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
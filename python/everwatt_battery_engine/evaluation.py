@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .dispatch_lp import _split_efficiency, optimize_bill_critical_windows, optimize_bill_lp
+from .reduced_horizon import RepresentativeDays, select_representative_days
+from .tariffs.base import RatePlan, TariffInterval, to_tariff_intervals
+from .tariffs.bill import calculate_bill
+from .tariffs.option_s import build_option_s_rate_plan, option_s_eligibility_required_kw
+from .tariffs.pge_b19 import b19_tou_bucket, build_pge_b19_rate_plan
+from .types import Bundle, OptimizationConfig, TariffScenarioSpec
+
+
+@dataclass(frozen=True)
+class SiteContext:
+    """
+    Everything the dispatch LP needs for one site, compiled once:
+    tariff intervals, rate plans (keyed by scenario kind) and no-battery baselines (keyed by scenario id).
+    """
+
+    tariff_intervals: List[TariffInterval]
+    interval_hours: float
+    day_count: int
+    annualization_factor: float
+    scenarios: List[TariffScenarioSpec]
+    rate_plans: Dict[str, RatePlan]
+    baseline_bill_usd_per_year: Dict[str, float]
+    baseline_peak_kw: Dict[str, float]
+    option_s_min_kw: float
+    cfg: OptimizationConfig
+    # Horizon the LP actually solves: tariff_intervals, or representative days with per-interval weights
+    dispatch_intervals: List[TariffInterval]
+    dispatch_weights: np.ndarray | None
+    dispatch_baseline_bill_usd_per_year: Dict[str, float]
+    representative_days: RepresentativeDays | None
+    # Arrays backing the cheap savings upper bound (see savings_upper_bound), over dispatch_intervals
+    base_kw: np.ndarray
+    base_weight: np.ndarray
+    energy_price_per_kwh: Dict[str, np.ndarray]
+    demand_group_peak_kw: Dict[str, np.ndarray]
+    demand_group_rate_per_kw: Dict[str, np.ndarray]
+    demand_group_weight: Dict[str, np.ndarray]
+
+
+@dataclass(frozen=True)
+class DispatchSummary:
+    """
+    Compact outcome of one bundle x scenario dispatch.
+    Series are only attached for profitable dispatches solved with series=True (everything else is
+    discarded by the orchestrator); pool workers return scalars so series never cross IPC in bulk.
+    """
+
+    bundle_index: int
+    scenario_id: str
+    optimized_bill_usd_per_year: float
+    savings_usd_per_year: float
+    peak_kw_after: float
+    solver_status: str
+    # evaluate_dispatch(marginal_values=True) only: annual bill reduction per extra kW / kWh
+    marginal_usd_per_kw_year: float | None = None
+    marginal_usd_per_kwh_year: float | None = None
+    net_kw_series: np.ndarray | None = None
+    charge_kw_series: np.ndarray | None = None
+    discharge_kw_series: np.ndarray | None = None
+    soc_kwh_series: np.ndarray | None = None
+
+
+def scenarios_for_rate(tariff_rate_code: str) -> List[TariffScenarioSpec]:
+    scenarios: List[TariffScenarioSpec] = []
+    if tariff_rate_code.upper().replace(" ", "") in ("B-19", "B19"):
+        scenarios.append(TariffScenarioSpec(id="pge_b19", name="PG&E B-19", kind="pge_b19"))
+        scenarios.append(TariffScenarioSpec(id="pge_option_s", name="PG&E Option S (gated)", kind="pge_option_s"))
+    else:
+        # Stub: treat any other rate as B-19 for now
+        scenarios.append(TariffScenarioSpec(id="pge_b19", name=f"Stub rate for {tariff_rate_code}", kind="pge_b19"))
+        scenarios.append(TariffScenarioSpec(id="pge_option_s", name="PG&E Option S (gated)", kind="pge_option_s"))
+    return scenarios
+
+
+def build_rate_plans() -> Dict[str, RatePlan]:
+    b19_plan = build_pge_b19_rate_plan()
+    # Option S: demand structure + B19 energy as default hook
+    option_s_plan = build_option_s_rate_plan(energy_rate_per_kWh=b19_plan.energy_rate_per_kWh)
+    return {"pge_b19": b19_plan, "pge_option_s": option_s_plan}
+
+
+def build_site_context(
+    df: pd.DataFrame,
+    interval_hours: float,
+    scenarios: Sequence[TariffScenarioSpec],
+    cfg: OptimizationConfig,
+    *,
+    rate_plans: Dict[str, RatePlan] | None = None,
+) -> SiteContext:
+    """
+    df is a normalized interval frame (see intervals.normalize_intervals).
+    rate_plans may be shared across sites (see build_rate_plans); they are built here otherwise.
+    """
+    h = float(interval_hours)
+    day_count = int(df["day_key"].nunique()) if len(df) else 0
+    annualization_factor = float(365.0 / day_count) if day_count > 0 else 1.0
+
+    # Convert to tariff intervals once (TOU mapper differs by scenario, but for now both use B-19 mapping)
+    tariff_intervals = to_tariff_intervals(df, tou_mapper=b19_tou_bucket, interval_hours=h)
+    if rate_plans is None:
+        rate_plans = build_rate_plans()
+
+    # Baseline bills per scenario (no battery)
+    baseline_bill: Dict[str, float] = {}
+    baseline_peak: Dict[str, float] = {}
+    for sc in scenarios:
+        plan = rate_plans.get(sc.kind)
+        if plan is None:
+            continue
+        bill = calculate_bill(tariff_intervals, plan)
+        baseline_bill[sc.id] = float(bill.bill_usd) * annualization_factor
+        baseline_peak[sc.id] = bill.peak_kw
+
+    # Option S eligibility threshold (site-level)
+    _peak12, min_kw_required = option_s_eligibility_required_kw(tariff_intervals)
+
+    # Reduced horizon (representative days); baselines on it price the same days the LP sees
+    rep_days: RepresentativeDays | None = None
+    dispatch_intervals = tariff_intervals
+    dispatch_weights: np.ndarray | None = None
+    dispatch_baseline = dict(baseline_bill)
+    if cfg.representative_days_per_month is not None and tariff_intervals:
+        rep_days = select_representative_days(
+            df,
+            h,
+            days_per_month=int(cfg.representative_days_per_month),
+            intervals=tariff_intervals,
+            rate_plans=[rate_plans[sc.kind] for sc in scenarios if sc.kind in rate_plans],
+        )
+        dispatch_intervals = [i for i in tariff_intervals if i.day_key in rep_days.day_weights]
+        dispatch_weights = np.array([rep_days.day_weights[i.day_key] for i in dispatch_intervals], dtype=float)
+        for sc in scenarios:
+            plan = rate_plans.get(sc.kind)
+            if plan is None:
+                continue
+            bill = calculate_bill(dispatch_intervals, plan, interval_weights=dispatch_weights)
+            dispatch_baseline[sc.id] = float(bill.bill_usd) * annualization_factor
+
+    base_kw = np.array([i.kW_base for i in dispatch_intervals], dtype=float)
+    base_weight = np.ones(len(dispatch_intervals)) if dispatch_weights is None else dispatch_weights
+    day_weight = {i.day_key: float(w) for i, w in zip(dispatch_intervals, base_weight)}
+    energy_price: Dict[str, np.ndarray] = {}
+    group_peak: Dict[str, np.ndarray] = {}
+    group_rate: Dict[str, np.ndarray] = {}
+    group_weight: Dict[str, np.ndarray] = {}
+    for kind, plan in rate_plans.items():
+        energy_price[kind] = np.array([plan.energy_rate_per_kWh(i) for i in dispatch_intervals], dtype=float)
+        peaks, rates, weights = _demand_group_peaks(dispatch_intervals, plan, day_weight)
+        group_peak[kind] = peaks
+        group_rate[kind] = rates
+        group_weight[kind] = weights
+
+    return SiteContext(
+        tariff_intervals=tariff_intervals,
+        interval_hours=h,
+        day_count=day_count,
+        annualization_factor=annualization_factor,
+        scenarios=list(scenarios),
+        rate_plans=rate_plans,
+        baseline_bill_usd_per_year=baseline_bill,
+        baseline_peak_kw=baseline_peak,
+        option_s_min_kw=float(min_kw_required),
+        cfg=cfg,
+        dispatch_intervals=dispatch_intervals,
+        dispatch_weights=dispatch_weights,
+        dispatch_baseline_bill_usd_per_year=dispatch_baseline,
+        representative_days=rep_days,
+        base_kw=base_kw,
+        base_weight=base_weight,
+        energy_price_per_kwh=energy_price,
+        demand_group_peak_kw=group_peak,
+        demand_group_rate_per_kw=group_rate,
+        demand_group_weight=group_weight,
+    )
+
+
+def _demand_group_peaks(
+    intervals: Sequence[TariffInterval],
+    plan: RatePlan,
+    day_weight: Dict[str, float],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Baseline max kW, $/kW rate and charge weight for every (component, month/day) demand group of the plan.
+    """
+    peaks: List[float] = []
+    rates: List[float] = []
+    weights: List[float] = []
+    for comp in plan.demand_components:
+        by_key: Dict[str, float] = {}
+        for i in intervals:
+            if not comp.applies(i):
+                continue
+            key = i.month_key if comp.kind == "monthlyMax" else i.day_key
+            by_key[key] = max(by_key.get(key, 0.0), float(i.kW_base))
+        peaks.extend(by_key.values())
+        rates.extend([float(comp.rate_per_kW)] * len(by_key))
+        weights.extend(1.0 if comp.kind == "monthlyMax" else day_weight.get(k, 1.0) for k in by_key)
+    return np.array(peaks, dtype=float), np.array(rates, dtype=float), np.array(weights, dtype=float)
+
+
+def savings_upper_bound(ctx: SiteContext, bundle: Bundle, scenario: TariffScenarioSpec) -> float:
+    """
+    Cheap upper bound on annual savings for a bundle (no LP), valid for optimize_bill_lp:
+      - demand: every (component, month/day) peak drops by at most min(discharge limit, baseline peak)
+      - energy: each kWh discharged at price p needs >= 1/RTE kWh charged at >= p_min (less the
+        initial SOC), so arbitrage is bounded by sum((p - p_min/RTE)+ * max discharge * h) + p_min * soc0 / eta_c
+    """
+    cfg = ctx.cfg
+    h = float(ctx.interval_hours)
+    P = float(bundle.total_power_kw)
+    E = float(bundle.total_energy_kwh)
+    dis_ub = float(min(P, cfg.interconnect_kw)) if cfg.interconnect_kw is not None else P
+    eta_c, eta_d = _split_efficiency(bundle.round_trip_efficiency)
+
+    peaks = ctx.demand_group_peak_kw[scenario.kind]
+    rates = ctx.demand_group_rate_per_kw[scenario.kind]
+    group_w = ctx.demand_group_weight[scenario.kind]
+    demand_ub = float(np.sum(group_w * rates * np.minimum(dis_ub, np.maximum(peaks, 0.0))))
+
+    price = ctx.energy_price_per_kwh[scenario.kind]
+    dis_max = np.full(price.shape, dis_ub)
+    if cfg.no_export:
+        dis_max = np.minimum(dis_max, np.maximum(ctx.base_kw, 0.0))
+    p_min = float(np.min(price)) if price.size else 0.0
+    if p_min >= 0:
+        soc0 = 0.5 * E  # optimize_bill_lp default initial_soc_frac
+        spread = np.maximum(0.0, price - p_min / (eta_c * eta_d))
+        energy_ub = float(np.sum(spread * dis_max * ctx.base_weight) * h + p_min * soc0 / eta_c)
+    else:
+        # Negative prices: charging itself can earn money; fall back to the trivial per-interval bound.
+        energy_ub = float(np.sum((np.maximum(price, 0.0) * dis_max + np.maximum(-price, 0.0) * P) * ctx.base_weight) * h)
+
+    return float((demand_ub + energy_ub) * ctx.annualization_factor)
+
+
+def full_horizon_savings(ctx: SiteContext, bundle: Bundle, scenario: TariffScenarioSpec) -> float:
+    """
+    Annual savings from the full-horizon LP, used to validate a reduced (representative-day) horizon.
+    """
+    dispatch = optimize_bill_lp(
+        ctx.tariff_intervals,
+        bundle=bundle,
+        rate_plan=ctx.rate_plans[scenario.kind],
+        interval_hours=ctx.interval_hours,
+        no_export=ctx.cfg.no_export,
+        interconnect_kw=ctx.cfg.interconnect_kw,
+    )
+    return float(ctx.baseline_bill_usd_per_year.get(scenario.id, 0.0) - dispatch.bill_usd * ctx.annualization_factor)
+
+
+def full_resolution_savings(ctx: SiteContext, bundle: Bundle, scenario: TariffScenarioSpec) -> float:
+    """
+    Annual savings from the dispatch horizon solved as one full-resolution LP, used to validate
+    cfg.coarsen_noncritical and cfg.critical_window_dispatch.
+    """
+    dispatch = optimize_bill_lp(
+        ctx.dispatch_intervals,
+        bundle=bundle,
+        rate_plan=ctx.rate_plans[scenario.kind],
+        interval_hours=ctx.interval_hours,
+        no_export=ctx.cfg.no_export,
+        interconnect_kw=ctx.cfg.interconnect_kw,
+        interval_weights=ctx.dispatch_weights,
+    )
+    return float(ctx.dispatch_baseline_bill_usd_per_year.get(scenario.id, 0.0) - dispatch.bill_usd * ctx.annualization_factor)
+
+
+def scenario_applies(ctx: SiteContext, bundle: Bundle, scenario: TariffScenarioSpec) -> bool:
+    # Skip degenerate bundles
+    if bundle.total_power_kw <= 0 or bundle.total_energy_kwh <= 0:
+        return False
+    if scenario.kind not in ctx.rate_plans:
+        return False
+    if scenario.kind == "pge_option_s":
+        # Gate on 10% rule
+        return bool(bundle.total_power_kw >= ctx.option_s_min_kw)
+    return True
+
+
+def evaluate_dispatch(
+    ctx: SiteContext,
+    bundle_index: int,
+    bundle: Bundle,
+    scenario: TariffScenarioSpec,
+    *,
+    marginal_values: bool = False,
+    series: bool = True,
+) -> DispatchSummary:
+    plan = ctx.rate_plans[scenario.kind]
+    solve = optimize_bill_critical_windows if ctx.cfg.critical_window_dispatch else optimize_bill_lp
+    dispatch = solve(
+        ctx.dispatch_intervals,
+        bundle=bundle,
+        rate_plan=plan,
+        interval_hours=ctx.interval_hours,
+        no_export=ctx.cfg.no_export,
+        interconnect_kw=ctx.cfg.interconnect_kw,
+        interval_weights=ctx.dispatch_weights,
+        marginal_values=marginal_values,
+        coarsen=ctx.cfg.coarsen_noncritical,
+    )
+
+    optimized_bill_annual = float(dispatch.bill_usd) * ctx.annualization_factor
+    savings = float(ctx.dispatch_baseline_bill_usd_per_year.get(scenario.id, 0.0) - optimized_bill_annual)
+    if ctx.representative_days is not None:
+        # Savings are estimated on the reduced horizon; report the bill against the exact baseline.
+        optimized_bill_annual = float(ctx.baseline_bill_usd_per_year.get(scenario.id, 0.0) - savings)
+    peak_after = float(max(dispatch.net_load_series) if dispatch.net_load_series else 0.0)
+    mv_kw = dispatch.marginal_bill_usd_per_kw
+    mv_kwh = dispatch.marginal_bill_usd_per_kwh
+    summary = DispatchSummary(
+        bundle_index=int(bundle_index),
+        scenario_id=scenario.id,
+        optimized_bill_usd_per_year=optimized_bill_annual,
+        savings_usd_per_year=savings,
+        peak_kw_after=peak_after,
+        solver_status=dispatch.solver_status,
+        marginal_usd_per_kw_year=mv_kw * ctx.annualization_factor if mv_kw is not None else None,
+        marginal_usd_per_kwh_year=mv_kwh * ctx.annualization_factor if mv_kwh is not None else None,
+    )
+    if savings <= 0 or not series:
+        return summary
+    return replace(
+        summary,
+        net_kw_series=np.asarray(dispatch.net_load_series, dtype=float),
+        charge_kw_series=np.asarray(dispatch.charge_kw_series, dtype=float),
+        discharge_kw_series=np.asarray(dispatch.discharge_kw_series, dtype=float),
+        soc_kwh_series=np.asarray(dispatch.soc_kwh_series, dtype=float),
+    )
@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .intervals import NEGATIVE_KW_WARNING, NormalizedIntervals, load_intervals_file, normalize_intervals
+
+INDEX_FILE = "index.json"
+_INDEX_VERSION = 1
+
+
+@dataclass(frozen=True)
+class StoredSite:
+    """
+    Index entry: a site's regular interval grid (start + i * interval) and its array files.
+    Missing readings are stored as NaN and dropped when the site is opened.
+    """
+
+    site_id: str
+    start: pd.Timestamp
+    interval_seconds: int
+    length: int
+    kw_file: str
+    temp_file: str | None = None
+
+    @property
+    def interval_hours(self) -> float:
+        return self.interval_seconds / 3600.0
+
+
+def _file_stem(site_id: str) -> str:
+    # Site ids are free text; keep file names portable and unique
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", site_id)[:48] or "site"
+    return f"{slug}-{hashlib.sha1(site_id.encode('utf-8')).hexdigest()[:10]}"
+
+
+def _entry_to_dict(e: StoredSite) -> Dict[str, Any]:
+    return {
+        "siteId": e.site_id,
+        "start": e.start.isoformat(),
+        "intervalSeconds": e.interval_seconds,
+        "length": e.length,
+        "kwFile": e.kw_file,
+        "tempFile": e.temp_file,
+    }
+
+
+def _entry_from_dict(d: Dict[str, Any]) -> StoredSite:
+    return StoredSite(
+        site_id=str(d["siteId"]),
+        start=pd.Timestamp(d["start"]).tz_convert("UTC"),
+        interval_seconds=int(d["intervalSeconds"]),
+        length=int(d["length"]),
+        kw_file=str(d["kwFile"]),
+        temp_file=str(d["tempFile"]) if d.get("tempFile") else None,
+    )
+
+
+def _atomic_save(path: Path, arr: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as fh:
+        np.save(fh, arr)
+    os.replace(tmp, path)
+
+
+class IntervalStore:
+    """
+    On-disk columnar interval store: one float64 .npy per site (kW, plus optional temperature)
+    on a regular UTC grid, and index.json with each site's id, start, cadence and length.
+
+    Arrays are opened memory-mapped, so opening a site parses nothing and only the pages a
+    computation touches become resident. Writers replace files atomically; readers pick up a
+    rewritten index on the next open_interval_store call.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = Path(root)
+        self._entries: Dict[str, StoredSite] = {}
+        index = self.root / INDEX_FILE
+        if index.exists():
+            raw = json.loads(index.read_text(encoding="utf-8"))
+            if int(raw.get("version", 0)) != _INDEX_VERSION:
+                raise ValueError(f"{index}: unsupported interval store version {raw.get('version')!r}")
+            for d in raw.get("sites", []):
+                e = _entry_from_dict(d)
+                self._entries[e.site_id] = e
+
+    @property
+    def site_ids(self) -> List[str]:
+        return list(self._entries)
+
+    def __contains__(self, site_id: object) -> bool:
+        return site_id in self._entries
+
+    def entry(self, site_id: str) -> StoredSite:
+        e = self._entries.get(site_id)
+        if e is None:
+            raise KeyError(f"site {site_id!r} is not in interval store {self.root}")
+        return e
+
+    def kw(self, site_id: str) -> np.ndarray:
+        """
+        Read-only memory map of the site's kW grid (NaN = missing reading).
+        """
+        return np.load(self.root / self.entry(site_id).kw_file, mmap_mode="r")
+
+    def temperature(self, site_id: str) -> np.ndarray | None:
+        e = self.entry(site_id)
+        return np.load(self.root / e.temp_file, mmap_mode="r") if e.temp_file else None
+
+    def timestamps(self, site_id: str) -> pd.DatetimeIndex:
+        e = self.entry(site_id)
+        return pd.date_range(start=e.start, periods=e.length, freq=pd.Timedelta(seconds=e.interval_seconds))
+
+    def normalized(self, site_id: str) -> NormalizedIntervals:
+        """
+        The site as normalize_intervals(..., timezone="UTC", fill_gaps=False) would return it.
+        """
+        e = self.entry(site_id)
+        kw = self.kw(site_id)
+        ts = self.timestamps(site_id)
+        present = ~np.isnan(kw)
+        warnings: List[str] = []
+        if not present.all():
+            ts = ts[present]
+            kw = kw[present]
+        df = pd.DataFrame({"ts": ts, "load_kw": np.asarray(kw, dtype=float)})
+        if (df["load_kw"] < 0).any():
+            warnings.append(NEGATIVE_KW_WARNING)
+        # Format each calendar day once rather than every interval
+        codes, days = pd.factorize(df["ts"].dt.floor("D"))
+        df["month_key"] = pd.Series(np.asarray(days.strftime("%Y-%m"))[codes], dtype="str")
+        df["day_key"] = pd.Series(np.asarray(days.strftime("%Y-%m-%d"))[codes], dtype="str")
+        if df.empty:
+            warnings.append("no-intervals")
+        return NormalizedIntervals(df=df, interval_hours=e.interval_hours, warnings=warnings)
+
+    def dr_frame(self, site_id: str) -> pd.DataFrame:
+        """
+        The site in compute_dr_deliverables' interval layout: ts, kw and (when stored) temp.
+        """
+        kw = self.kw(site_id)
+        present = ~np.isnan(kw)
+        cols: Dict[str, Any] = {"ts": self.timestamps(site_id)[present], "kw": np.asarray(kw[present], dtype=float)}
+        temp = self.temperature(site_id)
+        if temp is not None:
+            cols["temp"] = np.asarray(temp[present], dtype=float)
+        return pd.DataFrame(cols)
+
+    def write_site(
+        self,
+        site_id: str,
+        timestamps: Sequence[Any] | pd.Series,
+        kw: Sequence[float] | np.ndarray,
+        *,
+        temp: Sequence[float] | np.ndarray | None = None,
+        interval_seconds: int | None = None,
+    ) -> StoredSite:
+        """
+        Add or replace a site. Readings are placed on a regular grid from the first timestamp
+        (cadence detected unless given); gaps become NaN. A repeated timestamp (e.g. the fall-back
+        hour of a local-time export) keeps its last reading. Timestamps off the grid raise ValueError.
+        Call save_index() once after a batch of writes.
+        """
+        ts = pd.to_datetime(pd.Series(list(timestamps) if not isinstance(timestamps, pd.Series) else timestamps), utc=True)
+        values = np.asarray(kw, dtype=float)
+        if ts.isna().any() or len(ts) != values.size:
+            raise ValueError(f"site {site_id!r}: timestamps must parse and match the kW values one to one")
+        order = np.argsort(ts.to_numpy(), kind="stable")
+        ts = ts.iloc[order].reset_index(drop=True)
+        values = values[order]
+        temps = np.asarray(temp, dtype=float)[order] if temp is not None else None
+        t = ts.to_numpy()
+        last = np.append(t[1:] != t[:-1], True)
+        if not last.all():
+            ts = ts[last].reset_index(drop=True)
+            values = values[last]
+            temps = temps[last] if temps is not None else None
+
+        if interval_seconds is None:
+            step = ts.diff().dropna().median() if len(ts) > 1 else pd.Timedelta(minutes=15)
+            interval_seconds = int(round(step.total_seconds())) if pd.notna(step) else 900
+        if interval_seconds <= 0:
+            raise ValueError(f"site {site_id!r}: interval must be positive")
+
+        offset = (ts - ts.iloc[0]).dt.total_seconds().to_numpy() if len(ts) else np.zeros(0)
+        pos = np.rint(offset / interval_seconds).astype(int)
+        if np.any(np.abs(offset - pos * interval_seconds) > 1e-6) or np.any(np.diff(pos) == 0):
+            raise ValueError(f"site {site_id!r}: timestamps are not on a regular {interval_seconds}s grid")
+        length = int(pos[-1]) + 1 if pos.size else 0
+
+        def grid(v: np.ndarray) -> np.ndarray:
+            out = np.full(length, np.nan)
+            out[pos] = v
+            return out
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        stem = _file_stem(site_id)
+        kw_file = f"{stem}.kw.npy"
+        _atomic_save(self.root / kw_file, grid(values))
+        temp_file = None
+        if temps is not None:
+            temp_file = f"{stem}.temp.npy"
+            _atomic_save(self.root / temp_file, grid(temps))
+        e = StoredSite(
+            site_id=site_id,
+            start=pd.Timestamp(ts.iloc[0]) if len(ts) else pd.Timestamp(0, tz="UTC"),
+            interval_seconds=int(interval_seconds),
+            length=length,
+            kw_file=kw_file,
+            temp_file=temp_file,
+        )
+        self._entries[site_id] = e
+        return e
+
+    def save_index(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        index = self.root / INDEX_FILE
+        tmp = index.with_name(INDEX_FILE + ".tmp")
+        tmp.write_text(
+            json.dumps({"version": _INDEX_VERSION, "sites": [_entry_to_dict(e) for e in self._entries.values()]}, indent=1),
+            encoding="utf-8",
+        )
+        os.replace(tmp, index)
+
+
+@dataclass(frozen=True)
+class IntervalStoreBuild:
+    store: IntervalStore
+    written: List[str]
+    errors: Dict[str, str]  # site id -> "ErrorType: message"
+
+
+def build_interval_store(root: str, files: Iterable[Tuple[str, str]]) -> IntervalStoreBuild:
+    """
+    Convert (site id, interval file) pairs (see load_intervals_file) into a store at root,
+    adding to any sites already there. A site that fails to load or write is reported in errors
+    and skipped; the index is always saved with every site that succeeded.
+    """
+    store = IntervalStore(root)
+    written: List[str] = []
+    errors: Dict[str, str] = {}
+    try:
+        for site_id, path in files:
+            try:
+                norm = normalize_intervals(load_intervals_file(path), timezone="UTC", fill_gaps=False)
+                store.write_site(site_id, norm.df["ts"], norm.df["load_kw"].to_numpy(dtype=float))
+                written.append(site_id)
+            except Exception as e:
+                errors[site_id] = f"{type(e).__name__}: {e}"
+    finally:
+        store.save_index()
+        _STORE_CACHE.pop(os.path.abspath(root), None)
+    return IntervalStoreBuild(store=store, written=written, errors=errors)
+
+
+_STORE_CACHE: Dict[str, Tuple[int, IntervalStore]] = {}
+_STORE_LOCK = threading.Lock()
+
+
+def open_interval_store(root: str) -> IntervalStore:
+    """
+    Per-process cached IntervalStore, re-read when its index file changes.
+    """
+    key = os.path.abspath(root)
+    index = Path(key) / INDEX_FILE
+    if not index.exists():
+        raise FileNotFoundError(f"{root}: no {INDEX_FILE} (not an interval store)")
+    mtime = index.stat().st_mtime_ns
+    with _STORE_LOCK:
+        hit = _STORE_CACHE.get(key)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+    store = IntervalStore(key)
+    with _STORE_LOCK:
+        _STORE_CACHE[key] = (mtime, store)
+    return store
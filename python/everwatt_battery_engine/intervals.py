@@ -1,13 +1,20 @@
 from __future__ import annotations
 
+import json
 from dataclasses import dataclass
-from typing import Iterable, List, Sequence, Tuple
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
 
+import numpy as np
 import pandas as pd
 
 from .types import Interval
 
 
+NEGATIVE_KW_WARNING = "Negative kW values detected (net export). No-export mode may clip discharge accordingly."
+KW_PARSE_WARNING = "Some kW values were blank or failed to parse; those rows were dropped."
+
+
 @dataclass(frozen=True)
 class NormalizedIntervals:
     df: pd.DataFrame  # columns: ts (datetime64[ns, UTC?]), load_kw (float), month_key (str), day_key (str)
@@ -59,6 +66,9 @@ def normalize_intervals(
     if df["ts"].isna().any():
         warnings.append("Some timestamps failed to parse; those rows were dropped.")
         df = df.dropna(subset=["ts"]).copy()
+    if df["load_kw"].isna().any():
+        warnings.append(KW_PARSE_WARNING)
+        df = df.dropna(subset=["load_kw"]).copy()
 
     df = df.sort_values("ts").reset_index(drop=True)
     interval_hours = detect_interval_hours(df["ts"])
@@ -72,7 +82,7 @@ def normalize_intervals(
     # Basic sanity: clamp negatives? (keep as-is; export handling is a tariff/business decision)
     # We only warn here.
     if (df["load_kw"] < 0).any():
-        warnings.append("Negative kW values detected (net export). No-export mode may clip discharge accordingly.")
+        warnings.append(NEGATIVE_KW_WARNING)
 
     # Optionally fill missing intervals
     if fill_gaps and len(df) >= 2:
@@ -96,3 +106,129 @@ def normalize_intervals(
 
     return NormalizedIntervals(df=df, interval_hours=float(interval_hours), warnings=warnings)
 
+
+@dataclass(frozen=True)
+class DemandIntervalFrame:
+    """
+    A normalized frame averaged onto the tariff's demand interval, plus the map back to the
+    original (fine) rows for reporting.
+
+    - df / interval_hours: the aggregated frame the dispatch LP sees
+    - block: aggregated row index of every fine row
+    - fine_ts / fine_load_kw / fine_interval_hours: the original resolution
+    """
+
+    df: pd.DataFrame
+    interval_hours: float
+    block: np.ndarray
+    fine_ts: pd.Series
+    fine_load_kw: np.ndarray
+    fine_interval_hours: float
+
+    def expand(self, coarse: np.ndarray) -> np.ndarray:
+        """
+        Per-interval aggregated values (e.g. charge kW) repeated onto the fine rows.
+        """
+        return np.asarray(coarse, dtype=float)[self.block]
+
+    def expand_boundaries(self, coarse: np.ndarray) -> np.ndarray:
+        """
+        Interval-boundary values (len n + 1, e.g. SOC) interpolated onto the fine boundaries.
+        Exact for SOC: charge and discharge are constant within an aggregated interval.
+        """
+        coarse_t = _boundary_seconds(self.df["ts"], self.interval_hours)
+        fine_t = _boundary_seconds(self.fine_ts, self.fine_interval_hours)
+        return np.interp(fine_t, coarse_t, np.asarray(coarse, dtype=float))
+
+
+def _boundary_seconds(ts: pd.Series, interval_hours: float) -> np.ndarray:
+    t = (ts - ts.iloc[0]).dt.total_seconds().to_numpy(dtype=float)
+    return np.append(t, t[-1] + interval_hours * 3600.0)
+
+
+def aggregate_to_demand_interval(
+    df: pd.DataFrame,
+    interval_hours: float,
+    demand_interval_minutes: int,
+) -> DemandIntervalFrame | None:
+    """
+    Average a normalized frame (see normalize_intervals) onto clock-aligned demand intervals, the
+    resolution demand charges are billed on. Returns None when the data is already at (or coarser
+    than) that resolution.
+
+    Each aggregated kW is the mean of the rows present in its interval, so complete intervals keep
+    their energy exactly; month/day keys are recomputed from the interval start.
+    """
+    minutes = int(demand_interval_minutes)
+    if minutes <= 0:
+        raise ValueError("demand_interval_minutes must be positive")
+    target_h = minutes / 60.0
+    if len(df) < 2 or float(interval_hours) >= target_h - 1e-9:
+        return None
+
+    start = df["ts"].dt.floor(f"{minutes}min")
+    block, block_start = pd.factorize(start, sort=True)
+    load = df["load_kw"].to_numpy(dtype=float)
+    sums = np.bincount(block, weights=load, minlength=len(block_start))
+    counts = np.bincount(block, minlength=len(block_start))
+
+    agg = pd.DataFrame({"ts": block_start, "load_kw": sums / counts})
+    agg["month_key"] = agg["ts"].dt.strftime("%Y-%m")
+    agg["day_key"] = agg["ts"].dt.strftime("%Y-%m-%d")
+    return DemandIntervalFrame(
+        df=agg,
+        interval_hours=float(target_h),
+        block=block.astype(int),
+        fine_ts=df["ts"].reset_index(drop=True),
+        fine_load_kw=load,
+        fine_interval_hours=float(interval_hours),
+    )
+
+
+# Column/key names accepted by load_intervals_file, in priority order.
+_TS_KEYS = ("timestamp", "ts", "timestampIso", "Start Date Time")
+_KW_KEYS = ("kw", "kW", "demand", "Peak Demand")
+
+
+def _pick_key(keys: Iterable[str], candidates: Sequence[str]) -> str | None:
+    present = set(keys)
+    return next((k for k in candidates if k in present), None)
+
+
+def _kw_value(v: Any) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def load_intervals_file(path: str) -> List[Interval]:
+    """
+    Read an interval file into Interval rows.
+
+    - .json: a list of {timestamp|ts|timestampIso, kw|demand} objects, or {"intervals": [...]}
+    - .csv: a header row with one timestamp column and one kW column (same names, plus PG&E
+      "Start Date Time" / "Peak Demand" exports)
+
+    Blank or unparseable kW readings load as NaN in either format; normalize_intervals drops
+    those rows with a warning rather than reading them as 0 kW.
+    """
+    p = Path(path)
+    if p.suffix.lower() == ".json":
+        raw: Any = json.loads(p.read_text(encoding="utf-8-sig"))
+        rows: List[Dict[str, Any]] = raw.get("intervals", []) if isinstance(raw, dict) else list(raw)
+        if not rows:
+            return []
+        ts_key = _pick_key(rows[0].keys(), _TS_KEYS)
+        kw_key = _pick_key(rows[0].keys(), _KW_KEYS)
+        if ts_key is None or kw_key is None:
+            raise ValueError(f"{path}: interval objects must include a timestamp and a kW field")
+        return [Interval(timestamp=str(r.get(ts_key)), kw=_kw_value(r.get(kw_key))) for r in rows]
+
+    df = pd.read_csv(p, encoding="utf-8-sig")
+    ts_key = _pick_key(df.columns, _TS_KEYS)
+    kw_key = _pick_key(df.columns, _KW_KEYS)
+    if ts_key is None or kw_key is None:
+        raise ValueError(f"{path}: CSV must include a timestamp and a kW column")
+    kw = pd.to_numeric(df[kw_key], errors="coerce").astype(float)
+    return [Interval(timestamp=str(t), kw=float(v)) for t, v in zip(df[ts_key].astype(str), kw)]
@@ -1,36 +1,215 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Sequence, Tuple
+import asyncio
+import heapq
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
 import numpy as np
 import pandas as pd
 
-from .battery_catalog import load_battery_catalog_csv
+from .battery_catalog import load_battery_catalog
 from .bundles import generate_candidate_bundles
-from .dispatch_lp import optimize_bill_lp
-from .intervals import normalize_intervals
-from .pricing import make_offers
-from .tariffs.base import to_tariff_intervals
-from .tariffs.bill import calculate_bill
-from .tariffs.option_s import build_option_s_rate_plan, option_s_eligibility_required_kw
-from .tariffs.pge_b19 import b19_tou_bucket, build_pge_b19_rate_plan
-from .types import BatterySKU, Bundle, Interval, OptimizationConfig, OptimizationResult, TariffScenarioSpec
+from .evaluation import (
+    DispatchSummary,
+    SiteContext,
+    build_site_context,
+    evaluate_dispatch,
+    full_horizon_savings,
+    full_resolution_savings,
+    savings_upper_bound,
+    scenario_applies,
+    scenarios_for_rate,
+)
+from .interval_store import open_interval_store
+from .intervals import DemandIntervalFrame, NormalizedIntervals, aggregate_to_demand_interval, normalize_intervals
+from .parallel import DispatchPool, DispatchTask, resolve_worker_count
+from .pricing import expected_tsv_upper_bound, make_offer_arrays, make_offers, rank_offer_arrays
+from .surrogate import fit_savings_surface, select_design, unit_box
+from .tariffs.base import RatePlan
+from .types import (
+    BatterySKU,
+    Bundle,
+    Interval,
+    OptimizationConfig,
+    OptimizationProgress,
+    OptimizationResult,
+    OptimizationRun,
+    OptimizationStats,
+    TariffScenarioSpec,
+)
 
 
 def _bundle_units(bundle: Bundle) -> int:
     return int(sum(int(v) for v in bundle.sku_qty.values()))
 
 
+def _series_list(arr: np.ndarray | None) -> List[float] | None:
+    return arr.tolist() if arr is not None else None
+
+
+def best_offer_key(res: OptimizationResult) -> Tuple[float, float]:
+    """
+    Ranking key: best offer per result, prioritizing EVERWATT_ENGINE mode first, then PROFIT, then CUSTOMER.
+    """
+    offer_by_mode = {o.mode.value: o for o in res.offers}
+    if "everwatt_engine" in offer_by_mode:
+        o = offer_by_mode["everwatt_engine"]
+        return (float(o.expected_tsv or o.tsv), float(o.gross_margin_usd))
+    if "profit_max" in offer_by_mode:
+        o = offer_by_mode["profit_max"]
+        return (float(o.tsv), float(o.gross_margin_usd))
+    o = res.offers[0]
+    return (float(o.tsv), float(o.gross_margin_usd))
+
+
+def _build_result(
+    ctx: SiteContext,
+    bundle: Bundle,
+    sc: TariffScenarioSpec,
+    summary: DispatchSummary,
+) -> OptimizationResult | None:
+    """
+    Scalar-only result (no dispatch series); see _with_series.
+    """
+    savings = float(summary.savings_usd_per_year)
+    if savings <= 0:
+        return None
+
+    offers = make_offers(
+        capex_usd=bundle.capex_usd,
+        savings_usd_per_year=savings,
+        sku_unit_count=_bundle_units(bundle),
+        cfg=ctx.cfg,
+    )
+    if not offers:
+        return None
+
+    return OptimizationResult(
+        scenario=sc,
+        bundle=bundle,
+        baseline_bill_usd_per_year=float(ctx.baseline_bill_usd_per_year.get(sc.id, 0.0)),
+        optimized_bill_usd_per_year=float(summary.optimized_bill_usd_per_year),
+        savings_usd_per_year=savings,
+        peak_kw_before=float(ctx.baseline_peak_kw.get(sc.id, 0.0)),
+        peak_kw_after=float(summary.peak_kw_after),
+        offers=offers,
+        solver_status=summary.solver_status,
+    )
+
+
+def _with_series(res: OptimizationResult, summary: DispatchSummary) -> OptimizationResult:
+    return replace(
+        res,
+        net_kw_series=_series_list(summary.net_kw_series),
+        charge_kw_series=_series_list(summary.charge_kw_series),
+        discharge_kw_series=_series_list(summary.discharge_kw_series),
+        soc_kwh_series=_series_list(summary.soc_kwh_series),
+    )
+
+
+def _fine_series(res: OptimizationResult, agg: DemandIntervalFrame) -> OptimizationResult:
+    # Charge/discharge are constant within a demand interval; net load uses the original readings.
+    if res.charge_kw_series is None or res.discharge_kw_series is None:
+        return res
+    charge = agg.expand(np.asarray(res.charge_kw_series))
+    discharge = agg.expand(np.asarray(res.discharge_kw_series))
+    soc = agg.expand_boundaries(np.asarray(res.soc_kwh_series)) if res.soc_kwh_series is not None else None
+    return replace(
+        res,
+        net_kw_series=(agg.fine_load_kw + charge - discharge).tolist(),
+        charge_kw_series=charge.tolist(),
+        discharge_kw_series=discharge.tolist(),
+        soc_kwh_series=_series_list(soc),
+    )
+
+
+@dataclass(order=True)
+class _Leader:
+    """
+    Top-N heap entry. Ordering matches the final ranking (key desc, then canonical task order asc),
+    so the heap root is always the current N-th best.
+    """
+
+    primary: float
+    secondary: float
+    neg_pos: int
+    result: OptimizationResult = field(compare=False)
+    summary: DispatchSummary = field(compare=False)
+
+
+def _ranked_leaders(leaders: List[_Leader]) -> List[_Leader]:
+    return sorted(leaders, reverse=True)
+
+
+def _offer_to_leaders(
+    leaders: List[_Leader], res: OptimizationResult | None, summary: DispatchSummary, pos: int, top_n: int
+) -> bool:
+    """
+    Offer a result for task position pos to the top-N heap; True when the top N changed.
+    """
+    if res is None or top_n <= 0:
+        return False
+    primary, secondary = best_offer_key(res)
+    entry = _Leader(primary, secondary, -pos, res, summary)
+    if len(leaders) < top_n:
+        heapq.heappush(leaders, entry)
+        return True
+    if entry > leaders[0]:
+        heapq.heapreplace(leaders, entry)
+        return True
+    return False
+
+
+def _leaders_with_series(ctx: SiteContext, leaders: List[_Leader], pool: DispatchPool | None) -> List[_Leader]:
+    """
+    Pool summaries are scalar-only, so the final leaders are re-solved (on the pool) for their
+    dispatch series; in-process summaries already carry them.
+    """
+    missing = [e for e in leaders if e.summary.net_kw_series is None]
+    if not missing:
+        return leaders
+    tasks = [(e.summary.bundle_index, e.result.bundle, e.result.scenario) for e in missing]
+    if pool is not None:
+        summaries: Iterator[DispatchSummary] = pool.map(tasks, series=True)
+    else:
+        summaries = (evaluate_dispatch(ctx, bi, bundle, sc) for bi, bundle, sc in tasks)
+    fetched = iter(summaries)
+    return [replace(e, summary=next(fetched)) if e.summary.net_kw_series is None else e for e in leaders]
+
+
+def _task_rank_upper_bound(ctx: SiteContext, task: DispatchTask) -> float:
+    _bi, bundle, sc = task
+    return expected_tsv_upper_bound(
+        capex_usd=bundle.capex_usd,
+        savings_upper_bound_usd_per_year=savings_upper_bound(ctx, bundle, sc),
+        sku_unit_count=_bundle_units(bundle),
+        cfg=ctx.cfg,
+    )
+
+
+def _cannot_reach(bound: float, nth_best: float) -> bool:
+    # Small slack so LP round-off can never prune a task that would tie the N-th best.
+    return bool(bound + 1e-9 * abs(bound) + 1e-6 < nth_best)
+
+
 def optimize_battery_solutions(
     *,
-    intervals: Sequence[Interval],
+    intervals: Sequence[Interval] = (),
     battery_catalog_csv: str,
     tariff_rate_code: str = "B-19",
     cfg: OptimizationConfig | None = None,
     top_n: int = 10,
     candidate_caps: int = 15,
     variations_per_cap: int = 8,
+    workers: int = 1,
+    prune: bool = True,
+    interval_store: str | None = None,
+    site_id: str | None = None,
 ) -> List[OptimizationResult]:
     """
     Orchestrator:
@@ -40,29 +219,375 @@ def optimize_battery_solutions(
       - PG&E B-19 baseline
       - Option S scenario gated by 10% inverter rule
       - no export by default
+
+    See run_battery_optimization for workers/prune, interval stores and run statistics.
+    """
+    return run_battery_optimization(
+        intervals=intervals,
+        battery_catalog_csv=battery_catalog_csv,
+        tariff_rate_code=tariff_rate_code,
+        cfg=cfg,
+        top_n=top_n,
+        candidate_caps=candidate_caps,
+        variations_per_cap=variations_per_cap,
+        workers=workers,
+        prune=prune,
+        interval_store=interval_store,
+        site_id=site_id,
+    ).results
+
+
+def run_battery_optimization(
+    *,
+    intervals: Sequence[Interval] = (),
+    battery_catalog_csv: str,
+    tariff_rate_code: str = "B-19",
+    cfg: OptimizationConfig | None = None,
+    top_n: int = 10,
+    candidate_caps: int = 15,
+    variations_per_cap: int = 8,
+    workers: int = 1,
+    prune: bool = True,
+    interval_store: str | None = None,
+    site_id: str | None = None,
+) -> OptimizationRun:
+    """
+    optimize_battery_solutions plus run statistics.
+
+    - workers > 1 solves bundle x scenario LPs on a process pool (workers <= 0 uses every core).
+    - prune=True visits tasks in descending order of a cheap expected-TSV upper bound and skips the
+      LP for any task whose bound cannot beat the current N-th best. The returned top N is the same
+      as an exhaustive run; stats.dispatch_skipped reports how many solves were avoided.
+
+    Results are identical, and identically ordered, for any worker count.
+
+    interval_store / site_id read the site from an IntervalStore instead of intervals (no parsing).
     """
     cfg = cfg or OptimizationConfig()
 
-    norm = normalize_intervals(intervals, timezone="UTC", fill_gaps=False)
-    df = norm.df
-    h = norm.interval_hours
-    day_count = int(df["day_key"].nunique()) if len(df) else 0
-    annualization_factor = float(365.0 / day_count) if day_count > 0 else 1.0
+    norm = _site_intervals(intervals, interval_store, site_id)
 
     # Load battery library
-    skus = load_battery_catalog_csv(battery_catalog_csv)
+    skus = load_battery_catalog(battery_catalog_csv).active
+
+    return optimize_site(
+        norm.df,
+        norm.interval_hours,
+        skus=skus,
+        tariff_rate_code=tariff_rate_code,
+        cfg=cfg,
+        top_n=top_n,
+        candidate_caps=candidate_caps,
+        variations_per_cap=variations_per_cap,
+        workers=workers,
+        prune=prune,
+    )
+
+
+def _site_intervals(
+    intervals: Sequence[Interval], interval_store: str | None, site_id: str | None
+) -> NormalizedIntervals:
+    if interval_store is None:
+        return normalize_intervals(intervals, timezone="UTC", fill_gaps=False)
+    if site_id is None:
+        raise ValueError("site_id is required with interval_store")
+    if intervals:
+        raise ValueError("Pass either intervals or interval_store, not both")
+    return open_interval_store(interval_store).normalized(site_id)
+
+
+def optimize_site(
+    df: pd.DataFrame,
+    interval_hours: float,
+    *,
+    skus: Sequence[BatterySKU],
+    tariff_rate_code: str = "B-19",
+    cfg: OptimizationConfig | None = None,
+    top_n: int = 10,
+    candidate_caps: int = 15,
+    variations_per_cap: int = 8,
+    workers: int = 1,
+    prune: bool = True,
+    rate_plans: Dict[str, RatePlan] | None = None,
+) -> OptimizationRun:
+    """
+    Core of run_battery_optimization for an already-normalized interval frame.
+
+    Batch callers pass a pre-loaded catalog (skus) and pre-built rate_plans so neither is rebuilt per site.
+    """
+    last: OptimizationProgress | None = None
+    for last in iter_site_optimization(
+        df,
+        interval_hours,
+        skus=skus,
+        tariff_rate_code=tariff_rate_code,
+        cfg=cfg,
+        top_n=top_n,
+        candidate_caps=candidate_caps,
+        variations_per_cap=variations_per_cap,
+        workers=workers,
+        prune=prune,
+        rate_plans=rate_plans,
+    ):
+        pass
+    if last is None or last.stats is None:
+        raise RuntimeError("Optimizer ended without a final progress event")
+    return OptimizationRun(results=last.top, stats=last.stats)
+
+
+def iter_battery_optimization(
+    *,
+    intervals: Sequence[Interval] = (),
+    battery_catalog_csv: str,
+    tariff_rate_code: str = "B-19",
+    cfg: OptimizationConfig | None = None,
+    top_n: int = 10,
+    candidate_caps: int = 15,
+    variations_per_cap: int = 8,
+    workers: int = 1,
+    prune: bool = True,
+    cancel: Callable[[], bool] | None = None,
+    interval_store: str | None = None,
+    site_id: str | None = None,
+) -> Iterator[OptimizationProgress]:
+    """
+    Generator variant of run_battery_optimization (see iter_site_optimization for the event stream).
+    """
+    norm = _site_intervals(intervals, interval_store, site_id)
+    skus = load_battery_catalog(battery_catalog_csv).active
+    yield from iter_site_optimization(
+        norm.df,
+        norm.interval_hours,
+        skus=skus,
+        tariff_rate_code=tariff_rate_code,
+        cfg=cfg,
+        top_n=top_n,
+        candidate_caps=candidate_caps,
+        variations_per_cap=variations_per_cap,
+        workers=workers,
+        prune=prune,
+        cancel=cancel,
+    )
+
+
+async def aiter_battery_optimization(**kwargs: Any) -> AsyncIterator[OptimizationProgress]:
+    """
+    Async wrapper over iter_battery_optimization (same keyword arguments).
+
+    The generator runs on one dedicated thread so the event loop stays responsive. Cancelling the
+    consuming task (or closing this iterator) sets the generator's cancel flag, waits for the step
+    in flight to return, then closes the generator, which shuts down any solver pool.
+    """
+    stop = threading.Event()
+    user_cancel = kwargs.pop("cancel", None)
+
+    def cancel() -> bool:
+        return stop.is_set() or (user_cancel is not None and bool(user_cancel()))
+
+    gen = iter_battery_optimization(**kwargs, cancel=cancel)
+    done = object()
+    # A single thread: every next() and the final close() run in order, never concurrently
+    runner = ThreadPoolExecutor(max_workers=1)
+    try:
+        while True:
+            event = await asyncio.wrap_future(runner.submit(next, gen, done))
+            if event is done:
+                return
+            yield event  # type: ignore[misc]
+    finally:
+        stop.set()
+        closing = runner.submit(gen.close)
+        runner.shutdown(wait=False)
+        await asyncio.shield(asyncio.wrap_future(closing))
+
+
+def iter_site_optimization(
+    df: pd.DataFrame,
+    interval_hours: float,
+    *,
+    skus: Sequence[BatterySKU],
+    tariff_rate_code: str = "B-19",
+    cfg: OptimizationConfig | None = None,
+    top_n: int = 10,
+    candidate_caps: int = 15,
+    variations_per_cap: int = 8,
+    workers: int = 1,
+    prune: bool = True,
+    rate_plans: Dict[str, RatePlan] | None = None,
+    cancel: Callable[[], bool] | None = None,
+) -> Iterator[OptimizationProgress]:
+    """
+    Incremental optimizer: yields an OptimizationProgress after every dispatch task, carrying the
+    provisional top N (re-ranked only when a new result enters it) and an ETA.
+
+    Memory stays bounded: only the current top N are retained, in a fixed-size heap, and only they
+    hold dispatch series (as arrays); everything else is dropped as soon as it is ranked out.
+    Provisional top-N results are scalar-only; the final event attaches series. Pool workers only
+    ship scalars back, so a multi-worker run re-solves its final top N for their series (skipped
+    when cancelled, whose results then carry none).
+
+    The last event has done=True and stats set; its top is the final ranked result list.
+    Cancellation: return True from cancel() (checked between tasks) or close() the generator;
+    either way queued solves are dropped and the solver pool is shut down.
+
+    With cfg.demand_interval_minutes set, finer data is dispatched on the aggregated demand
+    intervals and the final results' series are expanded back onto the original rows.
+    """
+    started = time.perf_counter()
+    cfg = cfg or OptimizationConfig()
+    if cfg.demand_interval_minutes is not None:
+        agg = aggregate_to_demand_interval(df, interval_hours, cfg.demand_interval_minutes)
+        if agg is not None:
+            inner = iter_site_optimization(
+                agg.df,
+                agg.interval_hours,
+                skus=skus,
+                tariff_rate_code=tariff_rate_code,
+                cfg=cfg,
+                top_n=top_n,
+                candidate_caps=candidate_caps,
+                variations_per_cap=variations_per_cap,
+                workers=workers,
+                prune=prune,
+                rate_plans=rate_plans,
+                cancel=cancel,
+            )
+            try:
+                for event in inner:
+                    yield replace(event, top=[_fine_series(r, agg) for r in event.top]) if event.done else event
+            finally:
+                inner.close()
+            return
+    h = float(interval_hours)
+    bundles, scenarios, ctx, tasks = _site_tasks(
+        df,
+        h,
+        skus=skus,
+        tariff_rate_code=tariff_rate_code,
+        cfg=cfg,
+        candidate_caps=candidate_caps,
+        variations_per_cap=variations_per_cap,
+        rate_plans=rate_plans,
+    )
+    top_n = int(top_n)
+    if cfg.surrogate_design_points is not None and cfg.steered_search:
+        raise ValueError("surrogate_design_points and steered_search are alternative sizing modes; set one")
+    if cfg.steered_search:
+        yield from _iter_steered_optimization(
+            df, h, bundles=bundles, scenarios=scenarios, ctx=ctx, tasks=tasks, top_n=top_n, workers=workers,
+            started=started, cancel=cancel,
+        )
+        return
+    if cfg.surrogate_design_points is not None:
+        yield from _iter_surrogate_optimization(
+            df, h, bundles=bundles, scenarios=scenarios, ctx=ctx, tasks=tasks, top_n=top_n, workers=workers,
+            started=started, cancel=cancel,
+        )
+        return
+    prune = bool(prune) and top_n > 0
+
+    # Visit order: best bound first, so once one task cannot reach the top N none of the rest can.
+    order = list(range(len(tasks)))
+    bounds: List[float] = []
+    if prune:
+        bounds = [_task_rank_upper_bound(ctx, t) for t in tasks]
+        order.sort(key=lambda i: bounds[i], reverse=True)
+
+    n_workers = resolve_worker_count(workers)
+    pool: DispatchPool | None = None
+    if n_workers > 1 and len(tasks) > 1:
+        pool = DispatchPool(df=df, interval_hours=h, scenarios=scenarios, cfg=cfg, workers=n_workers)
+    # Prune between small batches; without pruning everything goes out as one batch.
+    batch_size = (2 * pool.workers if pool is not None else 1) if prune else max(1, len(tasks))
+
+    scenario_by_id = {sc.id: sc for sc in scenarios}
+    leaders: List[_Leader] = []  # min-heap: the best N seen so far, worst at the root
+    top: List[OptimizationResult] = []
+    solved = 0
+    skipped = 0
+    cancelled = False
+    solve_started = time.perf_counter()
+
+    def progress(top_changed: bool) -> OptimizationProgress:
+        done_count = solved + skipped
+        remaining = len(tasks) - done_count
+        eta = None
+        if solved > 0:
+            # Upper estimate: assumes every remaining task is solved (pruning only shortens it).
+            eta = (time.perf_counter() - solve_started) / solved * remaining
+        return OptimizationProgress(
+            tasks_done=done_count,
+            tasks_total=len(tasks),
+            elapsed_seconds=time.perf_counter() - started,
+            eta_seconds=eta,
+            top=top,
+            top_changed=top_changed,
+        )
+
+    try:
+        pos = 0
+        while pos < len(order) and not cancelled:
+            batch: List[int] = []
+            while pos < len(order) and len(batch) < batch_size:
+                i = order[pos]
+                if prune and len(leaders) >= top_n and _cannot_reach(bounds[i], leaders[0].primary):
+                    break
+                batch.append(i)
+                pos += 1
+            if not batch:
+                skipped = len(order) - pos
+                break
+
+            batch_tasks = [tasks[i] for i in batch]
+            if pool is not None:
+                summaries: Iterator[DispatchSummary] = pool.map(batch_tasks)
+            else:
+                summaries = (evaluate_dispatch(ctx, bi, bundle, sc) for bi, bundle, sc in batch_tasks)
+
+            for i, summary in zip(batch, summaries):
+                solved += 1
+                res = _build_result(ctx, bundles[summary.bundle_index], scenario_by_id[summary.scenario_id], summary)
+                changed = _offer_to_leaders(leaders, res, summary, i, top_n)
+                if changed:
+                    top = [e.result for e in _ranked_leaders(leaders)]
+                yield progress(changed)
+                if cancel is not None and cancel():
+                    cancelled = True
+                    break
+        if not cancelled:
+            leaders = _leaders_with_series(ctx, leaders, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+
+    yield _final_event(
+        ctx,
+        leaders,
+        bundle_count=len(bundles),
+        tasks_total=len(tasks),
+        solved=solved,
+        skipped=skipped,
+        cancelled=cancelled,
+        started=started,
+    )
+
+
+def _site_tasks(
+    df: pd.DataFrame,
+    h: float,
+    *,
+    skus: Sequence[BatterySKU],
+    tariff_rate_code: str,
+    cfg: OptimizationConfig,
+    candidate_caps: int,
+    variations_per_cap: int,
+    rate_plans: Dict[str, RatePlan] | None,
+) -> Tuple[List[Bundle], List[TariffScenarioSpec], SiteContext, List[DispatchTask]]:
     skus = [s for s in skus if s.active]
     skus_by_id = {s.id: s for s in skus}
 
     # Tariff scenarios
-    scenarios: List[TariffScenarioSpec] = []
-    if tariff_rate_code.upper().replace(" ", "") in ("B-19", "B19"):
-        scenarios.append(TariffScenarioSpec(id="pge_b19", name="PG&E B-19", kind="pge_b19"))
-        scenarios.append(TariffScenarioSpec(id="pge_option_s", name="PG&E Option S (gated)", kind="pge_option_s"))
-    else:
-        # Stub: treat any other rate as B-19 for now
-        scenarios.append(TariffScenarioSpec(id="pge_b19", name=f"Stub rate for {tariff_rate_code}", kind="pge_b19"))
-        scenarios.append(TariffScenarioSpec(id="pge_option_s", name="PG&E Option S (gated)", kind="pge_option_s"))
+    scenarios = scenarios_for_rate(tariff_rate_code)
 
     # Candidate bundles
     bundles = generate_candidate_bundles(
@@ -77,107 +602,342 @@ def optimize_battery_solutions(
         fixed_soft_costs_usd=cfg.fixed_soft_costs_usd,
     )
 
-    # Convert to tariff intervals once (TOU mapper differs by scenario, but for now both use B-19 mapping)
-    base_tariff_intervals = to_tariff_intervals(df, tou_mapper=b19_tou_bucket, interval_hours=h)
-
-    # Baseline bills per scenario (no battery)
-    baseline_bill: Dict[str, float] = {}
-    baseline_peak: Dict[str, float] = {}
-
-    # Rate plans
-    b19_plan = build_pge_b19_rate_plan()
-    # Option S: demand structure + B19 energy as default hook
-    option_s_plan = build_option_s_rate_plan(energy_rate_per_kWh=b19_plan.energy_rate_per_kWh)
-
-    for sc in scenarios:
-        if sc.kind == "pge_b19":
-            bill = calculate_bill(base_tariff_intervals, b19_plan)
-            baseline_bill[sc.id] = float(bill.bill_usd) * annualization_factor
-            baseline_peak[sc.id] = bill.peak_kw
-        elif sc.kind == "pge_option_s":
-            bill = calculate_bill(base_tariff_intervals, option_s_plan)
-            baseline_bill[sc.id] = float(bill.bill_usd) * annualization_factor
-            baseline_peak[sc.id] = bill.peak_kw
-
-    # Evaluate bundle + scenario
-    results: List[OptimizationResult] = []
-
-    # Option S eligibility threshold (site-level)
-    peak12, min_kw_required = option_s_eligibility_required_kw(base_tariff_intervals)
-
-    for bundle in bundles:
-        # Skip degenerate bundles
-        if bundle.total_power_kw <= 0 or bundle.total_energy_kwh <= 0:
-            continue
-
-        for sc in scenarios:
-            if sc.kind == "pge_b19":
-                plan = b19_plan
-            elif sc.kind == "pge_option_s":
-                # Gate on 10% rule
-                if bundle.total_power_kw < min_kw_required:
+    # Tariff intervals, rate plans and baseline bills per scenario (no battery)
+    ctx = build_site_context(df, h, scenarios, cfg, rate_plans=rate_plans)
+
+    # Bundle x scenario tasks in canonical (bundle, scenario) order
+    tasks: List[DispatchTask] = [
+        (bi, bundle, sc) for bi, bundle in enumerate(bundles) for sc in scenarios if scenario_applies(ctx, bundle, sc)
+    ]
+    return bundles, scenarios, ctx, tasks
+
+
+def _final_event(
+    ctx: SiteContext,
+    leaders: List[_Leader],
+    *,
+    bundle_count: int,
+    tasks_total: int,
+    solved: int,
+    skipped: int,
+    cancelled: bool,
+    started: float,
+    surrogate_error: float | None = None,
+) -> OptimizationProgress:
+    ranked_leaders = _ranked_leaders(leaders)
+    horizon_error: float | None = None
+    rep_days = ctx.representative_days
+    if rep_days is not None and ranked_leaders and not cancelled:
+        # Validate the reduced horizon on the leading result with one full-horizon solve.
+        best = ranked_leaders[0].result
+        full = full_horizon_savings(ctx, best.bundle, best.scenario)
+        horizon_error = float(abs(best.savings_usd_per_year - full) / max(abs(full), 1e-9))
+    reduced_lp_error: float | None = None
+    if (ctx.cfg.coarsen_noncritical or ctx.cfg.critical_window_dispatch) and ranked_leaders and not cancelled:
+        best = ranked_leaders[0].result
+        full = full_resolution_savings(ctx, best.bundle, best.scenario)
+        reduced_lp_error = float(abs(best.savings_usd_per_year - full) / max(abs(full), 1e-9))
+
+    stats = OptimizationStats(
+        bundle_count=bundle_count,
+        dispatch_tasks=tasks_total,
+        dispatch_solved=solved,
+        dispatch_skipped=skipped,
+        horizon_days=len(rep_days.day_keys) if rep_days is not None else None,
+        horizon_total_days=rep_days.total_days if rep_days is not None else None,
+        horizon_savings_error_frac=horizon_error,
+        surrogate_savings_error_frac=surrogate_error,
+        reduced_lp_savings_error_frac=reduced_lp_error,
+    )
+    return OptimizationProgress(
+        tasks_done=solved + skipped,
+        tasks_total=tasks_total,
+        elapsed_seconds=time.perf_counter() - started,
+        eta_seconds=0.0,
+        top=[_with_series(e.result, e.summary) for e in ranked_leaders],
+        top_changed=True,
+        done=True,
+        cancelled=cancelled,
+        stats=stats,
+    )
+
+
+def _iter_surrogate_optimization(
+    df: pd.DataFrame,
+    h: float,
+    *,
+    bundles: List[Bundle],
+    scenarios: List[TariffScenarioSpec],
+    ctx: SiteContext,
+    tasks: List[DispatchTask],
+    top_n: int,
+    workers: int,
+    started: float,
+    cancel: Callable[[], bool] | None,
+) -> Iterator[OptimizationProgress]:
+    """
+    Surrogate sizing (cfg.surrogate_design_points), same event stream as iter_site_optimization:
+
+    1. per scenario, solve a space-filling design of (P, E, RTE) points;
+    2. fit a savings response surface per scenario and price every remaining task on its predicted
+       savings (vectorized offers, orchestrator ranking);
+    3. solve only the predicted shortlist (surrogate_shortlist_factor * top_n).
+
+    The final top N is ranked on LP savings only; predictions never reach the results.
+    """
+    cfg = ctx.cfg
+    design_n = max(1, int(cfg.surrogate_design_points or 0))
+    shortlist_n = max(top_n, int(math.ceil(float(cfg.surrogate_shortlist_factor) * top_n)))
+    X = np.array(
+        [[b.total_power_kw, b.total_energy_kwh, b.round_trip_efficiency] for _bi, b, _sc in tasks], dtype=float
+    ).reshape(len(tasks), 3)
+    by_scenario: Dict[str, List[int]] = {}
+    for i, (_bi, _b, sc) in enumerate(tasks):
+        by_scenario.setdefault(sc.id, []).append(i)
+    design = sorted(idx[k] for idx in by_scenario.values() for k in select_design(X[idx], design_n))
+
+    scenario_by_id = {sc.id: sc for sc in scenarios}
+    n_workers = resolve_worker_count(workers)
+    pool: DispatchPool | None = None
+    if n_workers > 1 and len(tasks) > 1:
+        pool = DispatchPool(df=df, interval_hours=h, scenarios=scenarios, cfg=cfg, workers=n_workers)
+
+    leaders: List[_Leader] = []
+    top: List[OptimizationResult] = []
+    lp_savings: Dict[int, float] = {}
+    predicted: Dict[int, float] = {}
+    planned = len(design) + min(shortlist_n, len(tasks) - len(design))
+    skipped = 0
+    cancelled = False
+    solve_started = time.perf_counter()
+
+    def progress(top_changed: bool) -> OptimizationProgress:
+        solved = len(lp_savings)
+        eta = (time.perf_counter() - solve_started) / solved * max(0, planned - solved) if solved else None
+        return OptimizationProgress(
+            tasks_done=solved + skipped,
+            tasks_total=len(tasks),
+            elapsed_seconds=time.perf_counter() - started,
+            eta_seconds=eta,
+            top=top,
+            top_changed=top_changed,
+        )
+
+    def solve(positions: List[int]) -> Iterator[OptimizationProgress]:
+        nonlocal top, cancelled
+        batch = [tasks[i] for i in positions]
+        if pool is not None:
+            summaries: Iterator[DispatchSummary] = pool.map(batch)
+        else:
+            summaries = (evaluate_dispatch(ctx, bi, bundle, sc) for bi, bundle, sc in batch)
+        for i, summary in zip(positions, summaries):
+            lp_savings[i] = float(summary.savings_usd_per_year)
+            res = _build_result(ctx, bundles[summary.bundle_index], scenario_by_id[summary.scenario_id], summary)
+            changed = _offer_to_leaders(leaders, res, summary, i, top_n)
+            if changed:
+                top = [e.result for e in _ranked_leaders(leaders)]
+            yield progress(changed)
+            if cancel is not None and cancel():
+                cancelled = True
+                return
+
+    try:
+        yield from solve(design)
+
+        rest = [i for i in range(len(tasks)) if i not in lp_savings]
+        if rest and not cancelled and top_n > 0:
+            for sc_id, idx in by_scenario.items():
+                fit_idx = [i for i in idx if i in lp_savings]
+                pred_idx = [i for i in idx if i not in lp_savings]
+                if not pred_idx:
                     continue
-                plan = option_s_plan
-            else:
-                continue
-
-            base_bill = float(baseline_bill.get(sc.id, 0.0))
-            base_peak = float(baseline_peak.get(sc.id, 0.0))
-
-            dispatch = optimize_bill_lp(
-                base_tariff_intervals,
-                bundle=bundle,
-                rate_plan=plan,
-                interval_hours=h,
-                no_export=cfg.no_export,
-                interconnect_kw=cfg.interconnect_kw,
+                lo, scale = unit_box(X[idx])
+                surface = fit_savings_surface(
+                    X[fit_idx], np.array([lp_savings[i] for i in fit_idx]), lo=lo, scale=scale
+                )
+                predicted.update(zip(pred_idx, surface.predict(X[pred_idx]).tolist()))
+
+            rest_bundles = [tasks[i][1] for i in rest]
+            sellable, offers = make_offer_arrays(
+                capex_usd=np.array([b.capex_usd for b in rest_bundles], dtype=float),
+                savings_usd_per_year=np.array([predicted[i] for i in rest], dtype=float),
+                sku_unit_count=np.array([_bundle_units(b) for b in rest_bundles], dtype=float),
+                payback_ceiling_years=cfg.payback_ceiling_years,
+                close_prob_mid_payback_years=cfg.close_prob_mid_payback_years,
+                close_prob_steepness=cfg.close_prob_steepness,
+                price_grid_points=cfg.price_grid_points,
+                golden_section=cfg.engine_price_golden_section,
             )
+            order, ok = rank_offer_arrays(sellable, offers, shortlist_n)
+            shortlist = sorted(rest[k] for k in order[ok].tolist())
+            planned = len(design) + len(shortlist)
+            skipped = len(rest) - len(shortlist)
+            yield from solve(shortlist)
+        elif not cancelled:
+            skipped = len(rest)
+        if not cancelled:
+            leaders = _leaders_with_series(ctx, leaders, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+
+    confirmed = [i for i in predicted if i in lp_savings]
+    error: float | None = None
+    if confirmed:
+        error = float(
+            np.mean([abs(predicted[i] - lp_savings[i]) / max(abs(lp_savings[i]), 1.0) for i in confirmed])
+        )
+    yield _final_event(
+        ctx,
+        leaders,
+        bundle_count=len(bundles),
+        tasks_total=len(tasks),
+        solved=len(lp_savings),
+        skipped=skipped,
+        cancelled=cancelled,
+        started=started,
+        surrogate_error=error,
+    )
 
-            optimized_bill_annual = float(dispatch.bill_usd) * annualization_factor
-            savings = float(base_bill - optimized_bill_annual)
-            if savings <= 0:
-                continue
 
-            offers = make_offers(
-                capex_usd=bundle.capex_usd,
-                savings_usd_per_year=savings,
-                sku_unit_count=_bundle_units(bundle),
+def _iter_steered_optimization(
+    df: pd.DataFrame,
+    h: float,
+    *,
+    bundles: List[Bundle],
+    scenarios: List[TariffScenarioSpec],
+    ctx: SiteContext,
+    tasks: List[DispatchTask],
+    top_n: int,
+    workers: int,
+    started: float,
+    cancel: Callable[[], bool] | None,
+) -> Iterator[OptimizationProgress]:
+    """
+    Dual-steered search (cfg.steered_search), same event stream as iter_site_optimization.
+
+    Every task starts with the cheap savings upper bound. Each LP solve also returns marginal
+    values g = ($/kW-yr, $/kWh-yr); since savings are concave in (P, E) for a fixed RTE, the
+    tangent plane S + g . (dP, dE) over-estimates every other bundle of that scenario, and each
+    unsolved estimate is lowered to the smallest plane seen. Tasks are solved best-first by the
+    expected-TSV bound of their estimate, and the search stops once the best remaining bound
+    cannot reach the N-th best result.
+
+    Bundles mixing SKUs of different efficiency make the planes a (close) approximation rather
+    than a strict bound, so the result can differ from the exhaustive run in rare near-ties.
+    """
+    cfg = ctx.cfg
+    scenario_by_id = {sc.id: sc for sc in scenarios}
+    PE = np.array([[b.total_power_kw, b.total_energy_kwh] for _bi, b, _sc in tasks], dtype=float).reshape(len(tasks), 2)
+    scen = np.array([sc.id for _bi, _b, sc in tasks], dtype=object)
+    estimate = np.array([savings_upper_bound(ctx, b, sc) for _bi, b, sc in tasks], dtype=float)
+    bound = np.array(
+        [
+            expected_tsv_upper_bound(
+                capex_usd=b.capex_usd,
+                savings_upper_bound_usd_per_year=float(estimate[i]),
+                sku_unit_count=_bundle_units(b),
                 cfg=cfg,
             )
-            if not offers:
-                continue
-
-            results.append(
-                OptimizationResult(
-                    scenario=sc,
-                    bundle=bundle,
-                    baseline_bill_usd_per_year=base_bill,
-                    optimized_bill_usd_per_year=optimized_bill_annual,
-                    savings_usd_per_year=savings,
-                    peak_kw_before=base_peak,
-                    peak_kw_after=float(max(dispatch.net_load_series) if dispatch.net_load_series else 0.0),
-                    offers=offers,
-                    net_kw_series=dispatch.net_load_series,
-                    charge_kw_series=dispatch.charge_kw_series,
-                    discharge_kw_series=dispatch.discharge_kw_series,
-                    soc_kwh_series=dispatch.soc_kwh_series,
-                    solver_status=dispatch.solver_status,
-                )
+            for i, (_bi, b, _sc) in enumerate(tasks)
+        ],
+        dtype=float,
+    )
+    open_mask = np.ones(len(tasks), dtype=bool)
+
+    n_workers = resolve_worker_count(workers)
+    pool: DispatchPool | None = None
+    if n_workers > 1 and len(tasks) > 1:
+        pool = DispatchPool(
+            df=df, interval_hours=h, scenarios=scenarios, cfg=cfg, workers=n_workers, marginal_values=True
+        )
+    batch_size = pool.workers if pool is not None else 1
+
+    leaders: List[_Leader] = []
+    top: List[OptimizationResult] = []
+    solved = 0
+    skipped = 0
+    cancelled = False
+    solve_started = time.perf_counter()
+
+    def progress(top_changed: bool) -> OptimizationProgress:
+        remaining = int(open_mask.sum())
+        eta = (time.perf_counter() - solve_started) / solved * remaining if solved else None
+        return OptimizationProgress(
+            tasks_done=solved + skipped,
+            tasks_total=len(tasks),
+            elapsed_seconds=time.perf_counter() - started,
+            eta_seconds=eta,
+            top=top,
+            top_changed=top_changed,
+        )
+
+    def tighten(i: int, summary: DispatchSummary) -> None:
+        g_kw = summary.marginal_usd_per_kw_year
+        g_kwh = summary.marginal_usd_per_kwh_year
+        if g_kw is None or g_kwh is None:
+            return
+        same = np.flatnonzero(open_mask & (scen == summary.scenario_id))
+        if same.size == 0:
+            return
+        d = PE[same] - PE[i]
+        plane = float(summary.savings_usd_per_year) + g_kw * d[:, 0] + g_kwh * d[:, 1]
+        lowered = same[plane < estimate[same]]
+        for k in lowered.tolist():
+            estimate[k] = plane[np.searchsorted(same, k)]
+            b = tasks[k][1]
+            bound[k] = expected_tsv_upper_bound(
+                capex_usd=b.capex_usd,
+                savings_upper_bound_usd_per_year=float(estimate[k]),
+                sku_unit_count=_bundle_units(b),
+                cfg=cfg,
             )
 
-    # Rank and return top N:
-    # Use best offer per result: prioritize EVERWATT_ENGINE mode first, then PROFIT, then CUSTOMER.
-    def best_offer_key(res: OptimizationResult) -> Tuple[float, float]:
-        offer_by_mode = {o.mode.value: o for o in res.offers}
-        if "everwatt_engine" in offer_by_mode:
-            o = offer_by_mode["everwatt_engine"]
-            return (float(o.expected_tsv or o.tsv), float(o.gross_margin_usd))
-        if "profit_max" in offer_by_mode:
-            o = offer_by_mode["profit_max"]
-            return (float(o.tsv), float(o.gross_margin_usd))
-        o = res.offers[0]
-        return (float(o.tsv), float(o.gross_margin_usd))
+    try:
+        while open_mask.any() and not cancelled:
+            cand = np.flatnonzero(open_mask)
+            # Best bound first; canonical position breaks ties so runs are deterministic
+            ranked = cand[np.lexsort((cand, -bound[cand]))]
+            batch: List[int] = []
+            for i in ranked[:batch_size].tolist():
+                if top_n > 0 and len(leaders) >= top_n and _cannot_reach(float(bound[i]), leaders[0].primary):
+                    break
+                batch.append(i)
+            if not batch or top_n <= 0:
+                skipped = int(open_mask.sum())
+                open_mask[:] = False
+                break
+            open_mask[batch] = False
 
-    results.sort(key=lambda r: best_offer_key(r), reverse=True)
-    return results[: int(top_n)]
+            batch_tasks = [tasks[i] for i in batch]
+            if pool is not None:
+                summaries: Iterator[DispatchSummary] = pool.map(batch_tasks)
+            else:
+                summaries = (evaluate_dispatch(ctx, bi, b, sc, marginal_values=True) for bi, b, sc in batch_tasks)
+            for i, summary in zip(batch, summaries):
+                solved += 1
+                tighten(i, summary)
+                res = _build_result(ctx, bundles[summary.bundle_index], scenario_by_id[summary.scenario_id], summary)
+                changed = _offer_to_leaders(leaders, res, summary, i, top_n)
+                if changed:
+                    top = [e.result for e in _ranked_leaders(leaders)]
+                yield progress(changed)
+                if cancel is not None and cancel():
+                    cancelled = True
+                    break
+        if not cancelled:
+            leaders = _leaders_with_series(ctx, leaders, pool)
+    finally:
+        if pool is not None:
+            pool.close()
 
+    yield _final_event(
+        ctx,
+        leaders,
+        bundle_count=len(bundles),
+        tasks_total=len(tasks),
+        solved=solved,
+        skipped=skipped,
+        cancelled=cancelled,
+        started=started,
+    )
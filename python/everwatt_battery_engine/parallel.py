@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterator, List, Sequence, Tuple
+
+import pandas as pd
+
+from .evaluation import DispatchSummary, SiteContext, build_site_context, evaluate_dispatch
+from .types import Bundle, OptimizationConfig, TariffScenarioSpec
+
+# (bundle_index, bundle, scenario)
+DispatchTask = Tuple[int, Bundle, TariffScenarioSpec]
+
+# Per-process site context, compiled once by the pool initializer.
+_WORKER_CTX: SiteContext | None = None
+_WORKER_MARGINALS = False
+
+# Tasks per submitted chunk, at most: bounds what map() holds in flight on large batches.
+_MAX_CHUNK = 8
+
+
+def resolve_worker_count(workers: int | None) -> int:
+    """
+    workers <= 0 (or None) means "use every core".
+    """
+    if workers is None or int(workers) <= 0:
+        return int(os.cpu_count() or 1)
+    return int(workers)
+
+
+def _init_worker(
+    df: pd.DataFrame,
+    interval_hours: float,
+    scenarios: List[TariffScenarioSpec],
+    cfg: OptimizationConfig,
+    marginal_values: bool = False,
+) -> None:
+    # Rate plans hold closures (not picklable), so each worker compiles its own copy from the
+    # normalized frame. This happens once per worker, never per task.
+    global _WORKER_CTX, _WORKER_MARGINALS
+    _WORKER_CTX = build_site_context(df, interval_hours, scenarios, cfg)
+    _WORKER_MARGINALS = bool(marginal_values)
+
+
+def _solve_chunk(tasks: Sequence[DispatchTask], series: bool) -> List[DispatchSummary]:
+    if _WORKER_CTX is None:
+        raise RuntimeError("Dispatch worker used before initialization")
+    return [
+        evaluate_dispatch(_WORKER_CTX, bi, bundle, sc, marginal_values=_WORKER_MARGINALS, series=series)
+        for bi, bundle, sc in tasks
+    ]
+
+
+class DispatchPool:
+    """
+    Process pool whose workers hold one site's compiled context.
+
+    map() yields summaries in task order (not completion order), so downstream ranking is
+    identical for any worker count. The pool can be fed several batches, which lets the
+    orchestrator prune later tasks based on earlier results.
+
+    Summaries are scalar-only unless map(series=True): a year of 15-minute series is ~1 MB per
+    task to pickle back, and all but the top N would be dropped on arrival.
+    """
+
+    def __init__(
+        self,
+        *,
+        df: pd.DataFrame,
+        interval_hours: float,
+        scenarios: Sequence[TariffScenarioSpec],
+        cfg: OptimizationConfig,
+        workers: int,
+        marginal_values: bool = False,
+    ) -> None:
+        self.workers = max(1, resolve_worker_count(workers))
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(df, float(interval_hours), list(scenarios), cfg, bool(marginal_values)),
+        )
+
+    def map(self, tasks: Sequence[DispatchTask], *, series: bool = False) -> Iterator[DispatchSummary]:
+        if not tasks:
+            return iter(())
+        # A few chunks per worker keeps IPC overhead low while still balancing uneven LP times.
+        chunksize = max(1, min(_MAX_CHUNK, len(tasks) // (self.workers * 4)))
+        return self._windowed(tasks, chunksize, series)
+
+    def _windowed(self, tasks: Sequence[DispatchTask], chunksize: int, series: bool) -> Iterator[DispatchSummary]:
+        # At most 2 chunks per worker in flight: Executor.map would submit every task up front and
+        # queue every finished summary in the parent until the consumer reached it.
+        window = 2 * self.workers
+        pending: Deque[Future] = deque()
+        submitted = 0
+        try:
+            while submitted < len(tasks) or pending:
+                while submitted < len(tasks) and len(pending) < window:
+                    chunk = tasks[submitted : submitted + chunksize]
+                    pending.append(self._executor.submit(_solve_chunk, chunk, series))
+                    submitted += len(chunk)
+                yield from pending.popleft().result()
+        finally:
+            # Abandoned early (cancellation): queued chunks are dropped
+            for fut in pending:
+                fut.cancel()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "DispatchPool":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
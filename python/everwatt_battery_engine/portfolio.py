@@ -0,0 +1,464 @@
+from __future__ import annotations
+
+import json
+import time
+import traceback
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Sequence
+
+import pandas as pd
+
+from .analysis_store import analyze_site_dispatch, reprice_site, site_analysis_from_dict, site_analysis_to_dict
+from .battery_catalog import BatteryCatalog, load_battery_catalog
+from .evaluation import build_rate_plans
+from .interval_store import open_interval_store
+from .intervals import NormalizedIntervals, load_intervals_file, normalize_intervals
+from .optimize import optimize_site
+from .parallel import resolve_worker_count
+from .tariffs.base import RatePlan
+from .types import OptimizationConfig, OptimizationResult, OptimizationRun, OptimizationStats
+
+
+@dataclass(frozen=True)
+class PortfolioSite:
+    site_id: str
+    intervals_path: str
+    tariff_rate_code: str = "B-19"
+    # Read the site from this IntervalStore root (by site_id) instead of parsing intervals_path
+    interval_store: str | None = None
+
+
+@dataclass(frozen=True)
+class PortfolioSummary:
+    sites_total: int
+    sites_ok: int
+    sites_failed: int
+    output_path: str
+    elapsed_seconds: float
+
+
+@dataclass(frozen=True)
+class _PortfolioOptions:
+    cfg: OptimizationConfig
+    top_n: int
+    candidate_caps: int
+    variations_per_cap: int
+    prune: bool
+    include_series: bool
+    store_analysis: bool = False
+
+
+_INTERVAL_SUFFIXES = (".csv", ".json")
+
+
+def discover_sites(intervals_dir: str, *, tariff_rate_code: str = "B-19") -> List[PortfolioSite]:
+    """
+    One site per interval file (*.csv / *.json) in a directory; the site id is the file stem.
+    """
+    root = Path(intervals_dir)
+    files = sorted(p for p in root.iterdir() if p.is_file() and p.suffix.lower() in _INTERVAL_SUFFIXES)
+    return [PortfolioSite(site_id=p.stem, intervals_path=str(p), tariff_rate_code=tariff_rate_code) for p in files]
+
+
+def sites_from_store(store_root: str, *, tariff_rate_code: str = "B-19") -> List[PortfolioSite]:
+    """
+    One site per IntervalStore entry (see interval_store.build_interval_store), in index order.
+    """
+    store = open_interval_store(store_root)
+    return [
+        PortfolioSite(
+            site_id=site_id,
+            intervals_path=str(store.root / store.entry(site_id).kw_file),
+            tariff_rate_code=tariff_rate_code,
+            interval_store=str(store.root),
+        )
+        for site_id in store.site_ids
+    ]
+
+
+def load_manifest(path: str, *, default_tariff_rate_code: str = "B-19") -> List[PortfolioSite]:
+    """
+    Manifest rows: site id, interval file path (relative paths resolve against the manifest) and
+    optional rate code. Accepts CSV (site_id, intervals_path, tariff_rate_code) or JSON
+    ([{siteId, intervalsPath, tariffRateCode}] or {"sites": [...]}).
+    """
+    p = Path(path)
+    if p.suffix.lower() == ".json":
+        raw: Any = json.loads(p.read_text(encoding="utf-8-sig"))
+        rows: List[Dict[str, Any]] = raw.get("sites", []) if isinstance(raw, dict) else list(raw)
+    else:
+        rows = pd.read_csv(p, dtype=str, keep_default_na=False).to_dict(orient="records")
+
+    sites: List[PortfolioSite] = []
+    for row in rows:
+        site_id = str(row.get("siteId") or row.get("site_id") or "").strip()
+        interval_path = str(row.get("intervalsPath") or row.get("intervals_path") or row.get("path") or "").strip()
+        if not site_id or not interval_path:
+            raise ValueError(f"{path}: every manifest row needs a site id and an interval file path")
+        rate = str(row.get("tariffRateCode") or row.get("tariff_rate_code") or default_tariff_rate_code).strip()
+        resolved = Path(interval_path)
+        if not resolved.is_absolute():
+            resolved = p.parent / resolved
+        sites.append(PortfolioSite(site_id=site_id, intervals_path=str(resolved), tariff_rate_code=rate))
+    return sites
+
+
+def optimization_result_to_dict(res: OptimizationResult, *, include_series: bool = False) -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "scenarioId": res.scenario.id,
+        "scenarioName": res.scenario.name,
+        "skuQty": dict(res.bundle.sku_qty),
+        "totalPowerKw": res.bundle.total_power_kw,
+        "totalEnergyKwh": res.bundle.total_energy_kwh,
+        "roundTripEfficiency": res.bundle.round_trip_efficiency,
+        "capexUsd": res.bundle.capex_usd,
+        "baselineBillUsdPerYear": res.baseline_bill_usd_per_year,
+        "optimizedBillUsdPerYear": res.optimized_bill_usd_per_year,
+        "savingsUsdPerYear": res.savings_usd_per_year,
+        "peakKwBefore": res.peak_kw_before,
+        "peakKwAfter": res.peak_kw_after,
+        "solverStatus": res.solver_status,
+        "offers": [
+            {
+                "mode": o.mode.value,
+                "priceUsd": o.price_usd,
+                "paybackYears": o.payback_years,
+                "grossMarginUsd": o.gross_margin_usd,
+                "grossMarginFrac": o.gross_margin_frac,
+                "tsv": o.tsv,
+                "roi": o.roi,
+                "closeProbability": o.close_probability,
+                "expectedTsv": o.expected_tsv,
+            }
+            for o in res.offers
+        ],
+    }
+    if include_series:
+        out["netKwSeries"] = res.net_kw_series
+        out["chargeKwSeries"] = res.charge_kw_series
+        out["dischargeKwSeries"] = res.discharge_kw_series
+        out["socKwhSeries"] = res.soc_kwh_series
+    return out
+
+
+class JsonlResultStore:
+    """
+    JSON-lines output (truncated on open): one record per site, flushed as soon as the site finishes.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = str(path)
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "w", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._fh.write(json.dumps(record, default=_json_default) + "\n")
+        self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def __enter__(self) -> "JsonlResultStore":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+@contextmanager
+def _optional_store(path: str | None) -> Iterator[JsonlResultStore | None]:
+    if path is None:
+        yield None
+        return
+    with JsonlResultStore(path) as store:
+        yield store
+
+
+def _json_default(v: object) -> object:
+    # numpy scalars are not JSON-native
+    if hasattr(v, "item"):
+        return v.item()  # type: ignore[attr-defined]
+    raise TypeError(f"Object of type {type(v).__name__} is not JSON serializable")
+
+
+# Per-process shared state: the catalog and rate plans are loaded/built once per worker, not per site.
+_CATALOG: BatteryCatalog | None = None
+_RATE_PLANS: Dict[str, RatePlan] | None = None
+_OPTIONS: _PortfolioOptions | None = None
+
+
+def _init_portfolio_worker(battery_catalog_csv: str, options: _PortfolioOptions) -> None:
+    global _CATALOG, _RATE_PLANS, _OPTIONS
+    _CATALOG = load_battery_catalog(battery_catalog_csv)
+    _RATE_PLANS = build_rate_plans()
+    _OPTIONS = options
+
+
+def _site_record(
+    site: PortfolioSite,
+    run: OptimizationRun,
+    warnings: List[str],
+    seconds: float,
+    options: _PortfolioOptions,
+) -> Dict[str, Any]:
+    return {
+        "siteId": site.site_id,
+        "status": "ok",
+        "intervalsPath": site.intervals_path,
+        "tariffRateCode": site.tariff_rate_code,
+        "elapsedSeconds": seconds,
+        "warnings": warnings,
+        "stats": {
+            "bundleCount": run.stats.bundle_count,
+            "dispatchTasks": run.stats.dispatch_tasks,
+            "dispatchSolved": run.stats.dispatch_solved,
+            "dispatchSkipped": run.stats.dispatch_skipped,
+        },
+        "results": [optimization_result_to_dict(r, include_series=options.include_series) for r in run.results],
+    }
+
+
+def _run_site(site: PortfolioSite) -> Dict[str, Any]:
+    """
+    Optimize one site; any failure becomes an error record so one bad meter never sinks the batch.
+    """
+    started = time.perf_counter()
+    try:
+        if _CATALOG is None or _RATE_PLANS is None or _OPTIONS is None:
+            raise RuntimeError("Portfolio worker used before initialization")
+        norm = _site_intervals(site)
+        if norm.df.empty:
+            raise ValueError("no parseable intervals")
+        if _OPTIONS.store_analysis:
+            return _analyze_site(site, norm.df, norm.interval_hours, norm.warnings, started)
+        run = optimize_site(
+            norm.df,
+            norm.interval_hours,
+            skus=_CATALOG.active,
+            tariff_rate_code=site.tariff_rate_code,
+            cfg=_OPTIONS.cfg,
+            top_n=_OPTIONS.top_n,
+            candidate_caps=_OPTIONS.candidate_caps,
+            variations_per_cap=_OPTIONS.variations_per_cap,
+            workers=1,
+            prune=_OPTIONS.prune,
+            rate_plans=_RATE_PLANS,
+        )
+        return _site_record(site, run, norm.warnings, time.perf_counter() - started, _OPTIONS)
+    except Exception as e:
+        return _error_record(site, f"{type(e).__name__}: {e}", traceback.format_exc(), time.perf_counter() - started)
+
+
+def _site_intervals(site: PortfolioSite) -> NormalizedIntervals:
+    if site.interval_store is not None:
+        return open_interval_store(site.interval_store).normalized(site.site_id)
+    return normalize_intervals(load_intervals_file(site.intervals_path), timezone="UTC", fill_gaps=False)
+
+
+def _analyze_site(
+    site: PortfolioSite, df: pd.DataFrame, interval_hours: float, warnings: List[str], started: float
+) -> Dict[str, Any]:
+    # Every task solved once (no pruning), ranked by the same vectorized path reprice_portfolio uses;
+    # the price-independent analysis rides along in the record for the parent to store.
+    if _CATALOG is None or _RATE_PLANS is None or _OPTIONS is None:
+        raise RuntimeError("Portfolio worker used before initialization")
+    analysis = analyze_site_dispatch(
+        df,
+        interval_hours,
+        skus=_CATALOG.active,
+        site_id=site.site_id,
+        tariff_rate_code=site.tariff_rate_code,
+        cfg=_OPTIONS.cfg,
+        candidate_caps=_OPTIONS.candidate_caps,
+        variations_per_cap=_OPTIONS.variations_per_cap,
+        rate_plans=_RATE_PLANS,
+    )
+    results = reprice_site(analysis, _CATALOG, cfg=_OPTIONS.cfg, top_n=_OPTIONS.top_n).results
+    stats = _analysis_stats(analysis.tasks, len(analysis.outcomes), len(analysis.bundles))
+    run = OptimizationRun(results=results, stats=stats)
+    record = _site_record(site, run, warnings, time.perf_counter() - started, _OPTIONS)
+    stored = site_analysis_to_dict(analysis)
+    stored["intervalsPath"] = site.intervals_path
+    record["analysis"] = stored
+    return record
+
+
+def _analysis_stats(tasks: Sequence[object], solved: int, bundle_count: int) -> OptimizationStats:
+    return OptimizationStats(
+        bundle_count=bundle_count,
+        dispatch_tasks=len(tasks),
+        dispatch_solved=solved,
+        dispatch_skipped=len(tasks) - solved,
+    )
+
+
+def _error_record(site: PortfolioSite, error: str, trace: str | None, seconds: float) -> Dict[str, Any]:
+    return {
+        "siteId": site.site_id,
+        "status": "error",
+        "intervalsPath": site.intervals_path,
+        "tariffRateCode": site.tariff_rate_code,
+        "elapsedSeconds": seconds,
+        "error": error,
+        "traceback": trace,
+    }
+
+
+def optimize_portfolio(
+    sites: Sequence[PortfolioSite],
+    *,
+    battery_catalog_csv: str,
+    output_path: str,
+    cfg: OptimizationConfig | None = None,
+    top_n: int = 10,
+    candidate_caps: int = 15,
+    variations_per_cap: int = 8,
+    workers: int = 1,
+    prune: bool = True,
+    include_series: bool = False,
+    analysis_path: str | None = None,
+    on_record: Callable[[Dict[str, Any]], None] | None = None,
+) -> PortfolioSummary:
+    """
+    Optimize many sites in one call.
+
+    - The catalog and rate plans are loaded once per worker process and shared by every site it runs.
+    - Sites are scheduled over a process pool (workers <= 0 uses every core); each site is solved
+      serially inside its worker, which keeps all cores busy without nested pools.
+    - Records stream to output_path (JSON lines) in completion order as sites finish; a failing
+      site produces a status="error" record instead of aborting the batch.
+    - analysis_path additionally stores each site's price-independent dispatch outcomes (JSON lines)
+      for reprice_portfolio. Such runs solve every distinct bundle signature (prune is ignored) and
+      cannot include dispatch series.
+    """
+    if analysis_path is not None and include_series:
+        raise ValueError("include_series is not available when storing analyses (analysis_path)")
+    started = time.perf_counter()
+    options = _PortfolioOptions(
+        cfg=cfg or OptimizationConfig(),
+        top_n=int(top_n),
+        candidate_caps=int(candidate_caps),
+        variations_per_cap=int(variations_per_cap),
+        prune=bool(prune),
+        include_series=bool(include_series),
+        store_analysis=analysis_path is not None,
+    )
+    ok = 0
+    failed = 0
+
+    with JsonlResultStore(output_path) as store, _optional_store(analysis_path) as analyses:
+
+        def emit(record: Dict[str, Any]) -> None:
+            nonlocal ok, failed
+            if record.get("status") == "ok":
+                ok += 1
+            else:
+                failed += 1
+            analysis = record.pop("analysis", None)
+            if analyses is not None and analysis is not None:
+                analyses.write(analysis)
+            store.write(record)
+            if on_record is not None:
+                on_record(record)
+
+        n_workers = min(resolve_worker_count(workers), max(1, len(sites)))
+        if n_workers <= 1:
+            _init_portfolio_worker(battery_catalog_csv, options)
+            for site in sites:
+                emit(_run_site(site))
+        else:
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_init_portfolio_worker,
+                initargs=(battery_catalog_csv, options),
+            ) as pool:
+                pending: Dict[Future[Dict[str, Any]], PortfolioSite] = {pool.submit(_run_site, s): s for s in sites}
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        site = pending.pop(fut)
+                        try:
+                            emit(fut.result())
+                        except Exception as e:
+                            # Worker process died (e.g. killed for memory); Python-level errors never get here.
+                            emit(_error_record(site, f"{type(e).__name__}: {e}", None, 0.0))
+
+    return PortfolioSummary(
+        sites_total=len(sites),
+        sites_ok=ok,
+        sites_failed=failed,
+        output_path=str(output_path),
+        elapsed_seconds=time.perf_counter() - started,
+    )
+
+
+def reprice_portfolio(
+    analysis_path: str,
+    *,
+    battery_catalog_csv: str,
+    output_path: str,
+    cfg: OptimizationConfig | None = None,
+    top_n: int = 10,
+    on_record: Callable[[Dict[str, Any]], None] | None = None,
+) -> PortfolioSummary:
+    """
+    Re-rank every stored site analysis under a new catalog price list (and/or pricing config)
+    without any solver call; records have the optimize_portfolio format (scalars only).
+    See reprice_site for what a price change can and cannot move. cfg=None prices each site under
+    the dispatch config it was analyzed with; a cfg changing dispatch fields fails that site.
+    """
+    started = time.perf_counter()
+    catalog = load_battery_catalog(battery_catalog_csv)
+    options = _PortfolioOptions(
+        cfg=cfg or OptimizationConfig(),
+        top_n=int(top_n),
+        candidate_caps=0,
+        variations_per_cap=0,
+        prune=False,
+        include_series=False,
+    )
+    ok = 0
+    failed = 0
+    total = 0
+    with JsonlResultStore(output_path) as store, open(analysis_path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            total += 1
+            site_started = time.perf_counter()
+            raw: Dict[str, Any] = json.loads(line)
+            site = PortfolioSite(
+                site_id=str(raw.get("siteId")),
+                intervals_path=str(raw.get("intervalsPath") or ""),
+                tariff_rate_code=str(raw.get("tariffRateCode") or "B-19"),
+            )
+            try:
+                analysis = site_analysis_from_dict(raw)
+                repriced = reprice_site(analysis, catalog, cfg=cfg, top_n=options.top_n)
+                # Same accounting as the run that stored the analysis: its outcomes are the LPs solved
+                stats = _analysis_stats(analysis.tasks, len(analysis.outcomes), len(analysis.bundles))
+                run = OptimizationRun(results=repriced.results, stats=stats)
+                record = _site_record(site, run, [], time.perf_counter() - site_started, options)
+                # Share of the new prices' candidate tasks with a stored outcome; < 1 means a full
+                # rerun could propose bundles this re-price could not evaluate.
+                record["repriceCoverage"] = repriced.coverage
+                ok += 1
+            except Exception as e:
+                record = _error_record(
+                    site, f"{type(e).__name__}: {e}", traceback.format_exc(), time.perf_counter() - site_started
+                )
+                failed += 1
+            store.write(record)
+            if on_record is not None:
+                on_record(record)
+
+    return PortfolioSummary(
+        sites_total=total,
+        sites_ok=ok,
+        sites_failed=failed,
+        output_path=str(output_path),
+        elapsed_seconds=time.perf_counter() - started,
+    )
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
 import math
-from dataclasses import dataclass
-from typing import List, Sequence
+from dataclasses import dataclass, replace
+from typing import Dict, List, Sequence, Tuple
 
 import numpy as np
 
@@ -31,6 +31,40 @@ def close_probability_model(payback_years: float, units: int, cfg: OptimizationC
     return float(max(0.0, min(1.0, p * complexity)))
 
 
+def expected_tsv_upper_bound(
+    *,
+    capex_usd: float,
+    savings_upper_bound_usd_per_year: float,
+    sku_unit_count: int,
+    cfg: OptimizationConfig,
+    segments: int = 64,
+) -> float:
+    """
+    Upper bound on the EVERWATT_ENGINE expected TSV that make_offers can return for any
+    annual savings <= savings_upper_bound_usd_per_year.
+
+    Expected TSV at price x*S is p(x) * (S - C/x): increasing in S for every payback x, and the
+    price range [C, ceiling*S] only widens with S, so we bound at S_ub. On each payback segment
+    [a, b], p(x) <= p(a) (close probability falls with payback) and S - C/x <= S - C/b.
+    Returns -inf when nothing is sellable (make_offers would return no offers).
+    """
+    S = float(savings_upper_bound_usd_per_year)
+    C = float(capex_usd)
+    if S <= 0:
+        return float("-inf")
+    max_price = float(cfg.payback_ceiling_years * S)
+    if max_price < C:
+        return float("-inf")
+
+    edges = np.linspace(C, max_price, int(max(2, segments)) + 1)
+    best = 0.0
+    for a, b in zip(edges[:-1], edges[1:]):
+        p = close_probability_model(_safe_div(float(a), S), sku_unit_count, cfg)
+        gm_frac = float(1.0 - C / b) if b > 0 else 0.0
+        best = max(best, p * S * gm_frac)
+    return float(best)
+
+
 def make_offers(
     *,
     capex_usd: float,
@@ -43,6 +77,7 @@ def make_offers(
     - PROFIT_MAX: push to payback ceiling
     - CUSTOMER_BENEFIT: price at CapEx (max ROI)
     - EVERWATT_ENGINE: choose price within [CapEx, payback_ceiling*savings] that maximizes expected TSV
+      (best of cfg.price_grid_points grid prices, or the exact optimum with cfg.engine_price_golden_section)
     """
     S = float(savings_usd_per_year)
     C = float(capex_usd)
@@ -94,19 +129,23 @@ def make_offers(
     # Profit max: price at payback ceiling
     offers.append(offer_at_price(OptimizationMode.PROFIT_MAX, max_price))
 
-    # EverWatt engine: maximize expected TSV over a grid
-    grid_n = int(max(5, cfg.price_grid_points))
-    prices = np.linspace(C, max_price, grid_n)
-    best = None
-    best_score = -1e18
-    for p in prices:
-        off = offer_at_price(OptimizationMode.EVERWATT_ENGINE, float(p), include_expected=True)
-        score = float(off.expected_tsv if off.expected_tsv is not None else off.tsv)
-        if score > best_score:
-            best_score = score
-            best = off
-    if best is not None:
-        offers.append(best)
+    # EverWatt engine: maximize expected TSV exactly, or over a grid
+    if cfg.engine_price_golden_section:
+        price = _golden_engine_price_scalar(C, S, sku_unit_count, cfg, max_price)
+        offers.append(offer_at_price(OptimizationMode.EVERWATT_ENGINE, price, include_expected=True))
+    else:
+        grid_n = int(max(5, cfg.price_grid_points))
+        prices = np.linspace(C, max_price, grid_n)
+        best = None
+        best_score = -1e18
+        for p in prices:
+            off = offer_at_price(OptimizationMode.EVERWATT_ENGINE, float(p), include_expected=True)
+            score = float(off.expected_tsv if off.expected_tsv is not None else off.tsv)
+            if score > best_score:
+                best_score = score
+                best = off
+        if best is not None:
+            offers.append(best)
 
     # Stable ordering: profit, engine, customer (UI-friendly)
     order = {
@@ -117,3 +156,257 @@ def make_offers(
     offers.sort(key=lambda o: order.get(o.mode, 99))
     return offers
 
+
+@dataclass(frozen=True)
+class OfferArrays:
+    """
+    Vectorized counterpart of a PriceOffer: every field has the broadcast shape of the inputs.
+    close_probability / expected_tsv are only set for EVERWATT_ENGINE.
+    """
+
+    mode: OptimizationMode
+    price_usd: np.ndarray
+    payback_years: np.ndarray
+    gross_margin_usd: np.ndarray
+    gross_margin_frac: np.ndarray
+    tsv: np.ndarray
+    roi: np.ndarray
+    close_probability: np.ndarray | None = None
+    expected_tsv: np.ndarray | None = None
+
+
+def close_probability_array(payback_years: np.ndarray, units: np.ndarray, mid: np.ndarray, steepness: np.ndarray) -> np.ndarray:
+    """
+    close_probability_model over arrays (all arguments broadcast).
+    """
+    x = (mid - payback_years) / np.maximum(1e-6, steepness)
+    with np.errstate(over="ignore"):
+        p = 1.0 / (1.0 + np.exp(-x))
+    complexity = 1.0 / (1.0 + 0.05 * np.maximum(0, units - 1))
+    return np.clip(p * complexity, 0.0, 1.0)
+
+
+def _offer_fields(mode: OptimizationMode, price: np.ndarray, S: np.ndarray, C: np.ndarray) -> OfferArrays:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payback = np.where(S != 0, price / S, np.inf)
+        gm_usd = price - C
+        gm_frac = np.where(price > 0, gm_usd / price, 0.0)
+        roi = np.where(price > 0, S / price, 0.0)
+    return OfferArrays(
+        mode=mode,
+        price_usd=price,
+        payback_years=payback,
+        gross_margin_usd=gm_usd,
+        gross_margin_frac=gm_frac,
+        tsv=S * gm_frac,
+        roi=roi,
+    )
+
+
+# Golden-section search: expected TSV p(x/S) * S * (1 - C/x) is log-concave in the price x (log of a
+# falling logistic plus log(1 - C/x)), hence unimodal on [C, max_price].
+_INV_PHI = (math.sqrt(5.0) - 1.0) / 2.0
+_GOLDEN_TOLERANCE = 1e-9  # bracket width relative to max_price - C
+_GOLDEN_ITERATIONS = int(math.ceil(math.log(_GOLDEN_TOLERANCE) / math.log(_INV_PHI)))
+
+
+def _expected_tsv_at(
+    prices: np.ndarray, C: np.ndarray, S: np.ndarray, units: np.ndarray, mid: np.ndarray, steep: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    # (close probability, expected TSV) at prices; the other arguments broadcast against prices
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payback = np.where(S != 0, prices / S, np.inf)
+        gm_frac = np.where(prices > 0, (prices - C) / prices, 0.0)
+        p = close_probability_array(payback, units, mid, steep)
+        return p, p * (S * gm_frac)
+
+
+def _golden_engine_price(
+    C: np.ndarray, S: np.ndarray, units: np.ndarray, mid: np.ndarray, steep: np.ndarray, max_price: np.ndarray
+) -> np.ndarray:
+    """
+    Expected-TSV maximizing price in [C, max_price], elementwise (one evaluation per iteration).
+    """
+    def f(x: np.ndarray) -> np.ndarray:
+        return _expected_tsv_at(x, C, S, units, mid, steep)[1]
+
+    lo = C.astype(float, copy=True)
+    hi = max_price.astype(float, copy=True)
+    x1 = hi - _INV_PHI * (hi - lo)
+    x2 = lo + _INV_PHI * (hi - lo)
+    f1, f2 = f(x1), f(x2)
+    for _ in range(_GOLDEN_ITERATIONS):
+        left = f1 >= f2  # maximum lies in [lo, x2]
+        hi = np.where(left, x2, hi)
+        lo = np.where(left, lo, x1)
+        x_new = np.where(left, hi - _INV_PHI * (hi - lo), lo + _INV_PHI * (hi - lo))
+        f_new = f(x_new)
+        x1, x2, f1, f2 = (
+            np.where(left, x_new, x2),
+            np.where(left, x1, x_new),
+            np.where(left, f_new, f2),
+            np.where(left, f1, f_new),
+        )
+    x = 0.5 * (lo + hi)
+    # The bracket converges onto the ceiling when expected TSV still rises there; price it exactly.
+    return np.where(f(max_price) > f(x), max_price, x)
+
+
+def _golden_engine_price_scalar(C: float, S: float, units: int, cfg: OptimizationConfig, max_price: float) -> float:
+    """
+    _golden_engine_price for one result in plain floats: make_offers runs once per solved task, and
+    numpy's per-call overhead on size-1 arrays made the array search ~15x slower than the grid.
+    """
+    def f(x: float) -> float:
+        gm_frac = (x - C) / x if x > 0 else 0.0
+        return close_probability_model(x / S, units, cfg) * S * gm_frac
+
+    lo, hi = C, max_price
+    x1 = hi - _INV_PHI * (hi - lo)
+    x2 = lo + _INV_PHI * (hi - lo)
+    f1, f2 = f(x1), f(x2)
+    for _ in range(_GOLDEN_ITERATIONS):
+        if f1 >= f2:  # maximum lies in [lo, x2]
+            hi, x2, f2 = x2, x1, f1
+            x1 = hi - _INV_PHI * (hi - lo)
+            f1 = f(x1)
+        else:
+            lo, x1, f1 = x1, x2, f2
+            x2 = lo + _INV_PHI * (hi - lo)
+            f2 = f(x2)
+    x = 0.5 * (lo + hi)
+    # The bracket converges onto the ceiling when expected TSV still rises there; price it exactly.
+    return max_price if f(max_price) > f(x) else x
+
+
+def make_offer_arrays(
+    *,
+    capex_usd: np.ndarray | float,
+    savings_usd_per_year: np.ndarray | float,
+    sku_unit_count: np.ndarray | int,
+    payback_ceiling_years: np.ndarray | float,
+    close_prob_mid_payback_years: np.ndarray | float,
+    close_prob_steepness: np.ndarray | float,
+    price_grid_points: int,
+    golden_section: bool = False,
+) -> Tuple[np.ndarray, Dict[OptimizationMode, OfferArrays]]:
+    """
+    make_offers for many (capex, savings, units, config) combinations at once.
+
+    All array arguments broadcast against each other; price_grid_points is shared. With
+    golden_section the EVERWATT_ENGINE price is the continuous optimum instead of the best grid
+    price. Returns (sellable mask, offers by mode). Where sellable is False make_offers would
+    return no offers and the offer values are meaningless.
+    """
+    C = np.asarray(capex_usd, dtype=float)
+    S = np.asarray(savings_usd_per_year, dtype=float)
+    units = np.asarray(sku_unit_count, dtype=float)
+    ceiling = np.asarray(payback_ceiling_years, dtype=float)
+    mid = np.asarray(close_prob_mid_payback_years, dtype=float)
+    steep = np.asarray(close_prob_steepness, dtype=float)
+    C, S, units, ceiling, mid, steep = np.broadcast_arrays(C, S, units, ceiling, mid, steep)
+
+    max_price = ceiling * S
+    sellable = (S > 0) & (max_price >= C)
+
+    if golden_section:
+        engine_price = _golden_engine_price(C, S, units, mid, steep, max_price)
+        engine_p, engine_exp_tsv = _expected_tsv_at(engine_price, C, S, units, mid, steep)
+    else:
+        # Same grid as make_offers (np.linspace(C, max_price, n)), first maximum wins
+        grid_n = int(max(5, price_grid_points))
+        step = (max_price - C) / float(grid_n - 1)
+        prices = C[..., None] + np.arange(grid_n, dtype=float) * step[..., None]
+        prices[..., -1] = max_price
+        p_g, exp_tsv_g = _expected_tsv_at(prices, C[..., None], S[..., None], units[..., None], mid[..., None], steep[..., None])
+        best = np.argmax(exp_tsv_g, axis=-1)[..., None]
+        engine_price = np.take_along_axis(prices, best, axis=-1)[..., 0]
+        engine_p = np.take_along_axis(p_g, best, axis=-1)[..., 0]
+        engine_exp_tsv = np.take_along_axis(exp_tsv_g, best, axis=-1)[..., 0]
+
+    engine = _offer_fields(OptimizationMode.EVERWATT_ENGINE, engine_price, S, C)
+    engine = replace(engine, close_probability=engine_p, expected_tsv=engine_exp_tsv)
+    offers = {
+        OptimizationMode.PROFIT_MAX: _offer_fields(OptimizationMode.PROFIT_MAX, max_price, S, C),
+        OptimizationMode.EVERWATT_ENGINE: engine,
+        OptimizationMode.CUSTOMER_BENEFIT: _offer_fields(OptimizationMode.CUSTOMER_BENEFIT, C.copy(), S, C),
+    }
+    return sellable, offers
+
+
+def make_offers_batch(
+    *,
+    capex_usd: Sequence[float] | np.ndarray,
+    savings_usd_per_year: Sequence[float] | np.ndarray,
+    sku_unit_count: Sequence[int] | np.ndarray,
+    cfg: OptimizationConfig,
+) -> List[List[PriceOffer]]:
+    """
+    make_offers for every result at once (1-D inputs of equal length), in the same order and
+    layout. Agrees with make_offers up to floating-point rounding of the close probability (the
+    golden-section search runs the same iterations on arrays).
+    """
+    S = np.asarray(savings_usd_per_year, dtype=float)
+    sellable, offers = make_offer_arrays(
+        capex_usd=np.asarray(capex_usd, dtype=float),
+        savings_usd_per_year=S,
+        sku_unit_count=np.asarray(sku_unit_count, dtype=float),
+        payback_ceiling_years=cfg.payback_ceiling_years,
+        close_prob_mid_payback_years=cfg.close_prob_mid_payback_years,
+        close_prob_steepness=cfg.close_prob_steepness,
+        price_grid_points=cfg.price_grid_points,
+        golden_section=cfg.engine_price_golden_section,
+    )
+    # Stable ordering: profit, engine, customer (UI-friendly)
+    modes = (OptimizationMode.PROFIT_MAX, OptimizationMode.EVERWATT_ENGINE, OptimizationMode.CUSTOMER_BENEFIT)
+    cols = {
+        m: [
+            getattr(offers[m], name).tolist() if getattr(offers[m], name) is not None else None
+            for name in ("price_usd", "payback_years", "gross_margin_usd", "gross_margin_frac", "tsv", "roi",
+                         "close_probability", "expected_tsv")
+        ]
+        for m in modes
+    }
+    out: List[List[PriceOffer]] = []
+    for i, ok in enumerate(sellable.tolist()):
+        if not ok:
+            out.append([])
+            continue
+        row: List[PriceOffer] = []
+        for m in modes:
+            price, payback, gm_usd, gm_frac, tsv, roi, p, exp_tsv = cols[m]
+            row.append(
+                PriceOffer(
+                    mode=m,
+                    price_usd=price[i],
+                    savings_usd_per_year=float(S[i]),
+                    payback_years=payback[i],
+                    gross_margin_usd=gm_usd[i],
+                    gross_margin_frac=gm_frac[i],
+                    tsv=tsv[i],
+                    roi=roi[i],
+                    close_probability=p[i] if p is not None else None,
+                    expected_tsv=exp_tsv[i] if exp_tsv is not None else None,
+                )
+            )
+        out.append(row)
+    return out
+
+
+def rank_offer_arrays(
+    sellable: np.ndarray, offers: Dict[OptimizationMode, OfferArrays], top_n: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rank make_offer_arrays output along the last axis the way the orchestrator ranks results:
+    engine expected TSV (plain TSV when it is exactly zero), then engine gross margin, then position.
+
+    Returns (order, ok): the first top_n positions per row and whether each is a sellable result.
+    """
+    engine = offers[OptimizationMode.EVERWATT_ENGINE]
+    if engine.expected_tsv is None:
+        raise RuntimeError("Engine offers carry no expected TSV")
+    primary = np.where(engine.expected_tsv != 0, engine.expected_tsv, engine.tsv)
+    primary = np.where(sellable, primary, -np.inf)
+    pos = np.broadcast_to(np.arange(primary.shape[-1]), primary.shape)
+    order = np.lexsort((pos, -engine.gross_margin_usd, -primary), axis=-1)[..., : max(0, int(top_n))]
+    return order, np.take_along_axis(sellable, order, axis=-1)
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .tariffs.base import RatePlan, TariffInterval
+
+
+@dataclass(frozen=True)
+class RepresentativeDays:
+    """
+    Reduced dispatch horizon: the kept days (chronological) and how many calendar days each stands for.
+
+    - peak_days: days kept because they set a month's (component) peak; always weight 1
+    - distortion_kwh: sum over represented days of |day profile - medoid profile| * h, an a-priori
+      measure of how much load shape the clustering glosses over (0 when every day is kept)
+    """
+
+    day_keys: List[str]
+    day_weights: Dict[str, float]
+    peak_days: List[str]
+    total_days: int
+    distortion_kwh: float
+
+    @property
+    def reduction_factor(self) -> float:
+        return float(self.total_days / len(self.day_keys)) if self.day_keys else 1.0
+
+
+def _k_medoids(X: np.ndarray, k: int, *, max_iter: int = 50) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Deterministic k-medoids (Voronoi iteration) on rows of X.
+    Init: the most central row, then farthest-first. Returns (medoid row indices, label per row).
+    """
+    n = X.shape[0]
+    D = np.sqrt(np.maximum(0.0, np.sum((X[:, None, :] - X[None, :, :]) ** 2, axis=2)))
+    if k >= n:
+        idx = np.arange(n)
+        return idx, idx.copy()
+
+    medoids = [int(np.argmin(D.sum(axis=1)))]
+    while len(medoids) < k:
+        medoids.append(int(np.argmax(D[:, medoids].min(axis=1))))
+    med = np.array(medoids, dtype=int)
+
+    labels = np.argmin(D[:, med], axis=1)
+    for _ in range(max_iter):
+        new_med = med.copy()
+        for c in range(k):
+            members = np.flatnonzero(labels == c)
+            if members.size:
+                within = D[np.ix_(members, members)].sum(axis=1)
+                new_med[c] = int(members[int(np.argmin(within))])
+        new_labels = np.argmin(D[:, new_med], axis=1)
+        if np.array_equal(new_med, med) and np.array_equal(new_labels, labels):
+            break
+        med, labels = new_med, new_labels
+    return med, labels
+
+
+def _component_peak_days(intervals: Sequence[TariffInterval], plans: Sequence[RatePlan]) -> Set[str]:
+    # Day on which each monthlyMax (component, month) group peaks, so monthly demand charges see
+    # the true baseline maxima on the reduced horizon.
+    days: Set[str] = set()
+    for plan in plans:
+        for comp in plan.demand_components:
+            if comp.kind != "monthlyMax":
+                continue
+            best: Dict[str, Tuple[float, str]] = {}
+            for i in intervals:
+                if not comp.applies(i):
+                    continue
+                cur = best.get(i.month_key)
+                if cur is None or float(i.kW_base) > cur[0]:
+                    best[i.month_key] = (float(i.kW_base), i.day_key)
+            days.update(day for _kw, day in best.values())
+    return days
+
+
+def select_representative_days(
+    df: pd.DataFrame,
+    interval_hours: float,
+    *,
+    days_per_month: int,
+    intervals: Sequence[TariffInterval] | None = None,
+    rate_plans: Sequence[RatePlan] = (),
+    peak_days_per_month: int = 1,
+) -> RepresentativeDays:
+    """
+    Per month: keep the peak-demand days (top peak_days_per_month by daily max, plus the day each
+    monthlyMax component of rate_plans peaks on), then cluster the remaining days' load profiles
+    into days_per_month groups by k-medoids. Each medoid day is weighted by its cluster size.
+
+    df is a normalized interval frame (ts, load_kw, month_key, day_key).
+    """
+    h = float(interval_hours)
+    if df.empty:
+        return RepresentativeDays(day_keys=[], day_weights={}, peak_days=[], total_days=0, distortion_kwh=0.0)
+
+    ts = pd.to_datetime(df["ts"])
+    minutes = (ts.dt.hour * 60 + ts.dt.minute).to_numpy()
+    slot_minutes = max(1.0, round(h * 60.0))
+    slot = (minutes // slot_minutes).astype(int)
+    n_slots = int(slot.max()) + 1
+
+    day_keys = df["day_key"].astype(str).to_numpy()
+    month_keys = df["month_key"].astype(str).to_numpy()
+    load = df["load_kw"].astype(float).to_numpy()
+
+    days = sorted(set(day_keys.tolist()))
+    day_pos = {d: k for k, d in enumerate(days)}
+    row = np.array([day_pos[d] for d in day_keys], dtype=int)
+    profiles = np.full((len(days), n_slots), np.nan)
+    profiles[row, slot] = load
+    # Partial days: fill missing slots with the day's mean so they still cluster sensibly
+    day_mean = np.nanmean(profiles, axis=1)
+    profiles = np.where(np.isnan(profiles), day_mean[:, None], profiles)
+    daily_max = np.max(profiles, axis=1)
+    month_of_day = {d: m for d, m in zip(day_keys.tolist(), month_keys.tolist())}
+
+    forced = _component_peak_days(intervals, rate_plans) if intervals is not None else set()
+
+    weights: Dict[str, float] = {}
+    peak_days: List[str] = []
+    distortion = 0.0
+    for month in sorted(set(month_keys.tolist())):
+        mdays = [d for d in days if month_of_day[d] == month]
+        idx = np.array([day_pos[d] for d in mdays], dtype=int)
+        by_peak = idx[np.argsort(-daily_max[idx], kind="stable")]
+        keep = {days[i] for i in by_peak[: max(0, int(peak_days_per_month))]}
+        keep.update(d for d in mdays if d in forced)
+        for d in sorted(keep):
+            weights[d] = 1.0
+            peak_days.append(d)
+
+        rest = np.array([day_pos[d] for d in mdays if d not in keep], dtype=int)
+        if rest.size == 0:
+            continue
+        med, labels = _k_medoids(profiles[rest], max(1, int(days_per_month)))
+        for c, m in enumerate(med):
+            members = rest[labels == c]
+            if members.size == 0:
+                continue
+            weights[days[rest[m]]] = float(members.size)
+            distortion += float(np.sum(np.abs(profiles[members] - profiles[rest[m]])) * h)
+
+    kept = sorted(weights)
+    return RepresentativeDays(
+        day_keys=kept,
+        day_weights={d: weights[d] for d in kept},
+        peak_days=sorted(peak_days),
+        total_days=len(days),
+        distortion_kwh=float(distortion),
+    )
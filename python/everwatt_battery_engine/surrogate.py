@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class SavingsSurface:
+    """
+    Cubic RBF interpolant with a linear tail over normalized (P, E, RTE) design points.
+    Exact at the design points; smooth in between.
+    """
+
+    lo: np.ndarray
+    scale: np.ndarray
+    centers: np.ndarray
+    rbf_weights: np.ndarray
+    poly_weights: np.ndarray
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        Z = _normalize(np.asarray(X, dtype=float), self.lo, self.scale)
+        r = _pairwise(Z, self.centers)
+        return r**3 @ self.rbf_weights + _poly_basis(Z) @ self.poly_weights
+
+
+def _normalize(X: np.ndarray, lo: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    return (X - lo) / scale
+
+
+def _pairwise(A: np.ndarray, B: np.ndarray) -> np.ndarray:
+    return np.sqrt(np.maximum(0.0, np.sum((A[:, None, :] - B[None, :, :]) ** 2, axis=2)))
+
+
+def _poly_basis(Z: np.ndarray) -> np.ndarray:
+    return np.hstack([np.ones((Z.shape[0], 1)), Z])
+
+
+def unit_box(X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-dimension min and range of X (constant dimensions get range 1).
+    """
+    X = np.asarray(X, dtype=float)
+    lo = X.min(axis=0)
+    span = X.max(axis=0) - lo
+    return lo, np.where(span > 0, span, 1.0)
+
+
+def fit_savings_surface(X: np.ndarray, y: np.ndarray, *, lo: np.ndarray, scale: np.ndarray) -> SavingsSurface:
+    """
+    Fit the interpolant to design points X (n, d) with savings y (n,).
+    lo/scale define the normalization (use the full candidate set's box so predictions never
+    extrapolate in normalized units beyond [0, 1]).
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    Z = _normalize(X, lo, scale)
+    n = Z.shape[0]
+    P = _poly_basis(Z)
+    m = P.shape[1]
+    A = np.zeros((n + m, n + m))
+    A[:n, :n] = _pairwise(Z, Z) ** 3
+    A[:n, n:] = P
+    A[n:, :n] = P.T
+    rhs = np.concatenate([y, np.zeros(m)])
+    # lstsq: design points can be collinear in a dimension (e.g. one RTE for the whole catalog)
+    sol = np.linalg.lstsq(A, rhs, rcond=None)[0]
+    return SavingsSurface(lo=lo, scale=scale, centers=Z, rbf_weights=sol[:n], poly_weights=sol[n:])
+
+
+def select_design(X: np.ndarray, n_points: int) -> List[int]:
+    """
+    Space-filling design over candidate rows of X (n, d): the per-dimension extremes first, then
+    farthest-first in the normalized box. Deterministic; returns distinct row indices.
+    """
+    X = np.asarray(X, dtype=float)
+    n = X.shape[0]
+    if n == 0 or n_points <= 0:
+        return []
+    if n <= n_points:
+        return list(range(n))
+    lo, scale = unit_box(X)
+    Z = _normalize(X, lo, scale)
+
+    chosen: List[int] = []
+    for d in range(Z.shape[1]):
+        for k in (int(np.argmin(Z[:, d])), int(np.argmax(Z[:, d]))):
+            if k not in chosen and len(chosen) < n_points:
+                chosen.append(k)
+    dist = _pairwise(Z, Z[chosen]).min(axis=1)
+    while len(chosen) < n_points:
+        k = int(np.argmax(dist))
+        if dist[k] <= 0:
+            break  # only duplicates of chosen points remain
+        chosen.append(k)
+        dist = np.minimum(dist, _pairwise(Z, Z[[k]])[:, 0])
+    return chosen
+
@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .analysis_store import PRICING_FIELDS, analyze_site_dispatch, changed_dispatch_fields
+from .battery_catalog import BatteryCatalog, load_battery_catalog
+from .intervals import normalize_intervals
+from .pricing import make_offer_arrays, rank_offer_arrays
+from .tariffs.base import RatePlan
+from .types import BatterySKU, Interval, OptimizationConfig, OptimizationMode
+
+_OFFER_COLUMNS = (
+    "price_usd",
+    "payback_years",
+    "gross_margin_usd",
+    "gross_margin_frac",
+    "tsv",
+    "roi",
+    "close_probability",
+    "expected_tsv",
+)
+
+
+@dataclass(frozen=True)
+class _SweepTasks:
+    # Per dispatch task (canonical bundle x scenario order) scalars needed for re-pricing
+    scenario_id: List[str]
+    sku_qty: List[str]
+    total_power_kw: np.ndarray
+    total_energy_kwh: np.ndarray
+    equipment_cost_usd: np.ndarray
+    units: np.ndarray
+    savings_usd_per_year: np.ndarray
+    optimized_bill_usd_per_year: np.ndarray
+    peak_kw_after: np.ndarray
+
+
+def config_grid(base: OptimizationConfig | None = None, **axes: Sequence[Any]) -> List[OptimizationConfig]:
+    """
+    Cartesian product of pricing-field values over a base config, e.g.
+    config_grid(payback_ceiling_years=[6, 8, 10], install_adder_frac=[0.0, 0.15]).
+    Variants are ordered with the last axis varying fastest.
+    """
+    base = base or OptimizationConfig()
+    for name in axes:
+        if name not in PRICING_FIELDS:
+            raise ValueError(f"config_grid: {name!r} is not a pricing field ({', '.join(PRICING_FIELDS)})")
+    names = list(axes)
+    return [replace(base, **dict(zip(names, values))) for values in itertools.product(*(axes[n] for n in names))]
+
+
+def _dispatch_config(variants: Sequence[OptimizationConfig]) -> OptimizationConfig:
+    if not variants:
+        raise ValueError("Sweep needs at least one config variant")
+    first = variants[0]
+    for k, v in enumerate(variants[1:], start=1):
+        for name in changed_dispatch_fields(first, v):
+            raise ValueError(
+                f"Sweep variant {k} changes {name!r}, which affects dispatch; only {', '.join(PRICING_FIELDS)} may vary"
+            )
+    return first
+
+
+def _sku_qty_key(sku_qty: Dict[str, int]) -> str:
+    return "; ".join(f"{k} x{int(v)}" for k, v in sorted(sku_qty.items()))
+
+
+def sweep_battery_offers(
+    *,
+    intervals: Sequence[Interval],
+    battery_catalog_csv: str,
+    variants: Sequence[OptimizationConfig],
+    tariff_rate_code: str = "B-19",
+    top_n: int = 10,
+    candidate_caps: int = 15,
+    variations_per_cap: int = 8,
+    workers: int = 1,
+) -> pd.DataFrame:
+    """
+    Price the same site under many OptimizationConfig variants (see sweep_site_offers).
+    """
+    norm = normalize_intervals(intervals, timezone="UTC", fill_gaps=False)
+    skus = load_battery_catalog(battery_catalog_csv).active
+    return sweep_site_offers(
+        norm.df,
+        norm.interval_hours,
+        skus=skus,
+        variants=variants,
+        tariff_rate_code=tariff_rate_code,
+        top_n=top_n,
+        candidate_caps=candidate_caps,
+        variations_per_cap=variations_per_cap,
+        workers=workers,
+    )
+
+
+def _dispatch_all(
+    df: pd.DataFrame,
+    interval_hours: float,
+    *,
+    skus: Sequence[BatterySKU],
+    cfg: OptimizationConfig,
+    tariff_rate_code: str,
+    candidate_caps: int,
+    variations_per_cap: int,
+    workers: int,
+    rate_plans: Dict[str, RatePlan] | None,
+) -> _SweepTasks:
+    # Every task is solved: which ones reach the top N depends on the pricing variant.
+    analysis = analyze_site_dispatch(
+        df,
+        interval_hours,
+        skus=skus,
+        tariff_rate_code=tariff_rate_code,
+        cfg=cfg,
+        candidate_caps=candidate_caps,
+        variations_per_cap=variations_per_cap,
+        workers=workers,
+        rate_plans=rate_plans,
+    )
+    task_bundles = [analysis.bundles[bi] for bi, _oi in analysis.tasks]
+    outcomes = [analysis.outcomes[oi] for _bi, oi in analysis.tasks]
+    catalog = BatteryCatalog.from_skus(skus)
+    qty = catalog.qty_matrix([b.sku_qty for b in task_bundles])
+    return _SweepTasks(
+        scenario_id=[o.signature.scenario_id for o in outcomes],
+        sku_qty=[_sku_qty_key(b.sku_qty) for b in task_bundles],
+        total_power_kw=np.array([b.total_power_kw for b in task_bundles], dtype=float),
+        total_energy_kwh=np.array([b.total_energy_kwh for b in task_bundles], dtype=float),
+        equipment_cost_usd=catalog.equipment_cost(qty).astype(float),
+        units=qty.sum(axis=1).astype(float),
+        savings_usd_per_year=np.array([o.savings_usd_per_year for o in outcomes], dtype=float),
+        optimized_bill_usd_per_year=np.array([o.optimized_bill_usd_per_year for o in outcomes], dtype=float),
+        peak_kw_after=np.array([o.peak_kw_after for o in outcomes], dtype=float),
+    )
+
+
+def sweep_site_offers(
+    df: pd.DataFrame,
+    interval_hours: float,
+    *,
+    skus: Sequence[BatterySKU],
+    variants: Sequence[OptimizationConfig],
+    tariff_rate_code: str = "B-19",
+    top_n: int = 10,
+    candidate_caps: int = 15,
+    variations_per_cap: int = 8,
+    workers: int = 1,
+    rate_plans: Dict[str, RatePlan] | None = None,
+) -> pd.DataFrame:
+    """
+    Sensitivity sweep: dispatch every bundle x scenario once, then re-price the whole task set
+    under each config variant in vectorized form.
+
+    Variants may differ only in PRICING_FIELDS (capex adders, payback ceiling, engine price search,
+    close-probability model); anything that changes dispatch raises ValueError. For each variant the
+    ranking is the orchestrator's (engine expected TSV, then engine gross margin, then canonical
+    task order), so every variant's top N matches what optimize_battery_solutions would return for it.
+
+    Returns a tidy frame with one row per (variant, rank, offer mode): the variant's pricing fields,
+    the bundle and its dispatch outcome, and the offer.
+    """
+    dispatch_cfg = _dispatch_config(variants)
+    t = _dispatch_all(
+        df,
+        interval_hours,
+        skus=skus,
+        cfg=dispatch_cfg,
+        tariff_rate_code=tariff_rate_code,
+        candidate_caps=candidate_caps,
+        variations_per_cap=variations_per_cap,
+        workers=workers,
+        rate_plans=rate_plans,
+    )
+    top_n = max(0, int(top_n))
+    n_tasks = t.savings_usd_per_year.size
+    columns = ["variant", *PRICING_FIELDS, "rank", "scenario_id", "sku_qty", "total_power_kw", "total_energy_kwh",
+               "equipment_cost_usd", "capex_usd", "savings_usd_per_year", "optimized_bill_usd_per_year",
+               "peak_kw_after", "mode", *_OFFER_COLUMNS]
+    if n_tasks == 0 or top_n == 0:
+        return pd.DataFrame(columns=columns)
+
+    frames: List[pd.DataFrame] = []
+    # price_grid_points sets the grid width (and golden-section pricing replaces the grid), so
+    # variants are vectorized per distinct engine price search.
+    by_grid: Dict[Tuple[int, bool], List[int]] = {}
+    for k, v in enumerate(variants):
+        by_grid.setdefault((int(v.price_grid_points), bool(v.engine_price_golden_section)), []).append(k)
+
+    for (grid_points, golden), variant_ids in by_grid.items():
+        vs = [variants[k] for k in variant_ids]
+
+        def col(name: str) -> np.ndarray:
+            return np.array([float(getattr(v, name)) for v in vs], dtype=float)[:, None]
+
+        # (variants, tasks)
+        capex = t.equipment_cost_usd[None, :] * (1.0 + col("install_adder_frac")) + col("fixed_soft_costs_usd")
+        sellable, offers = make_offer_arrays(
+            capex_usd=capex,
+            savings_usd_per_year=t.savings_usd_per_year[None, :],
+            sku_unit_count=t.units[None, :],
+            payback_ceiling_years=col("payback_ceiling_years"),
+            close_prob_mid_payback_years=col("close_prob_mid_payback_years"),
+            close_prob_steepness=col("close_prob_steepness"),
+            price_grid_points=grid_points,
+            golden_section=golden,
+        )
+        order, ranked_ok = rank_offer_arrays(sellable, offers, top_n)
+
+        rows_v, rows_r = np.nonzero(ranked_ok)
+        if rows_v.size == 0:
+            continue
+        picked = order[rows_v, rows_r]
+        base: Dict[str, Any] = {"variant": np.array(variant_ids)[rows_v]}
+        for name in PRICING_FIELDS:
+            base[name] = np.array([getattr(v, name) for v in vs])[rows_v]
+        base.update(
+            rank=rows_r + 1,
+            scenario_id=np.array(t.scenario_id, dtype=object)[picked],
+            sku_qty=np.array(t.sku_qty, dtype=object)[picked],
+            total_power_kw=t.total_power_kw[picked],
+            total_energy_kwh=t.total_energy_kwh[picked],
+            equipment_cost_usd=t.equipment_cost_usd[picked],
+            capex_usd=capex[rows_v, picked],
+            savings_usd_per_year=t.savings_usd_per_year[picked],
+            optimized_bill_usd_per_year=t.optimized_bill_usd_per_year[picked],
+            peak_kw_after=t.peak_kw_after[picked],
+        )
+        for mode, arrs in offers.items():
+            part = dict(base)
+            part["mode"] = mode.value
+            for name in _OFFER_COLUMNS:
+                arr = getattr(arrs, name)
+                part[name] = arr[rows_v, picked] if arr is not None else np.full(rows_v.size, np.nan)
+            frames.append(pd.DataFrame(part, columns=columns))
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    mode_order = {m.value: k for k, m in enumerate(OptimizationMode)}
+    out = pd.concat(frames, ignore_index=True)
+    out = out.sort_values(
+        ["variant", "rank", "mode"], key=lambda s: s.map(mode_order) if s.name == "mode" else s, kind="stable"
+    )
+    return out.reset_index(drop=True)
@@ -17,10 +17,16 @@ class BillSummary:
     peak_daily_kw: Dict[str, float]
 
 
-def calculate_bill(intervals: Sequence[TariffInterval], rate_plan: RatePlan) -> BillSummary:
+def calculate_bill(
+    intervals: Sequence[TariffInterval],
+    rate_plan: RatePlan,
+    *,
+    interval_weights: Sequence[float] | None = None,
+) -> BillSummary:
     """
     Deterministic tariff bill calculator (no battery): compute energy + demand + fixed.
     Demand components are computed as max(net kW) over their applicable window per month/day.
+    interval_weights mirror optimize_bill_lp: energy and dailyMax charges count w times, monthlyMax do not.
     """
     if not intervals:
         return BillSummary(
@@ -33,8 +39,13 @@ def calculate_bill(intervals: Sequence[TariffInterval], rate_plan: RatePlan) ->
             peak_daily_kw={},
         )
 
+    weights = [1.0] * len(intervals) if interval_weights is None else [float(w) for w in interval_weights]
+    day_weight: Dict[str, float] = {}
+    for i, w in zip(intervals, weights):
+        day_weight.setdefault(i.day_key, w)
+
     # Energy charges
-    energy = sum(rate_plan.energy_rate_per_kWh(i) * i.kWh_base for i in intervals)
+    energy = sum(rate_plan.energy_rate_per_kWh(i) * i.kWh_base * w for i, w in zip(intervals, weights))
 
     # Demand charges: group maxima
     demand_total = 0.0
@@ -55,7 +66,7 @@ def calculate_bill(intervals: Sequence[TariffInterval], rate_plan: RatePlan) ->
                 if not comp.applies(i):
                     continue
                 by_day[i.day_key] = max(by_day.get(i.day_key, 0.0), float(i.kW_base))
-            demand_total += sum(v * comp.rate_per_kW for v in by_day.values())
+            demand_total += sum(v * comp.rate_per_kW * day_weight[d] for d, v in by_day.items())
 
     months = sorted({i.month_key for i in intervals})
     fixed = float(rate_plan.fixed_monthly_usd) * float(len(months))
@@ -111,12 +111,39 @@ class OptimizationConfig:
     payback_ceiling_years: float = 10.0
     # Pricing search grid size for EVERWATT_ENGINE mode (and general debug)
     price_grid_points: int = 21
+    # EVERWATT_ENGINE price: golden-section search for the exact expected-TSV optimum (the curve is
+    # unimodal in price) instead of the best of price_grid_points grid prices.
+    engine_price_golden_section: bool = False
     # CapEx adders (optional): CapEx_total = equipment_cost * (1 + install_adder_frac) + fixed_soft_costs
     install_adder_frac: float = 0.0
     fixed_soft_costs_usd: float = 0.0
     # Close probability model hyperparameters (used for EVERWATT_ENGINE mode by default)
     close_prob_mid_payback_years: float = 6.5
     close_prob_steepness: float = 1.2
+    # Reduced dispatch horizon for screening: cluster each month's non-peak days into this many
+    # representative days (k-medoids), always keeping peak-demand days. None = full horizon.
+    representative_days_per_month: int | None = None
+    # Surrogate sizing: solve this many space-filling (P, E, RTE) design points per scenario, predict
+    # the other bundles' savings from an RBF response surface, and solve only the predicted
+    # top (surrogate_shortlist_factor * top_n). None = solve every bundle.
+    surrogate_design_points: int | None = None
+    surrogate_shortlist_factor: float = 2.0
+    # Dual-steered search: solve bundles best-first by an optimistic savings estimate that every
+    # solve tightens with the tangent plane from its LP marginal values ($/kW-yr, $/kWh-yr), and
+    # stop once no unsolved bundle can reach the top N.
+    steered_search: bool = False
+    # Billing demand interval (minutes): finer data (e.g. 1-minute) is averaged onto clock-aligned
+    # intervals of this length before dispatch, since demand charges bill those averages. Result
+    # series are still reported per original interval. None = dispatch at the data's own cadence.
+    demand_interval_minutes: int | None = None
+    # Multi-resolution dispatch LP: intervals that cannot set a demand peak are merged into coarse
+    # constant-dispatch blocks (see dispatch_lp.coarse_time_blocks); the leading result is re-solved
+    # at full resolution to report the savings error.
+    coarsen_noncritical: bool = False
+    # Critical-window decomposition: dispatch only the days that can set a billed demand peak (plus
+    # the recharge hours before them), verified against the full-horizon maxima and expanded on a
+    # miss (see dispatch_lp.optimize_bill_critical_windows). Arbitrage on other days is forgone.
+    critical_window_dispatch: bool = False
 
 
 @dataclass(frozen=True)
@@ -138,3 +165,54 @@ class OptimizationResult:
     soc_kwh_series: List[float] | None = None
     solver_status: str | None = None
 
+
+@dataclass(frozen=True)
+class OptimizationStats:
+    """
+    Work accounting for one optimizer run.
+    - dispatch_tasks: bundle x scenario pairs that passed gating (degenerate bundles, Option S 10% rule)
+    - dispatch_solved: LPs actually solved
+    - dispatch_skipped: LPs skipped because their savings/TSV upper bound could not reach the top N
+      (or, for surrogate sizing, because the surrogate ranked them out of the shortlist)
+    """
+
+    bundle_count: int
+    dispatch_tasks: int
+    dispatch_solved: int
+    dispatch_skipped: int
+    # Representative-day runs only: days solved vs. calendar days, and the top result's relative
+    # savings error against a full-horizon LP solve
+    horizon_days: int | None = None
+    horizon_total_days: int | None = None
+    horizon_savings_error_frac: float | None = None
+    # Surrogate sizing only: mean relative error of predicted vs. LP savings on the confirmed shortlist
+    surrogate_savings_error_frac: float | None = None
+    # coarsen_noncritical / critical_window_dispatch only: |reduced - full LP| / |full LP| savings
+    # of the top result
+    reduced_lp_savings_error_frac: float | None = None
+
+
+@dataclass(frozen=True)
+class OptimizationRun:
+    results: List[OptimizationResult]
+    stats: OptimizationStats
+
+
+@dataclass(frozen=True)
+class OptimizationProgress:
+    """
+    Progress event from the incremental optimizer.
+    - tasks_*: bundle x scenario dispatch tasks (skipped tasks count as done)
+    - top: provisional top N, ranked; final once done=True
+    - eta_seconds: upper estimate (assumes every remaining task is solved); None until the first solve
+    """
+
+    tasks_done: int
+    tasks_total: int
+    elapsed_seconds: float
+    eta_seconds: float | None
+    top: List[OptimizationResult]
+    top_changed: bool
+    done: bool = False
+    cancelled: bool = False
+    stats: OptimizationStats | None = None
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .evaluation import build_rate_plans
+from .intervals import aggregate_to_demand_interval
+from .pricing import close_probability_array
+from .tariffs.base import RatePlan, TariffInterval, to_tariff_intervals
+from .tariffs.pge_b19 import b19_tou_bucket
+from .types import OptimizationConfig, OptimizationMode, OptimizationResult
+
+SAVINGS_PERIODS = ("month", "day")
+
+
+@dataclass(frozen=True)
+class PeriodSavings:
+    """
+    Bill reduction (baseline minus dispatched bill, not annualized) of every result (rows) in every
+    billing month or calendar day (columns), with the calendar days of data behind each column.
+    Fixed charges cancel. With period "day", a monthly demand charge is spread evenly over the
+    days of its month.
+    """
+
+    period: str
+    period_keys: List[str]
+    days: np.ndarray
+    savings_usd: np.ndarray
+
+
+def period_savings(
+    intervals: Sequence[TariffInterval],
+    net_kw: np.ndarray,
+    rate_plan: RatePlan,
+    *,
+    interval_hours: float,
+    period: str = "month",
+) -> PeriodSavings:
+    """
+    Split the bill reduction of dispatched net load (results x intervals, or one series) against
+    the intervals' baseline by billing period, matching calculate_bill's energy and demand charges.
+    """
+    if period not in SAVINGS_PERIODS:
+        raise ValueError(f"period must be one of {SAVINGS_PERIODS}, got {period!r}")
+    net = np.atleast_2d(np.asarray(net_kw, dtype=float))
+    if net.shape[1] != len(intervals):
+        raise ValueError(f"net load has {net.shape[1]} intervals, expected {len(intervals)}")
+    X = np.vstack([np.array([i.kW_base for i in intervals], dtype=float), net])  # row 0: baseline
+    rows = X.shape[0]
+
+    month_codes, month_keys = pd.factorize(pd.Series([i.month_key for i in intervals], dtype="str"))
+    day_codes, day_keys = pd.factorize(pd.Series([i.day_key for i in intervals], dtype="str"))
+    n_months, n_days = len(month_keys), len(day_keys)
+    day_month = np.zeros(n_days, dtype=int)
+    day_month[day_codes] = month_codes
+    days_in_month = np.bincount(day_month, minlength=n_months).astype(float)
+
+    by_month = np.zeros((rows, n_months))
+    by_day = np.zeros((rows, n_days))
+    rate = np.array([rate_plan.energy_rate_per_kWh(i) for i in intervals], dtype=float)
+    np.add.at(by_day, (slice(None), day_codes), X * (rate * float(interval_hours)))
+
+    for comp in rate_plan.demand_components:
+        mask = np.array([bool(comp.applies(i)) for i in intervals], dtype=bool)
+        if not mask.any():
+            continue
+        monthly = comp.kind == "monthlyMax"
+        codes = (month_codes if monthly else day_codes)[mask]
+        # Group maxima start at 0 kW, as in calculate_bill
+        peak = np.zeros((rows, n_months if monthly else n_days))
+        np.maximum.at(peak, (slice(None), codes), X[:, mask])
+        (by_month if monthly else by_day)[:] += peak * float(comp.rate_per_kW)
+
+    if period == "month":
+        bill = by_month.copy()
+        np.add.at(bill, (slice(None), day_month), by_day)
+        keys, days = [str(k) for k in month_keys], days_in_month
+    else:
+        bill = by_day + by_month[:, day_month] / days_in_month[day_month]
+        keys, days = [str(k) for k in day_keys], np.ones(n_days)
+    return PeriodSavings(period=period, period_keys=keys, days=days, savings_usd=bill[0] - bill[1:])
+
+
+def bootstrap_annual_savings(ps: PeriodSavings, *, draws: int, seed: int = 0) -> np.ndarray:
+    """
+    Annual savings (results x draws) from resampling the periods with replacement: each draw sums
+    the picked periods and annualizes by the calendar days they cover. One matrix product.
+    """
+    n = ps.savings_usd.shape[1]
+    if n == 0 or draws <= 0:
+        raise ValueError("bootstrap needs at least one period and one draw")
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, n, size=(int(draws), n)) + (np.arange(int(draws)) * n)[:, None]
+    counts = np.bincount(picks.ravel(), minlength=int(draws) * n).reshape(int(draws), n).astype(float)
+    return (ps.savings_usd @ counts.T) * (365.0 / (counts @ ps.days))
+
+
+def escalated_payback_years(price_usd: np.ndarray, savings_usd_per_year: np.ndarray, escalation: np.ndarray) -> np.ndarray:
+    """
+    Years until savings growing by escalation g per year (S, S(1+g), ...) add up to the price:
+    log(1 + P g / S) / log(1 + g), which is P / S at g = 0. inf when savings never get there.
+    Arguments broadcast.
+    """
+    S = np.asarray(savings_usd_per_year, dtype=float)
+    g = np.asarray(escalation, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        simple = np.asarray(price_usd, dtype=float) / S
+        years = np.log1p(simple * g)
+        years /= np.log1p(g)
+        years = np.where(np.abs(g) < 1e-12, simple, years)
+    return np.where((S > 0) & np.isfinite(years), years, np.inf)
+
+
+def _row_quantiles(a: np.ndarray, q: Sequence[float], *, overwrite: bool = False) -> np.ndarray:
+    # np.quantile(a, q, axis=1).T (linear interpolation) via one row sort, which is several times
+    # faster than repeated partitioning on wide rows; inf entries stay inf.
+    s = a if overwrite else a.copy()
+    s.sort(axis=1)
+    pos = np.asarray(q, dtype=float) * (s.shape[1] - 1)
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, s.shape[1] - 1)
+    a_lo, a_hi = s[:, lo], s[:, hi]
+    with np.errstate(invalid="ignore"):
+        return np.where(a_hi == a_lo, a_lo, a_lo + (a_hi - a_lo) * (pos - lo))
+
+
+@dataclass(frozen=True)
+class OfferUncertainty:
+    """
+    Outcome distribution of one offer mode at each result's quoted price (rows = results). Gross
+    margin is fixed by the price; payback, TSV and expected TSV vary with the draws.
+    Quantile arrays are results x len(quantiles).
+    """
+
+    mode: OptimizationMode
+    price_usd: np.ndarray
+    gross_margin_usd: np.ndarray
+    gross_margin_frac: np.ndarray
+    payback_years: np.ndarray
+    tsv: np.ndarray
+    expected_tsv: np.ndarray
+    mean_tsv: np.ndarray
+    mean_expected_tsv: np.ndarray
+    prob_payback_within_ceiling: np.ndarray
+
+
+@dataclass(frozen=True)
+class SavingsUncertainty:
+    """
+    Savings and offer distributions for a set of results (see offer_uncertainty).
+    savings_usd_per_year holds annual (first-year) savings quantiles, results x len(quantiles).
+    """
+
+    period: str
+    draws: int
+    quantiles: Tuple[float, ...]
+    savings_usd_per_year: np.ndarray
+    mean_savings_usd_per_year: np.ndarray
+    offers: Dict[OptimizationMode, OfferUncertainty]
+
+
+def savings_uncertainty(
+    ps: PeriodSavings,
+    *,
+    capex_usd: np.ndarray,
+    sku_unit_count: np.ndarray,
+    prices_usd: Dict[OptimizationMode, np.ndarray],
+    cfg: OptimizationConfig,
+    draws: int = 10000,
+    escalation_mean: float = 0.0,
+    escalation_sd: float = 0.0,
+    quantiles: Sequence[float] = (0.1, 0.5, 0.9),
+    seed: int = 0,
+) -> SavingsUncertainty:
+    """
+    Vectorized Monte Carlo over draws: bootstrap annual savings from the period savings, draw an
+    annual rate escalation per draw (normal, shared by all results so they stay comparable), and
+    evaluate every offer at its quoted price. The first year is billed at the data's rates and
+    escalation compounds after it, so it moves payback (and through it the close probability and
+    expected TSV) but not annual savings or TSV. prices_usd maps offer mode to one price per row of ps.
+    """
+    q = tuple(float(x) for x in quantiles)
+    annual = bootstrap_annual_savings(ps, draws=draws, seed=seed)
+    rng = np.random.default_rng([int(seed), 1])
+    n_draws = annual.shape[1]
+    if escalation_sd > 0:
+        growth = rng.normal(float(escalation_mean), float(escalation_sd), n_draws)
+    else:
+        growth = np.full(n_draws, float(escalation_mean))
+    growth = np.maximum(growth, -0.99)  # rates cannot fall by 100%+ in a year
+
+    # TSV = S * gm_frac is monotone in S at a fixed price, so its quantiles come from the savings
+    # quantiles (at 1 - q where the margin is negative) without another pass over the draws.
+    s_q = _row_quantiles(annual, q + tuple(1.0 - x for x in q))
+    s_lo, s_hi = s_q[:, : len(q)], s_q[:, len(q) :]
+    s_mean = annual.mean(axis=1)
+
+    C = np.asarray(capex_usd, dtype=float)
+    units = np.asarray(sku_unit_count, dtype=float)[:, None]
+    offers: Dict[OptimizationMode, OfferUncertainty] = {}
+    for mode, price in prices_usd.items():
+        P = np.asarray(price, dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            gm_frac = np.where(P > 0, (P - C) / P, 0.0)
+        payback = escalated_payback_years(P[:, None], annual, growth[None, :])
+        p = close_probability_array(payback, units, cfg.close_prob_mid_payback_years, cfg.close_prob_steepness)
+        exp_tsv = p * (annual * gm_frac[:, None])
+        within = (payback <= float(cfg.payback_ceiling_years)).mean(axis=1)
+        exp_mean = exp_tsv.mean(axis=1)
+        offers[mode] = OfferUncertainty(
+            mode=mode,
+            price_usd=P,
+            gross_margin_usd=P - C,
+            gross_margin_frac=gm_frac,
+            payback_years=_row_quantiles(payback, q, overwrite=True),
+            tsv=np.where(gm_frac[:, None] >= 0, s_lo, s_hi) * gm_frac[:, None],
+            expected_tsv=_row_quantiles(exp_tsv, q, overwrite=True),
+            mean_tsv=s_mean * gm_frac,
+            mean_expected_tsv=exp_mean,
+            prob_payback_within_ceiling=within,
+        )
+    return SavingsUncertainty(
+        period=ps.period,
+        draws=n_draws,
+        quantiles=q,
+        savings_usd_per_year=s_lo,
+        mean_savings_usd_per_year=s_mean,
+        offers=offers,
+    )
+
+
+def offer_uncertainty(
+    results: Sequence[OptimizationResult],
+    df: pd.DataFrame,
+    interval_hours: float,
+    cfg: OptimizationConfig,
+    *,
+    rate_plans: Dict[str, RatePlan] | None = None,
+    period: str = "month",
+    draws: int = 10000,
+    escalation_mean: float = 0.0,
+    escalation_sd: float = 0.0,
+    quantiles: Sequence[float] = (0.1, 0.5, 0.9),
+    seed: int = 0,
+) -> SavingsUncertainty:
+    """
+    Savings uncertainty for optimizer results that carry dispatch series (the top N of
+    optimize_battery_solutions) on the site's normalized frame df. Use period "day" when the data
+    spans too few billing months to resample. Results keep their order; the bootstrap and
+    escalation draws are shared across results and scenarios.
+    """
+    if not results:
+        raise ValueError("offer_uncertainty needs at least one result")
+    h = float(interval_hours)
+    agg = aggregate_to_demand_interval(df, h, cfg.demand_interval_minutes) if cfg.demand_interval_minutes else None
+    bill_df = agg.df if agg is not None else df
+    bill_h = agg.interval_hours if agg is not None else h
+    intervals = to_tariff_intervals(bill_df, tou_mapper=b19_tou_bucket, interval_hours=bill_h)
+    plans = rate_plans if rate_plans is not None else build_rate_plans()
+
+    net_rows: List[np.ndarray] = []
+    for r in results:
+        if r.net_kw_series is None or len(r.net_kw_series) != len(df):
+            raise ValueError(
+                f"result {r.scenario.id} needs a full-horizon net load series ({len(df)} intervals) to resample"
+            )
+        net = np.asarray(r.net_kw_series, dtype=float)
+        if agg is not None:
+            # Dispatch is constant within a demand interval, so block means are the billed net load
+            net = np.bincount(agg.block, weights=net) / np.bincount(agg.block)
+        net_rows.append(net)
+
+    # Period savings per scenario (rate plan), reassembled in result order
+    by_kind: Dict[str, List[int]] = {}
+    for k, r in enumerate(results):
+        by_kind.setdefault(r.scenario.kind, []).append(k)
+    parts: List[Tuple[List[int], PeriodSavings]] = []
+    for kind, idx in by_kind.items():
+        plan = plans.get(kind)
+        if plan is None:
+            raise ValueError(f"no rate plan for scenario kind {kind!r}")
+        parts.append((idx, period_savings(intervals, np.vstack([net_rows[k] for k in idx]), plan, interval_hours=bill_h, period=period)))
+    first = parts[0][1]
+    savings = np.zeros((len(results), len(first.period_keys)))
+    for idx, ps in parts:
+        savings[idx] = ps.savings_usd
+
+    modes = [o.mode for o in results[0].offers]
+    prices: Dict[OptimizationMode, np.ndarray] = {}
+    for mode in modes:
+        prices[mode] = np.array(
+            [next((o.price_usd for o in r.offers if o.mode == mode), np.nan) for r in results], dtype=float
+        )
+    return savings_uncertainty(
+        PeriodSavings(period=first.period, period_keys=first.period_keys, days=first.days, savings_usd=savings),
+        capex_usd=np.array([r.bundle.capex_usd for r in results], dtype=float),
+        sku_unit_count=np.array([sum(int(v) for v in r.bundle.sku_qty.values()) for r in results], dtype=float),
+        prices_usd=prices,
+        cfg=cfg,
+        draws=draws,
+        escalation_mean=escalation_mean,
+        escalation_sd=escalation_sd,
+        quantiles=quantiles,
+        seed=seed,
+    )
@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 from pathlib import Path
 
-from everwatt_battery_engine.optimize import optimize_battery_solutions
+from everwatt_battery_engine.optimize import run_battery_optimization
 from everwatt_battery_engine.types import Interval, OptimizationConfig
 
 
@@ -40,14 +40,19 @@ def main() -> None:
     root = Path(__file__).resolve().parent.parent
     catalog = root / "data" / "battery-catalog.csv"
     cfg = OptimizationConfig(no_export=True, payback_ceiling_years=10.0, price_grid_points=21)
-    results = optimize_battery_solutions(
+    run = run_battery_optimization(
         intervals=synthetic_intervals(),
         battery_catalog_csv=str(catalog),
         tariff_rate_code="B-19",
         cfg=cfg,
         top_n=10,
     )
+    results = run.results
     print(f"got {len(results)} results")
+    print(
+        f"dispatch: solved {run.stats.dispatch_solved} / {run.stats.dispatch_tasks} "
+        f"(skipped {run.stats.dispatch_skipped} by bound)"
+    )
     for r in results[:5]:
         best = next((o for o in r.offers if o.mode.value == "everwatt_engine"), r.offers[0])
         print(
@@ -1,18 +1,54 @@
 from __future__ import annotations
 
-import json
+import argparse
 import sys
 
-from everwatt_battery_engine.dr_deliverable import compute_dr_deliverables
+from everwatt_battery_engine.dr_baseline import compute_dr_baseline_settlement
+from everwatt_battery_engine.dr_codec import dumps, load_payload
+from everwatt_battery_engine.dr_deliverable import compute_dr_deliverable_curve, compute_dr_deliverables
+from everwatt_battery_engine.dr_season import compute_dr_season
+from everwatt_battery_engine.dr_service import DrService, serve_http, serve_json_lines
 
 
 def main() -> None:
-    # Read JSON payload from stdin and write JSON response to stdout.
-    payload = json.loads(sys.stdin.read() or "{}")
-    out = compute_dr_deliverables(payload)
-    sys.stdout.write(json.dumps(out))
+    parser = argparse.ArgumentParser(description="Compute DR deliverables (one JSON or NPZ payload on stdin by default).")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--serve", action="store_true", help="Stay up: JSON-lines requests on stdin, responses on stdout")
+    mode.add_argument("--http", type=int, metavar="PORT", help="Stay up: local HTTP endpoint on this port")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address for --http")
+    one_shot = parser.add_mutually_exclusive_group()
+    one_shot.add_argument(
+        "--curve", action="store_true", help="One-shot payload carries batteries/grid: one deliverable per size"
+    )
+    one_shot.add_argument(
+        "--settlement", action="store_true", help="One-shot payload carries events: baseline and performance per event"
+    )
+    one_shot.add_argument("--season", action="store_true", help="One-shot season simulation with SOC carried across days")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent computations in server modes (0 = every core)")
+    args = parser.parse_args()
+
+    if args.serve:
+        with DrService(workers=args.workers) as service:
+            serve_json_lines(service)
+        return
+    if args.http is not None:
+        with DrService(workers=args.workers) as service:
+            print(f"DR deliverable service on http://{args.host}:{args.http}", file=sys.stderr, flush=True)
+            serve_http(service, host=args.host, port=args.http)
+        return
+
+    # Read a JSON (or NPZ, see dr_codec) payload from stdin and write JSON response to stdout.
+    payload = load_payload(sys.stdin.buffer.read())
+    if args.curve:
+        out = compute_dr_deliverable_curve(payload)
+    elif args.settlement:
+        out = compute_dr_baseline_settlement(payload)
+    elif args.season:
+        out = compute_dr_season(payload)
+    else:
+        out = compute_dr_deliverables(payload)
+    sys.stdout.write(dumps(out))
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from everwatt_battery_engine.interval_store import build_interval_store
+from everwatt_battery_engine.portfolio import (
+    PortfolioSummary,
+    discover_sites,
+    load_manifest,
+    optimize_portfolio,
+    reprice_portfolio,
+    sites_from_store,
+)
+from everwatt_battery_engine.types import OptimizationConfig
+
+
+def main() -> None:
+    root = Path(__file__).resolve().parent.parent
+    parser = argparse.ArgumentParser(description="Run the battery optimizer over many sites.")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--intervals-dir", help="Directory of interval files (*.csv / *.json), one site per file")
+    src.add_argument("--manifest", help="CSV/JSON manifest of site id, interval file path and rate code")
+    src.add_argument("--reprice-from", help="Analysis store from --analysis-out: re-rank with --catalog, no solves")
+    src.add_argument("--store", help="Interval store directory (see --build-store); sites open without parsing")
+    parser.add_argument("--out", help="Output JSON-lines file (one record per site)")
+    parser.add_argument(
+        "--build-store", help="Convert the --intervals-dir/--manifest sites into an interval store here and exit"
+    )
+    parser.add_argument("--catalog", default=str(root / "data" / "battery-catalog.csv"))
+    parser.add_argument("--rate", default="B-19", help="Rate code for sites without one in the manifest")
+    parser.add_argument("--workers", type=int, default=0, help="Process count (0 = every core)")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--no-prune", action="store_true", help="Solve every bundle (disable bound-based skipping)")
+    parser.add_argument("--include-series", action="store_true", help="Write dispatch series for each result")
+    parser.add_argument("--analysis-out", help="Also store price-independent dispatch outcomes (JSON lines)")
+    args = parser.parse_args()
+    if args.build_store is not None and (args.store or args.reprice_from):
+        parser.error("--build-store converts --intervals-dir or --manifest sites")
+    if args.build_store is None and not args.out:
+        parser.error("--out is required")
+
+    def progress(record: dict) -> None:
+        status = record.get("status")
+        detail = f"{len(record.get('results') or [])} results" if status == "ok" else record.get("error")
+        print(f"{record.get('siteId')}: {status} ({detail})", flush=True)
+
+    if args.reprice_from:
+        summary = reprice_portfolio(
+            args.reprice_from,
+            battery_catalog_csv=args.catalog,
+            output_path=args.out,
+            top_n=args.top_n,
+            on_record=progress,
+        )
+        _print_summary(summary)
+        return
+
+    if args.store:
+        sites = sites_from_store(args.store, tariff_rate_code=args.rate)
+    elif args.manifest:
+        sites = load_manifest(args.manifest, default_tariff_rate_code=args.rate)
+    else:
+        sites = discover_sites(args.intervals_dir, tariff_rate_code=args.rate)
+
+    if args.build_store is not None:
+        build = build_interval_store(args.build_store, [(s.site_id, s.intervals_path) for s in sites])
+        for site_id, error in build.errors.items():
+            print(f"{site_id}: error ({error})", flush=True)
+        print(f"{len(build.written)}/{len(sites)} sites stored, {len(build.errors)} failed -> {build.store.root}")
+        return
+
+    summary = optimize_portfolio(
+        sites,
+        battery_catalog_csv=args.catalog,
+        output_path=args.out,
+        cfg=OptimizationConfig(),
+        top_n=args.top_n,
+        workers=args.workers,
+        prune=not args.no_prune,
+        include_series=args.include_series,
+        analysis_path=args.analysis_out,
+        on_record=progress,
+    )
+    _print_summary(summary)
+
+
+def _print_summary(summary: PortfolioSummary) -> None:
+    print(
+        f"{summary.sites_ok}/{summary.sites_total} sites ok, {summary.sites_failed} failed "
+        f"in {summary.elapsed_seconds:.1f}s -> {summary.output_path}"
+    )
+
+
+if __name__ == "__main__":
+    main()
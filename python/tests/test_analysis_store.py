@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import json
+import math
+import sys
+import tempfile
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+PYTHON_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PYTHON_DIR))
+
+from everwatt_battery_engine.analysis_store import (  # noqa: E402
+    analyze_site_dispatch,
+    reprice_site,
+    site_analysis_from_dict,
+    site_analysis_to_dict,
+)
+from everwatt_battery_engine.battery_catalog import load_battery_catalog  # noqa: E402
+from everwatt_battery_engine.intervals import normalize_intervals  # noqa: E402
+from everwatt_battery_engine.optimize import optimize_site  # noqa: E402
+from everwatt_battery_engine.types import Interval, OptimizationConfig  # noqa: E402
+
+CATALOG = PYTHON_DIR.parent / "data" / "battery-catalog.csv"
+PRICE_COLUMNS = ("Price 1-10", "Price 11-20", "Price 21-50", "Price 50+")
+
+
+def _intervals(days: int) -> list[Interval]:
+    start = dt.datetime(2025, 7, 1, tzinfo=dt.timezone.utc)
+    out: list[Interval] = []
+    for i in range(days * 96):
+        t = start + dt.timedelta(minutes=15 * i)
+        hour = t.hour + t.minute / 60.0
+        kw = 120.0 + 10.0 * math.sin(2 * math.pi * hour / 24.0) + (90.0 + 7.0 * (i % 5) if 16 <= hour < 21 else 0.0)
+        out.append(Interval(timestamp=t.isoformat(), kw=kw))
+    return out
+
+
+def _scaled_catalog(path: Path, factor: float) -> None:
+    # Every tier price scaled alike: the price-driven SKU choice (and so the candidates) stays the same
+    with open(CATALOG, newline="", encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh))
+    for row in rows:
+        for col in PRICE_COLUMNS:
+            row[col] = str(round(float(row[col]) * factor, 2))
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def _result_key(r) -> tuple:
+    return (
+        r.scenario.id,
+        tuple(sorted(r.bundle.sku_qty.items())),
+        round(r.bundle.capex_usd, 6),
+        round(r.savings_usd_per_year, 6),
+        tuple((o.mode, round(o.price_usd, 6), round(o.expected_tsv or 0.0, 6)) for o in r.offers),
+    )
+
+
+class TestRepriceRoundTrip(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        norm = normalize_intervals(_intervals(7), timezone="UTC", fill_gaps=False)
+        cls.df, cls.h = norm.df, norm.interval_hours
+        cls.cfg = OptimizationConfig()
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.analysis = analyze_site_dispatch(
+            cls.df, cls.h, skus=load_battery_catalog(str(CATALOG)).active, cfg=cls.cfg, candidate_caps=6,
+            variations_per_cap=3,
+        )
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.tmp.cleanup()
+
+    def test_stored_analysis_reprices_like_a_full_run(self) -> None:
+        new_prices = Path(self.tmp.name) / "catalog.csv"
+        _scaled_catalog(new_prices, 0.8)
+        catalog = load_battery_catalog(str(new_prices))
+
+        stored = site_analysis_from_dict(json.loads(json.dumps(site_analysis_to_dict(self.analysis))))
+        self.assertEqual(stored.dispatch_cfg, self.cfg)
+        repriced = reprice_site(stored, catalog, cfg=self.cfg, top_n=5)
+        self.assertEqual(repriced.coverage, 1.0)
+
+        full = optimize_site(
+            self.df, self.h, skus=catalog.active, cfg=self.cfg, top_n=5, candidate_caps=6, variations_per_cap=3
+        )
+        self.assertEqual(len(repriced.results), 5)
+        self.assertEqual([_result_key(r) for r in repriced.results], [_result_key(r) for r in full.results])
+
+    def test_dispatch_config_must_match_the_stored_one(self) -> None:
+        catalog = load_battery_catalog(str(CATALOG))
+        stored = site_analysis_from_dict(json.loads(json.dumps(site_analysis_to_dict(self.analysis))))
+        for changed in (
+            replace(self.cfg, no_export=False),
+            replace(self.cfg, interconnect_kw=50.0),
+            replace(self.cfg, demand_interval_minutes=30),
+            replace(self.cfg, representative_days_per_month=2),
+            replace(self.cfg, coarsen_noncritical=True),
+            replace(self.cfg, critical_window_dispatch=True),
+        ):
+            with self.assertRaises(ValueError):
+                reprice_site(stored, catalog, cfg=changed)
+        # Pricing fields may change; no cfg means the stored dispatch config
+        self.assertTrue(reprice_site(stored, catalog, cfg=replace(self.cfg, install_adder_frac=0.2)).results)
+        self.assertEqual(
+            [_result_key(r) for r in reprice_site(stored, catalog).results],
+            [_result_key(r) for r in reprice_site(stored, catalog, cfg=self.cfg).results],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from dataclasses import fields
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+PYTHON_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PYTHON_DIR))
+
+from everwatt_battery_engine import battery_catalog as catalog_module  # noqa: E402
+from everwatt_battery_engine.battery_catalog import (  # noqa: E402
+    BatteryCatalog,
+    clear_battery_catalog_cache,
+    equipment_cost_for_bundle,
+    load_battery_catalog,
+    load_battery_catalog_json,
+)
+
+CATALOG = PYTHON_DIR.parent / "data" / "battery-catalog.csv"
+LIBRARY = PYTHON_DIR.parent / "data" / "library" / "batteries.json"
+
+
+class TestCatalogCache(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_battery_catalog_cache()
+        self.addCleanup(clear_battery_catalog_cache)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "catalog.csv")
+        shutil.copyfile(CATALOG, self.path)
+        parse = mock.patch.object(
+            catalog_module, "load_battery_catalog_csv", wraps=catalog_module.load_battery_catalog_csv
+        )
+        self.parse = parse.start()
+        self.addCleanup(parse.stop)
+
+    def test_hit_returns_the_same_catalog(self) -> None:
+        first = load_battery_catalog(self.path)
+        with mock.patch("builtins.open", side_effect=AssertionError("cache hit read the file")):
+            second = load_battery_catalog(self.path)
+        self.assertIs(second, first)
+        self.assertEqual(self.parse.call_count, 1)
+
+    def test_touch_rehashes_without_reparsing(self) -> None:
+        first = load_battery_catalog(self.path)
+        st = os.stat(self.path)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+        self.assertIs(load_battery_catalog(self.path), first)
+        self.assertEqual(self.parse.call_count, 1)
+        # The new stamp is cached: the next load is a plain hit
+        with mock.patch("builtins.open", side_effect=AssertionError("cache hit read the file")):
+            self.assertIs(load_battery_catalog(self.path), first)
+
+    def test_content_change_reparses(self) -> None:
+        first = load_battery_catalog(self.path)
+        text = Path(self.path).read_text(encoding="utf-8")
+        sku = first.skus[0]
+        Path(self.path).write_text(text.replace(str(int(sku.price_1_10)), str(int(sku.price_1_10) + 1), 1))
+        second = load_battery_catalog(self.path)
+        self.assertIsNot(second, first)
+        self.assertNotEqual(second.digest, first.digest)
+        self.assertEqual(self.parse.call_count, 2)
+        self.assertEqual(second.by_id[sku.id].price_1_10, sku.price_1_10 + 1)
+
+    def test_arrays_are_read_only(self) -> None:
+        catalog = load_battery_catalog(self.path)
+        for f in fields(BatteryCatalog):
+            arr = getattr(catalog, f.name)
+            if isinstance(arr, np.ndarray):
+                with self.subTest(field=f.name):
+                    with self.assertRaises(ValueError):
+                        arr[0] = arr[0]
+
+
+class TestEquipmentCost(unittest.TestCase):
+    def test_vectorized_matches_per_bundle_at_tier_boundaries(self) -> None:
+        catalog = load_battery_catalog(str(CATALOG))
+        ids = [s.id for s in catalog.skus]
+        bundles = [{sku_id: q} for sku_id in ids for q in (1, 10, 11, 20, 21, 50, 51, 120)]
+        rng = np.random.default_rng(4)
+        for _ in range(50):
+            picks = rng.choice(len(ids), size=3, replace=False)
+            bundles.append({ids[k]: int(q) for k, q in zip(picks, rng.choice([0, 10, 11, 20, 21, 50, 51], size=3))})
+        got = catalog.equipment_cost(catalog.qty_matrix(bundles))
+        want = [equipment_cost_for_bundle(catalog.by_id, b) for b in bundles]
+        np.testing.assert_allclose(got, want, rtol=1e-12)
+        sku = catalog.skus[0]
+        for q, price in ((10, sku.price_1_10), (11, sku.price_11_20), (21, sku.price_21_50), (51, sku.price_50_plus)):
+            self.assertEqual(catalog.equipment_cost(catalog.qty_matrix([{sku.id: q}]))[0], q * price)
+
+
+class TestJsonLoader(unittest.TestCase):
+    def test_library_matches_csv(self) -> None:
+        from_json = load_battery_catalog(str(LIBRARY))
+        from_csv = load_battery_catalog(str(CATALOG))
+        self.assertEqual(len(from_json.skus), len(json.loads(LIBRARY.read_text(encoding="utf-8"))))
+        self.assertEqual(sorted(from_json.skus, key=lambda s: s.id), sorted(from_csv.skus, key=lambda s: s.id))
+        self.assertTrue(all(0.0 < s.round_trip_efficiency <= 1.0 for s in from_json.skus))
+
+    def test_wrapped_records_and_percent_efficiency(self) -> None:
+        rows = json.loads(LIBRARY.read_text(encoding="utf-8"))[:2]
+        rows[0] = {**rows[0], "efficiency": 100.0 * rows[0]["efficiency"]}
+        rows[1] = {**rows[1], "active": "No"}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "batteries.json")
+            Path(path).write_text(json.dumps({"batteries": rows}), encoding="utf-8")
+            skus = load_battery_catalog_json(path)
+        self.assertAlmostEqual(skus[0].round_trip_efficiency, rows[0]["efficiency"] / 100.0)
+        self.assertEqual([s.active for s in skus], [True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
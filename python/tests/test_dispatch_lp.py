@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import datetime as dt
+import math
+import sys
+import unittest
+from dataclasses import replace
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from everwatt_battery_engine import dispatch_lp  # noqa: E402
+from everwatt_battery_engine.dispatch_lp import (  # noqa: E402
+    _split_efficiency,
+    coarse_time_blocks,
+    optimize_bill_critical_windows,
+    optimize_bill_lp,
+)
+from everwatt_battery_engine.evaluation import build_site_context, scenarios_for_rate  # noqa: E402
+from everwatt_battery_engine.intervals import normalize_intervals  # noqa: E402
+from everwatt_battery_engine.tariffs.bill import calculate_bill  # noqa: E402
+from everwatt_battery_engine.types import Bundle, Interval, OptimizationConfig  # noqa: E402
+
+TOL = 1e-6
+
+
+def _intervals(days: int, start: dt.datetime, day_scale: tuple = (1.0, 1.0)) -> list[Interval]:
+    rng = np.random.default_rng(3)
+    scale = rng.uniform(*day_scale, days)
+    out: list[Interval] = []
+    for i in range(days * 96):
+        t = start + dt.timedelta(minutes=15 * i)
+        hour = t.hour + t.minute / 60.0
+        peak = 90.0 + 25.0 * math.sin(i / 96.0) if 16 <= hour < 21 else 0.0
+        kw = 120.0 + 30.0 * math.sin(2 * math.pi * hour / 24.0) + peak + float(rng.normal(0.0, 2.0))
+        out.append(Interval(timestamp=t.isoformat(), kw=kw * scale[i // 96]))
+    return out
+
+
+def _site(days: int = 14, day_scale: tuple = (1.0, 1.0)) -> tuple:
+    start = dt.datetime(2025, 7, 1, tzinfo=dt.timezone.utc)
+    norm = normalize_intervals(_intervals(days, start, day_scale), timezone="UTC", fill_gaps=False)
+    ctx = build_site_context(norm.df, norm.interval_hours, scenarios_for_rate("B-19"), OptimizationConfig())
+    return ctx.dispatch_intervals, ctx.rate_plans["pge_b19"], norm.interval_hours
+
+
+def _bundle(P: float, E: float, rte: float) -> Bundle:
+    return Bundle(sku_qty={"x": 1}, total_power_kw=P, total_energy_kwh=E, capex_usd=1.0, round_trip_efficiency=rte)
+
+
+def _with_net(intervals: list, net: list, h: float) -> list:
+    return [replace(i, kW_base=float(x), kWh_base=float(x) * h) for i, x in zip(intervals, net)]
+
+
+BUNDLES = [_bundle(50.0, 100.0, 0.9), _bundle(120.0, 240.0, 0.85), _bundle(80.0, 480.0, 0.95)]
+SETTINGS = [
+    dict(no_export=True, interconnect_kw=None),
+    dict(no_export=False, interconnect_kw=None),
+    dict(no_export=True, interconnect_kw=60.0),
+]
+
+
+class TestCoarsenedDispatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.intervals, cls.plan, cls.h = _site()
+        cls.base = np.array([i.kW_base for i in cls.intervals])
+
+    def assert_feasible(self, sol, bundle: Bundle, *, no_export: bool, interconnect_kw: float | None) -> None:
+        n = len(self.intervals)
+        ch = np.asarray(sol.charge_kw_series)
+        dis = np.asarray(sol.discharge_kw_series)
+        soc = np.asarray(sol.soc_kwh_series)
+        self.assertEqual((len(ch), len(dis), len(sol.net_load_series)), (n, n, n))
+        self.assertEqual(len(soc), n + 1)
+        dis_ub = min(bundle.total_power_kw, interconnect_kw) if interconnect_kw is not None else bundle.total_power_kw
+        self.assertGreaterEqual(ch.min(), -TOL)
+        self.assertGreaterEqual(dis.min(), -TOL)
+        self.assertLessEqual(ch.max(), bundle.total_power_kw + TOL)
+        self.assertLessEqual(dis.max(), dis_ub + TOL)
+        self.assertGreaterEqual(soc.min(), -TOL)
+        self.assertLessEqual(soc.max(), bundle.total_energy_kwh + TOL)
+        eta_c, eta_d = _split_efficiency(bundle.round_trip_efficiency)
+        np.testing.assert_allclose(np.diff(soc), (eta_c * ch - dis / eta_d) * self.h, atol=1e-6)
+        np.testing.assert_allclose(sol.net_load_series, self.base + ch - dis, atol=1e-9)
+        if no_export:
+            self.assertGreaterEqual(min(sol.net_load_series), -TOL)
+
+    def test_blocks_partition_the_horizon(self) -> None:
+        bundle = BUNDLES[0]
+        eta_d = _split_efficiency(bundle.round_trip_efficiency)[1]
+        blocks = coarse_time_blocks(
+            self.intervals, self.plan, interval_hours=self.h, power_kw=bundle.total_power_kw,
+            energy_kwh=bundle.total_energy_kwh, discharge_efficiency=eta_d,
+        )
+        self.assertEqual(blocks[0][0], 0)
+        self.assertEqual(blocks[-1][1], len(self.intervals))
+        self.assertTrue(all(a < b for a, b in blocks))
+        self.assertTrue(all(b == a2 for (_a, b), (a2, _b) in zip(blocks, blocks[1:])))
+        self.assertLess(len(blocks), len(self.intervals) // 2)
+        for a, b in blocks:
+            self.assertEqual(len({i.day_key for i in self.intervals[a:b]}), 1)
+
+    def test_coarse_dispatch_is_feasible_and_never_beats_the_full_lp(self) -> None:
+        for bundle in BUNDLES:
+            for settings in SETTINGS:
+                with self.subTest(P=bundle.total_power_kw, E=bundle.total_energy_kwh, **settings):
+                    kwargs = dict(interval_hours=self.h, **settings)
+                    full = optimize_bill_lp(self.intervals, bundle, self.plan, **kwargs)
+                    coarse = optimize_bill_lp(self.intervals, bundle, self.plan, coarsen=True, **kwargs)
+                    self.assert_feasible(coarse, bundle, **settings)
+                    self.assert_feasible(full, bundle, **settings)
+                    # Coarse savings <= full-LP savings, i.e. its bill is no lower
+                    self.assertGreaterEqual(coarse.bill_usd, full.bill_usd - 1e-6 * full.bill_usd)
+                    # The reported bill is what the tariff charges for the expanded net load
+                    exact = calculate_bill(_with_net(self.intervals, coarse.net_load_series, self.h), self.plan)
+                    self.assertAlmostEqual(coarse.bill_usd, exact.bill_usd, delta=1e-6 * exact.bill_usd)
+
+
+class TestCriticalWindows(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Days of varying size, so only some of them can set a monthly peak
+        cls.intervals, cls.plan, cls.h = _site(days=28, day_scale=(0.5, 1.0))
+
+    def _solve_logged(self, bundle: Bundle, **kwargs) -> tuple:
+        # Interval counts of every LP the decomposition solves, in order
+        sizes: list = []
+
+        def logged(intervals, *args, **kw):
+            sizes.append(len(intervals))
+            return optimize_bill_lp(intervals, *args, **kw)
+
+        with mock.patch.object(dispatch_lp, "optimize_bill_lp", logged):
+            sol = optimize_bill_critical_windows(self.intervals, bundle, self.plan, interval_hours=self.h, **kwargs)
+        return sol, sizes
+
+    def assert_exact_and_understated(self, sol, full) -> None:
+        exact = calculate_bill(_with_net(self.intervals, sol.net_load_series, self.h), self.plan)
+        self.assertAlmostEqual(sol.bill_usd, exact.bill_usd, delta=1e-6 * exact.bill_usd)
+        self.assertGreaterEqual(sol.bill_usd, full.bill_usd - 1e-6 * full.bill_usd)
+
+    def test_windowed_bill_is_exact_and_savings_understated(self) -> None:
+        for bundle in BUNDLES:
+            with self.subTest(P=bundle.total_power_kw, E=bundle.total_energy_kwh):
+                sol, sizes = self._solve_logged(bundle)
+                self.assertEqual(len(sizes), 1)
+                self.assertLess(sizes[0], len(self.intervals))
+                full = optimize_bill_lp(self.intervals, bundle, self.plan, interval_hours=self.h)
+                self.assert_exact_and_understated(sol, full)
+
+    def test_missed_peak_widens_the_windows(self) -> None:
+        # An optimistic screen (nothing can be shaved) marks only each group's peak day critical, so
+        # the first dispatch shaves it below days left outside and verification must add them.
+        bundle = BUNDLES[1]
+        with mock.patch.object(dispatch_lp, "_reachable_peak_kw", lambda base, idx, **kw: float(base[idx].max())):
+            sol, sizes = self._solve_logged(bundle)
+            fallback, capped = self._solve_logged(bundle, max_rounds=1)
+        n = len(self.intervals)
+        self.assertGreater(len(sizes), 1)
+        self.assertEqual(sizes, sorted(set(sizes)))
+        self.assertLess(sizes[-1], n)
+        full = optimize_bill_lp(self.intervals, bundle, self.plan, interval_hours=self.h)
+        self.assert_exact_and_understated(sol, full)
+        # The widened windows capture every monthly peak, so demand charges match the full LP
+        self.assertAlmostEqual(sol.demand_charges_usd, full.demand_charges_usd, delta=1e-6 * full.demand_charges_usd)
+
+        # Out of rounds: the full horizon is solved instead
+        self.assertEqual(capped, [sizes[0], n])
+        self.assertEqual(fallback.bill_usd, full.bill_usd)
+        self.assertEqual(fallback.net_load_series, full.net_load_series)
+
+
+class TestMarginalValues(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.intervals, cls.plan, cls.h = _site(days=7)
+
+    def _bill(self, P: float, E: float, rte: float, **kwargs) -> float:
+        return optimize_bill_lp(self.intervals, _bundle(P, E, rte), self.plan, interval_hours=self.h, **kwargs).bill_usd
+
+    def test_match_finite_differences(self) -> None:
+        # Power-bound and energy-bound bundles, each with and without the interconnect limit binding
+        sizes = [(50.0, 100.0, 0.9), (80.0, 480.0, 0.95), (40.0, 400.0, 0.9)]
+        options = [{}, dict(interconnect_kw=60.0), dict(initial_soc_frac=0.0)]
+        d = 1e-3
+        nonzero = 0
+        for P, E, rte in sizes:
+            for kwargs in options:
+                with self.subTest(P=P, E=E, rte=rte, **kwargs):
+                    sol = optimize_bill_lp(
+                        self.intervals, _bundle(P, E, rte), self.plan, interval_hours=self.h, marginal_values=True,
+                        **kwargs,
+                    )
+                    # Bill reduction per unit of P or E, from the right and from the left
+                    for mv, up, down in (
+                        (sol.marginal_bill_usd_per_kw, self._bill(P + d, E, rte, **kwargs),
+                         self._bill(P - d, E, rte, **kwargs)),
+                        (sol.marginal_bill_usd_per_kwh, self._bill(P, E + d, rte, **kwargs),
+                         self._bill(P, E - d, rte, **kwargs)),
+                    ):
+                        right = (sol.bill_usd - up) / d
+                        left = (down - sol.bill_usd) / d
+                        tol = 1e-3 * max(1.0, abs(mv))
+                        self.assertGreaterEqual(mv, min(left, right) - tol)
+                        self.assertLessEqual(mv, max(left, right) + tol)
+                        self.assertAlmostEqual(mv, 0.5 * (left + right), delta=tol)
+                        nonzero += mv > 0.0
+        self.assertGreater(nonzero, len(sizes) * len(options))
+
+
+if __name__ == "__main__":
+    unittest.main()
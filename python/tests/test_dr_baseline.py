@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import datetime as dt
+import sys
+import unittest
+from pathlib import Path
+from typing import Dict, List, Set
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from everwatt_battery_engine.dr_baseline import BaselineRule, DrEvent, settle_events  # noqa: E402
+from everwatt_battery_engine.dr_deliverable import DrFrame, prepare_dr_frame  # noqa: E402
+
+EVENTS = [
+    DrEvent(dt.date(2025, 5, 22), 16, 20),
+    DrEvent(dt.date(2025, 6, 3), 16, 20),
+    DrEvent(dt.date(2025, 6, 4), 15, 19),  # back to back with the previous event
+    DrEvent(dt.date(2025, 6, 14), 14, 18),  # Saturday
+    DrEvent(dt.date(2025, 6, 20), 17, 21),  # incomplete at site "a"
+    DrEvent(dt.date(2025, 7, 7), 16, 20),  # after the July 4th holiday
+]
+HOLIDAYS = [dt.date(2025, 5, 26), dt.date(2025, 7, 4)]
+RULES = [
+    BaselineRule(),
+    BaselineRule(adjustment="additive", adjustment_cap=0.4),
+    BaselineRule(adjustment="none", baseline_days=5, lookback_days=10),
+]
+
+
+def _site_frame(seed: int, start: str, days: int, drop_days: List[str]) -> DrFrame:
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range(start, periods=days * 96, freq="15min", tz="UTC")
+    h = ts.hour + ts.minute / 60.0
+    kw = 200.0 + 80.0 * np.sin((h - 6.0) / 24.0 * 2.0 * np.pi) + 30.0 * (ts.weekday < 5)
+    kw = kw + rng.normal(0.0, 15.0, len(ts))
+    df = pd.DataFrame({"ts": ts, "kw": kw})
+    # A few readings missing on these days: never baseline days, and their event means skip the gaps
+    for day in drop_days:
+        rows = np.flatnonzero(df["ts"].dt.strftime("%Y-%m-%d") == day)
+        df = df.drop(index=rows[[10, 70, 71]])
+    return prepare_dr_frame(df)
+
+
+def _reference(frame: DrFrame, rule: BaselineRule, excluded: Set[dt.date]) -> List[tuple]:
+    # Brute force: one day at a time, straight from the rule's definition
+    ih = frame.interval_hours
+    slots = int(round(24.0 / ih))
+    load: Dict[dt.date, np.ndarray] = {}
+    for t, kw in zip(frame.ts, frame.kw):
+        day = t.date()
+        load.setdefault(day, np.full(slots, np.nan))[int(round((t.hour + t.minute / 60.0) / ih))] = kw
+    event_days = {e.day for e in EVENTS}
+
+    out = []
+    for ei, e in enumerate(EVENTS):
+        if e.day not in load:
+            continue
+        weekend = e.day.weekday() >= 5
+        eligible = [
+            d for d in load
+            if d < e.day and (d.weekday() >= 5) == weekend and d not in event_days and d not in excluded
+            and not np.isnan(load[d]).any()
+        ]
+        days = sorted(eligible, reverse=True)[: rule.baseline_days]
+        days = [d for d in days if (e.day - d).days <= rule.lookback_days]
+        profile = np.mean([load[d] for d in days], axis=0) if days else np.full(slots, np.nan)
+        actual = load[e.day]
+
+        lo, hi = int(round(e.start_hour / ih)), int(round(e.end_hour / ih))
+        adj_hi = lo - int(round(rule.adjustment_gap_hours / ih))
+        adj_lo = max(0, adj_hi - int(round(rule.adjustment_hours / ih)))
+        unadjusted = profile[lo:hi].mean()
+        actual_kw = np.nanmean(actual[lo:hi])
+        base_adj = profile[adj_lo:adj_hi].mean()
+        actual_adj = np.nanmean(actual[adj_lo:adj_hi])
+        if rule.adjustment == "multiplicative":
+            usable = np.isfinite(base_adj) and np.isfinite(actual_adj) and base_adj > 0
+            factor = np.clip(actual_adj / base_adj, 1 - rule.adjustment_cap, 1 + rule.adjustment_cap) if usable else 1.0
+            baseline = unadjusted * factor
+        elif rule.adjustment == "additive":
+            usable = np.isfinite(base_adj) and np.isfinite(actual_adj)
+            limit = rule.adjustment_cap * abs(base_adj)
+            factor = np.clip(actual_adj - base_adj, -limit, limit) if usable else 0.0
+            baseline = unadjusted + factor
+        else:
+            factor = 0.0
+            baseline = unadjusted
+        out.append((ei, baseline, actual_kw, factor, len(days)))
+    return out
+
+
+class TestSettleEventsReference(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Site "b" starts after site "a" in time but follows it in the stacked day rows, so a
+        # selection leaking across sites would pick "a"'s last days for "b"'s first events.
+        cls.sites = {
+            "a": _site_frame(1, "2025-04-01", 100, ["2025-05-30", "2025-06-13", "2025-06-20"]),
+            "b": _site_frame(2, "2025-05-25", 60, ["2025-06-02"]),
+        }
+
+    def test_matches_brute_force(self) -> None:
+        for rule in RULES:
+            settlement = settle_events(self.sites, EVENTS, rule=rule, excluded_days=HOLIDAYS)
+            for si, site_id in enumerate(self.sites):
+                with self.subTest(adjustment=rule.adjustment, site=site_id):
+                    want = _reference(self.sites[site_id], rule, set(HOLIDAYS))
+                    rows = np.flatnonzero(settlement.site_index == si)
+                    self.assertEqual(settlement.event_index[rows].tolist(), [w[0] for w in want])
+                    for w, r in zip(want, rows):
+                        got = (
+                            settlement.baseline_kw[r],
+                            settlement.actual_kw[r],
+                            settlement.adjustment[r],
+                            settlement.baseline_days[r],
+                        )
+                        np.testing.assert_allclose(got, w[1:], rtol=1e-12, atol=1e-9)
+
+    def test_edge_cases_are_exercised(self) -> None:
+        settlement = settle_events(self.sites, EVENTS, rule=RULES[2], excluded_days=HOLIDAYS)
+        by_site = {}
+        for si, site_id in enumerate(self.sites):
+            rows = settlement.site_index == si
+            by_site[site_id] = dict(zip(settlement.event_index[rows].tolist(), settlement.baseline_days[rows].tolist()))
+        # Site "b" has no data on the first event day, and few prior days for the next ones
+        self.assertNotIn(0, by_site["b"])
+        self.assertLess(by_site["b"][1], RULES[2].baseline_days)
+        # Weekend event: only Saturdays and Sundays within the 10-day lookback
+        self.assertEqual(by_site["a"][3], 2)
+        # The incomplete event day still settles
+        self.assertIn(4, by_site["a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import json
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from everwatt_battery_engine import dr_codec  # noqa: E402
+from everwatt_battery_engine.dr_codec import dumps, load_payload, payload_to_npz  # noqa: E402
+
+NUMPY_RESULT = {
+    "deliverableTotalKw": np.float64(12.5),
+    "daysEvaluated": np.int64(10),
+    "ratio": np.float32(0.5),
+    "ok": np.bool_(True),
+    "curve": np.arange(3.0),
+    "column": np.arange(6.0).reshape(2, 3)[:, 0],
+    7: "int key",
+}
+EXPECTED = {
+    "deliverableTotalKw": 12.5,
+    "daysEvaluated": 10,
+    "ratio": 0.5,
+    "ok": True,
+    "curve": [0.0, 1.0, 2.0],
+    "column": [0.0, 3.0],
+    "7": "int key",
+}
+
+
+class TestDumps(unittest.TestCase):
+    def test_numpy_values_serialize(self) -> None:
+        self.assertEqual(json.loads(dumps(NUMPY_RESULT)), EXPECTED)
+
+    def test_stdlib_fallback_matches(self) -> None:
+        with mock.patch.object(dr_codec, "orjson", None):
+            self.assertEqual(json.loads(dumps(NUMPY_RESULT)), EXPECTED)
+
+    def test_unserializable_still_raises(self) -> None:
+        with self.assertRaises(TypeError):
+            dumps({"x": object()})
+
+
+class TestNpzPayload(unittest.TestCase):
+    def test_round_trip(self) -> None:
+        payload = {"intervals": {"ts": [0, 900_000], "kw": [1.0, None]}, "battery": {"power_kw": 5.0}}
+        back = load_payload(payload_to_npz(payload))
+        self.assertEqual(back["battery"], {"power_kw": 5.0})
+        np.testing.assert_array_equal(back["intervals"]["ts"], [0, 900_000])
+        np.testing.assert_array_equal(back["intervals"]["kw"], [1.0, np.nan])
+
+
+if __name__ == "__main__":
+    unittest.main()
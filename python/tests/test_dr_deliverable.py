@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import random
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from everwatt_battery_engine.dr_deliverable import (  # noqa: E402
+    _max_k_bisection,
+    _max_k_lp,
+    _maximize_k_for_day,
+    _one_way_efficiency,
+    compute_dr_deliverable_curve,
+    compute_dr_deliverables,
+    prepare_dr_frame,
+)
+from everwatt_battery_engine.dr_season import _max_k_runs  # noqa: E402
+
+
+def _payload(days: int = 60) -> dict:
+    rng = np.random.default_rng(3)
+    ts = pd.date_range("2024-06-01", periods=days * 96, freq="15min", tz="UTC")
+    hour = ts.hour + ts.minute / 60.0
+    kw = 400.0 + 150.0 * np.sin((hour - 6.0) / 24.0 * 2 * np.pi) + rng.normal(0.0, 40.0, ts.size)
+    return {
+        "intervals": [{"ts": t.isoformat(), "kw": float(k)} for t, k in zip(ts, kw)],
+        "battery": {"power_kw": 300.0, "energy_kwh": 1200.0, "round_trip_efficiency": 0.9},
+        "window": {"startHour": 16, "endHour": 21, "weekdaysOnly": True},
+    }
+
+
+class TestShuffledRows(unittest.TestCase):
+    def test_row_order_does_not_change_cadence_or_deliverables(self) -> None:
+        payload = _payload()
+        expected = compute_dr_deliverables(payload)
+        self.assertGreater(expected["deliverableTotalKw"], 0.0)
+        for seed in range(5):
+            rows = list(payload["intervals"])
+            random.Random(seed).shuffle(rows)
+            frame = prepare_dr_frame(pd.DataFrame(rows))
+            self.assertAlmostEqual(frame.interval_hours, 0.25)
+            self.assertEqual(compute_dr_deliverables({**payload, "intervals": rows}), expected)
+
+
+class TestBisectionValidation(unittest.TestCase):
+    def test_non_positive_interval_is_rejected(self) -> None:
+        frame = prepare_dr_frame(pd.DataFrame(_payload(2)["intervals"]))
+        day = (frame.kw[:96], frame.hour[:96] >= 16)
+        for interval_hours in (0.0, -0.25):
+            with self.assertRaises(ValueError):
+                _max_k_bisection(
+                    [day], interval_hours=interval_hours, P=100.0, E=400.0, eta_c=0.95, eta_d=0.95,
+                    no_export=True, soc0_frac=0.5,
+                )
+            with self.assertRaises(ValueError):
+                _max_k_runs(
+                    [(False, 64), (True, 20)], 200.0, 100.0, P=100.0, gain=23.75, drain=interval_hours / 0.95, E=400.0
+                )
+
+
+def _days() -> list:
+    # 15-minute days with a 16:00-21:00 event, plus the edge cases each solver special-cases
+    rng = np.random.default_rng(11)
+    event = (np.arange(96) >= 64) & (np.arange(96) < 84)
+    days = []
+    for level in (80.0, 250.0, 600.0):
+        days.append((level + rng.normal(0.0, 0.2 * level, 96), event))
+    days.append((np.full(96, 300.0), np.zeros(96, dtype=bool)))  # no event interval
+    days.append((np.full(96, 40.0), event))  # event load below P: bound by no export
+    dip = np.full(96, 300.0)
+    dip[70] = -5.0  # exporting during the event: no k is feasible under no export
+    days.append((dip, event))
+    days.append((np.array([300.0]), np.array([True])))  # too short to dispatch
+    return days
+
+
+def _reference_lp(base, is_event, *, interval_hours, P, E, eta_c, eta_d, no_export, soc0_frac) -> float:
+    # The day LP as written before it was built row by row: expression API over the whole day
+    from ortools.linear_solver import pywraplp
+
+    n = len(base)
+    if n < 2 or not is_event.any():
+        return 0.0
+    solver = pywraplp.Solver.CreateSolver("GLOP")
+    ch = [solver.NumVar(0.0, P, "") for _ in range(n)]
+    dis = [solver.NumVar(0.0, P, "") for _ in range(n)]
+    soc = [solver.NumVar(0.0, E, "") for _ in range(n + 1)]
+    k = solver.NumVar(0.0, P, "k")
+    solver.Add(soc[0] == float(max(0.0, min(E, soc0_frac * E))))
+    for t in range(n):
+        solver.Add(soc[t + 1] == soc[t] + (eta_c * ch[t] - dis[t] / eta_d) * interval_hours)
+        if no_export:
+            solver.Add(dis[t] <= float(base[t]) + ch[t])
+        if is_event[t]:
+            solver.Add(ch[t] - dis[t] + k <= 0.0)
+    solver.Maximize(k - 1e-6 * solver.Sum(dis))
+    return float(k.solution_value()) if solver.Solve() == pywraplp.Solver.OPTIMAL else 0.0
+
+
+class TestBisectionMatchesLp(unittest.TestCase):
+    def test_bisection_equals_day_lp(self) -> None:
+        days = _days()
+        bound = {"power": 0, "energy": 0}
+        # (P, E, RTE): power-bound (E >> P * event hours) through energy-bound (E << P * event hours)
+        for P, E, rte in [(100.0, 2000.0, 0.9), (200.0, 800.0, 0.85), (300.0, 300.0, 0.95), (500.0, 100.0, 0.8)]:
+            eta = _one_way_efficiency(rte)
+            for no_export in (True, False):
+                for soc0_frac in (0.0, 0.5, 1.0):
+                    params = dict(
+                        interval_hours=0.25, P=P, E=E, eta_c=eta, eta_d=eta, no_export=no_export, soc0_frac=soc0_frac
+                    )
+                    ks = _max_k_bisection(days, **params)
+                    for (base, ev), k in zip(days, ks):
+                        lp = _maximize_k_for_day(base, ev, **params)
+                        with self.subTest(P=P, E=E, rte=rte, no_export=no_export, soc0_frac=soc0_frac):
+                            self.assertAlmostEqual(k, lp, delta=1e-6 * max(1.0, P))
+                            self.assertAlmostEqual(lp, _reference_lp(base, ev, **params), delta=1e-6 * max(1.0, P))
+                        if ev.any() and len(base) > 1 and k > 0:
+                            bound["power" if k >= min(P, base[ev].min() if no_export else P) - 1e-6 else "energy"] += 1
+                    self.assertEqual(ks[3], 0.0)
+                    self.assertEqual(ks[6], 0.0)
+                    if no_export:
+                        self.assertEqual(ks[5], 0.0)
+        # Both regimes were actually exercised
+        self.assertGreater(bound["power"], 0)
+        self.assertGreater(bound["energy"], 0)
+
+    def test_lp_pool_keeps_day_order(self) -> None:
+        days = _days()
+        eta = _one_way_efficiency(0.9)
+        params = dict(interval_hours=0.25, P=200.0, E=800.0, eta_c=eta, eta_d=eta, no_export=True, soc0_frac=0.5)
+        self.assertEqual(_max_k_lp(days, params, workers=2), _max_k_lp(days, params, workers=1))
+
+    def test_payload_solvers_agree(self) -> None:
+        payload = _payload(30)
+        for no_export in (True, False):
+            for soc0_frac in (0.0, 1.0):
+                opts = {"noExport": no_export, "soc0Frac": soc0_frac}
+                bisection = compute_dr_deliverables({**payload, "options": opts})
+                lp = compute_dr_deliverables({**payload, "options": {**opts, "solver": "lp"}})
+                self.assertAlmostEqual(bisection["deliverableTotalKw"], lp["deliverableTotalKw"], delta=1e-5)
+                self.assertEqual(bisection["daysEvaluated"], lp["daysEvaluated"])
+
+
+class TestDeliverableCurve(unittest.TestCase):
+    def assert_points_match_single_calls(self, payload: dict, curve: dict) -> None:
+        for point in curve["points"]:
+            battery = {
+                "power_kw": point["powerKw"],
+                "energy_kwh": point["energyKwh"],
+                "round_trip_efficiency": point["roundTripEfficiency"],
+            }
+            single = compute_dr_deliverables({**payload, "battery": battery})
+            with self.subTest(**battery):
+                self.assertEqual(point["deliverableTotalKw"], single["deliverableTotalKw"])
+                self.assertEqual(point["deliverableBatteryKw"], single["deliverableBatteryKw"])
+                self.assertEqual(curve["deliverableOpsKw"], single["deliverableOpsKw"])
+                self.assertEqual(curve["daysEvaluated"], single["daysEvaluated"])
+
+    def test_points_equal_single_size_calls(self) -> None:
+        payload = _payload(30)
+        batteries = [
+            {"power_kw": 300.0, "energy_kwh": 1200.0, "round_trip_efficiency": 0.9},
+            {"power_kw": 50.0, "energy_kwh": 2000.0, "round_trip_efficiency": 0.95},
+            {"power_kw": 500.0, "energy_kwh": 100.0, "round_trip_efficiency": 0.8},
+        ]
+        for opts in ({}, {"noExport": False, "soc0Frac": 1.0}, {"solver": "lp"}):
+            with self.subTest(**opts):
+                sized = {**payload, "options": opts}
+                curve = compute_dr_deliverable_curve({**sized, "batteries": batteries})
+                self.assertEqual([p["powerKw"] for p in curve["points"]], [b["power_kw"] for b in batteries])
+                self.assert_points_match_single_calls(sized, curve)
+
+    def test_grid_is_power_major(self) -> None:
+        payload = {**_payload(30), "grid": {"powerKw": [100.0, 250.0], "energyKwh": [200.0, 800.0, 1600.0]}}
+        curve = compute_dr_deliverable_curve(payload)
+        sizes = [(p["powerKw"], p["energyKwh"], p["roundTripEfficiency"]) for p in curve["points"]]
+        self.assertEqual(sizes, [(P, E, 0.9) for P in (100.0, 250.0) for E in (200.0, 800.0, 1600.0)])
+        self.assert_points_match_single_calls(payload, curve)
+
+        payload["grid"]["roundTripEfficiency"] = [0.85, 0.95]
+        points = compute_dr_deliverable_curve(payload)["points"]
+        sizes = [(p["powerKw"], p["energyKwh"], p["roundTripEfficiency"]) for p in points]
+        self.assertEqual(
+            sizes, [(P, E, r) for P in (100.0, 250.0) for E in (200.0, 800.0, 1600.0) for r in (0.85, 0.95)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
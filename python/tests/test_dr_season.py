@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from everwatt_battery_engine.dr_deliverable import DrFrame, EventWindow, prepare_dr_frame  # noqa: E402
+from everwatt_battery_engine.dr_season import simulate_dr_season  # noqa: E402
+
+EVENING = EventWindow(16, 21, weekdays_only=False)
+LONG_DAY = EventWindow(8, 22, weekdays_only=False)
+
+
+def _frame(days: int, *, hot_every: int | None = None, seed: int = 5) -> DrFrame:
+    rng = np.random.default_rng(seed)
+    ts = pd.date_range("2025-06-01", periods=days * 96, freq="15min", tz="UTC")
+    hour = ts.hour + ts.minute / 60.0
+    kw = 500.0 + 200.0 * np.exp(-((hour - 17.0) ** 2) / 8.0) + rng.normal(0.0, 20.0, ts.size)
+    df = pd.DataFrame({"ts": ts, "kw": kw})
+    if hot_every is None:
+        return prepare_dr_frame(df)
+    # Every hot_every-th day is hot, so the top hot days sit hot_every - 1 recharge days apart
+    day = np.arange(ts.size) // 96
+    df["temp"] = 20.0 + 15.0 * (day % hot_every == 0) + rng.normal(0.0, 0.5, ts.size)
+    return prepare_dr_frame(df, temp_col="temp")
+
+
+class TestSeasonCarry(unittest.TestCase):
+    def test_long_recharge_gaps_match_reset(self) -> None:
+        frame = _frame(60, hot_every=5)
+        for P, E in ((100.0, 400.0), (300.0, 1200.0), (50.0, 2000.0)):
+            with self.subTest(P=P, E=E):
+                r = simulate_dr_season(frame, w=EVENING, P=P, E=E, round_trip_efficiency=0.9, soc0_frac=1.0)
+                self.assertEqual(len(r.days), 10)
+                self.assertTrue(all((b - a).days == 5 for a, b in zip(r.days, r.days[1:])))
+                np.testing.assert_allclose(r.event_kw, r.reset_kw, rtol=0.0, atol=1e-6 * P)
+                self.assertAlmostEqual(r.p20_kw, r.reset_p20_kw, delta=1e-6 * P)
+
+    def test_back_to_back_days_deliver_no_more_than_reset(self) -> None:
+        # A 14 h event with 10 h to recharge: each day starts no fuller than the last
+        frame = _frame(10)
+        r = simulate_dr_season(frame, w=LONG_DAY, P=100.0, E=1500.0, round_trip_efficiency=0.9, soc0_frac=1.0)
+        self.assertEqual(len(r.days), 10)
+        self.assertTrue(all((b - a).days == 1 for a, b in zip(r.days, r.days[1:])))
+        for carried, reset in zip(r.event_kw, r.reset_kw):
+            self.assertLessEqual(carried, reset + 1e-9 * 100.0)
+        self.assertLess(r.event_kw[-1], r.reset_kw[-1] - 1.0)
+        self.assertLess(r.p20_kw, r.reset_p20_kw)
+        self.assertLess(r.soc_start_kwh[-1], r.soc_start_kwh[0])
+        self.assertTrue(all(b <= a + 1e-6 for a, b in zip(r.soc_start_kwh, r.soc_start_kwh[1:])))
+
+    def test_bisection_and_lp_agree(self) -> None:
+        cases = [
+            (_frame(30), EVENING, dict(P=300.0, E=1200.0, soc0_frac=0.5)),
+            (_frame(10), LONG_DAY, dict(P=100.0, E=1500.0, soc0_frac=1.0)),
+            (_frame(60, hot_every=5), EVENING, dict(P=400.0, E=800.0, soc0_frac=0.2)),
+        ]
+        for frame, w, kwargs in cases:
+            for no_export in (True, False):
+                with self.subTest(window=(w.start_hour, w.end_hour), no_export=no_export, **kwargs):
+                    common = dict(w=w, round_trip_efficiency=0.9, no_export=no_export, **kwargs)
+                    bisection = simulate_dr_season(frame, **common)
+                    lp = simulate_dr_season(frame, solver="lp", **common)
+                    tol = 1e-6 * kwargs["P"]
+                    self.assertGreater(bisection.firm_kw, 0.0)
+                    self.assertAlmostEqual(bisection.firm_kw, lp.firm_kw, delta=tol)
+                    np.testing.assert_allclose(bisection.event_kw, lp.event_kw, rtol=0.0, atol=tol)
+                    np.testing.assert_allclose(bisection.reset_kw, lp.reset_kw, rtol=0.0, atol=tol)
+
+
+if __name__ == "__main__":
+    unittest.main()
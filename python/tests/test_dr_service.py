@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import io
+import json
+import sys
+import unittest
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from everwatt_battery_engine.dr_deliverable import compute_dr_deliverables  # noqa: E402
+from everwatt_battery_engine.dr_service import DrService, serve_json_lines  # noqa: E402
+
+
+class _ManualService:
+    # DrService's interface with futures the test resolves itself
+    def __init__(self) -> None:
+        self.futures: List[Future] = []
+
+    def health(self) -> Dict[str, Any]:
+        return {"status": "ok"}
+
+    def submit(self, payload: Dict[str, Any], op: str = "deliverables") -> Future:
+        fut: Future = Future()
+        self.futures.append(fut)
+        return fut
+
+
+def _lines(out: io.StringIO) -> List[Dict[str, Any]]:
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def _payload() -> Dict[str, Any]:
+    ts = [f"2025-07-0{d}T{h:02d}:{m:02d}:00Z" for d in range(1, 4) for h in range(24) for m in (0, 15, 30, 45)]
+    kw = [300.0 + (200.0 if 16 <= int(t[11:13]) < 21 else 0.0) + (i % 7) for i, t in enumerate(ts)]
+    return {
+        "intervals": {"ts": ts, "kw": kw},
+        "battery": {"power_kw": 100.0, "energy_kwh": 400.0, "round_trip_efficiency": 0.9},
+        "window": {"startHour": 16, "endHour": 21, "weekdaysOnly": False},
+    }
+
+
+class TestServeJsonLines(unittest.TestCase):
+    def test_replies_match_request_ids(self) -> None:
+        payload = _payload()
+        requests = [
+            json.dumps({"id": "h", "op": "health"}),
+            json.dumps({"id": 1, "payload": payload}),
+            "",
+            "{not json",
+            json.dumps([1, 2]),
+            json.dumps({"id": "x", "op": "nope"}),
+            json.dumps({"id": 2, "op": "deliverables", "payload": {"intervals": [{"when": 1}]}}),
+        ]
+        out = io.StringIO()
+        with DrService(workers=1) as service:
+            serve_json_lines(service, io.StringIO("\n".join(requests) + "\n"), out)
+        replies = _lines(out)
+        # One reply per non-blank line
+        self.assertEqual(len(replies), 6)
+        by_id: Dict[Any, List[Dict[str, Any]]] = {}
+        for r in replies:
+            by_id.setdefault(r["id"], []).append(r)
+
+        (health,) = by_id["h"]
+        self.assertTrue(health["ok"])
+        self.assertEqual(health["result"]["status"], "ok")
+        (result,) = by_id[1]
+        self.assertTrue(result["ok"])
+        self.assertEqual(result["result"]["daysEvaluated"], 3)
+        self.assertEqual(result["result"], json.loads(json.dumps(compute_dr_deliverables(payload))))
+        # Lines that are not request objects carry no id
+        self.assertEqual([r["ok"] for r in by_id[None]], [False, False])
+        (unknown,) = by_id["x"]
+        self.assertFalse(unknown["ok"])
+        self.assertIn("unknown op", unknown["error"])
+        (failed,) = by_id[2]
+        self.assertFalse(failed["ok"])
+        self.assertTrue(failed["error"].startswith("ValueError:"))
+
+    def test_replies_come_in_completion_order(self) -> None:
+        service = _ManualService()
+        out = io.StringIO()
+        requests = "".join(json.dumps({"id": k, "payload": {}}) + "\n" for k in ("a", "b", "c"))
+        serve_json_lines(service, io.StringIO(requests), out)
+        self.assertEqual(out.getvalue(), "")
+        a, b, c = service.futures
+        c.set_result({"n": 3})
+        a.set_exception(ValueError("boom"))
+        b.set_result({"n": 2})
+        self.assertEqual(
+            _lines(out),
+            [
+                {"id": "c", "ok": True, "result": {"n": 3}},
+                {"id": "a", "ok": False, "error": "ValueError: boom"},
+                {"id": "b", "ok": True, "result": {"n": 2}},
+            ],
+        )
+
+    def test_unserializable_result_still_answers_its_id(self) -> None:
+        service = _ManualService()
+        out = io.StringIO()
+        serve_json_lines(service, io.StringIO('{"id": 1, "op": "deliverables", "payload": {}}\n'), out)
+        service.futures[0].set_result({"deliverableTotalKw": object()})
+        (reply,) = _lines(out)
+        self.assertEqual(reply["id"], 1)
+        self.assertFalse(reply["ok"])
+        self.assertIn("not serializable", reply["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from everwatt_battery_engine.interval_store import (  # noqa: E402
+    INDEX_FILE,
+    IntervalStore,
+    build_interval_store,
+    open_interval_store,
+)
+from everwatt_battery_engine.intervals import load_intervals_file, normalize_intervals  # noqa: E402
+
+
+def _write_csv(path: Path, ts: list, kw: list) -> str:
+    pd.DataFrame({"timestamp": ts, "kw": kw}).to_csv(path, index=False)
+    return str(path)
+
+
+def _quarter_hours(start: str, n: int) -> list:
+    return [t.isoformat() for t in pd.date_range(start, periods=n, freq="15min", tz="UTC")]
+
+
+class TestBuildIntervalStore(unittest.TestCase):
+    def test_bad_site_is_reported_and_the_rest_are_indexed(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            d = Path(tmp)
+            ts = _quarter_hours("2025-07-01", 8)
+            a = _write_csv(d / "a.csv", ts, [10.0 + i for i in range(8)])
+            # A repeated row (e.g. the fall-back hour of a local-time export) is not an error
+            b = _write_csv(d / "b.csv", ts[:4] + ts[3:], [float(i) for i in range(9)])
+            # Off the 15-minute grid
+            c = _write_csv(d / "c.csv", ts[:3] + ["2025-07-01T00:52:00+00:00"], [1.0, 2.0, 3.0, 4.0])
+
+            build = build_interval_store(str(d / "store"), [("a", a), ("c", c), ("b", b)])
+            self.assertEqual(build.written, ["a", "b"])
+            self.assertEqual(list(build.errors), ["c"])
+            self.assertIn("ValueError", build.errors["c"])
+
+            store = open_interval_store(str(d / "store"))
+            self.assertEqual(store.site_ids, ["a", "b"])
+            self.assertEqual(json.loads((d / "store" / INDEX_FILE).read_text())["sites"][0]["siteId"], "a")
+            np.testing.assert_array_equal(store.kw("a"), np.arange(8) + 10.0)
+            # The duplicated timestamp keeps its last reading
+            np.testing.assert_array_equal(store.kw("b"), [0.0, 1.0, 2.0, 4.0, 5.0, 6.0, 7.0, 8.0])
+
+
+class TestWriteSite(unittest.TestCase):
+    def test_duplicate_timestamps_keep_the_last_reading(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = IntervalStore(tmp)
+            ts = _quarter_hours("2025-11-02T08:00", 4)
+            e = store.write_site(
+                "s", [ts[2], ts[0], ts[1], ts[1], ts[3]], [3.0, 1.0, 2.0, 2.5, 4.0], temp=[30, 10, 20, 25, 40]
+            )
+            self.assertEqual(e.length, 4)
+            np.testing.assert_array_equal(store.kw("s"), [1.0, 2.5, 3.0, 4.0])
+            np.testing.assert_array_equal(store.temperature("s"), [10.0, 25.0, 30.0, 40.0])
+
+    def test_off_grid_timestamps_raise(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            ts = _quarter_hours("2025-07-01", 3) + ["2025-07-01T00:50:00Z"]
+            with self.assertRaises(ValueError):
+                IntervalStore(tmp).write_site("s", ts, [1.0, 2.0, 3.0, 4.0])
+
+
+class TestNormalized(unittest.TestCase):
+    def test_matches_normalize_intervals(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            d = Path(tmp)
+            ts = _quarter_hours("2025-06-30T22:00", 300)
+            kw = list(np.linspace(-5.0, 200.0, 300))
+            # A gap of a few readings, across a month boundary
+            path = _write_csv(d / "site.csv", ts[:7] + ts[12:], kw[:7] + kw[12:])
+            build_interval_store(str(d / "store"), [("site", path)])
+
+            got = open_interval_store(str(d / "store")).normalized("site")
+            want = normalize_intervals(load_intervals_file(path), timezone="UTC", fill_gaps=False)
+            self.assertEqual(got.interval_hours, want.interval_hours)
+            self.assertEqual(got.warnings, want.warnings)
+            self.assertEqual(list(got.df.columns), list(want.df.columns))
+            self.assertTrue((got.df["ts"] == want.df["ts"]).all())
+            np.testing.assert_array_equal(got.df["load_kw"].to_numpy(), want.df["load_kw"].to_numpy())
+            self.assertEqual(got.df["month_key"].tolist(), want.df["month_key"].tolist())
+            self.assertEqual(got.df["day_key"].tolist(), want.df["day_key"].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
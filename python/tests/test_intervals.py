@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from everwatt_battery_engine.intervals import (  # noqa: E402
+    KW_PARSE_WARNING,
+    aggregate_to_demand_interval,
+    load_intervals_file,
+    normalize_intervals,
+)
+from everwatt_battery_engine.types import Interval  # noqa: E402
+
+TS = [t.isoformat() for t in pd.date_range("2025-07-01", periods=6, freq="15min", tz="UTC")]
+
+
+def _minute_and_quarter_hour(days: int) -> tuple:
+    # 1-minute readings whose 15-minute means are exactly the 15-minute series: kW on a 1/64 grid
+    # plus deviations that cancel exactly within each interval
+    rng = np.random.default_rng(8)
+    quarter = pd.date_range("2025-06-28", periods=days * 96, freq="15min", tz="UTC")
+    kw = np.round(rng.uniform(80.0, 300.0, quarter.size) * 64.0) / 64.0
+    deviation = rng.permutation(np.arange(-7, 8) * 0.25)
+    minute = pd.date_range(quarter[0], periods=quarter.size * 15, freq="1min", tz="UTC")
+    fine_kw = np.repeat(kw, 15) + np.tile(deviation, kw.size)
+    fine = [Interval(timestamp=t.isoformat(), kw=float(k)) for t, k in zip(minute, fine_kw)]
+    coarse = [Interval(timestamp=t.isoformat(), kw=float(k)) for t, k in zip(quarter, kw)]
+    return fine, coarse
+
+
+class TestUnparseableKw(unittest.TestCase):
+    def test_csv_and_json_drop_the_same_rows(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            d = Path(tmp)
+            csv_path = d / "site.csv"
+            csv_path.write_text(
+                "timestamp,kw\n"
+                + "".join(f"{t},{v}\n" for t, v in zip(TS, ["10", "", "n/a", "abc", "14.5", "-2"])),
+                encoding="utf-8",
+            )
+            json_path = d / "site.json"
+            rows = [{"timestamp": t, "kw": v} for t, v in zip(TS, [10, None, "n/a", "abc", "14.5", -2])]
+            json_path.write_text(json.dumps({"intervals": rows}), encoding="utf-8")
+
+            for path in (csv_path, json_path):
+                with self.subTest(path=path.name):
+                    loaded = load_intervals_file(str(path))
+                    self.assertEqual(len(loaded), 6)
+                    self.assertTrue(all(np.isnan(i.kw) for i in loaded[1:4]))
+                    norm = normalize_intervals(loaded, timezone="UTC", fill_gaps=False)
+                    self.assertIn(KW_PARSE_WARNING, norm.warnings)
+                    np.testing.assert_array_equal(norm.df["load_kw"].to_numpy(), [10.0, 14.5, -2.0])
+                    self.assertEqual([t.isoformat() for t in norm.df["ts"]], [TS[0], TS[4], TS[5]])
+
+    def test_clean_file_has_no_warning(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "site.csv"
+            pd.DataFrame({"timestamp": TS, "kw": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]}).to_csv(path, index=False)
+            norm = normalize_intervals(load_intervals_file(str(path)), timezone="UTC", fill_gaps=False)
+            self.assertNotIn(KW_PARSE_WARNING, norm.warnings)
+            self.assertEqual(len(norm.df), 6)
+
+    def test_missing_kw_column_raises(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "site.json"
+            path.write_text(json.dumps([{"timestamp": TS[0], "load": 1.0}]), encoding="utf-8")
+            with self.assertRaises(ValueError):
+                load_intervals_file(str(path))
+
+
+
+class TestDemandIntervalAggregation(unittest.TestCase):
+    def test_minute_data_equals_pre_aggregated(self) -> None:
+        fine, coarse = _minute_and_quarter_hour(4)
+        norm_fine = normalize_intervals(fine, timezone="UTC", fill_gaps=False)
+        norm_coarse = normalize_intervals(coarse, timezone="UTC", fill_gaps=False)
+        agg = aggregate_to_demand_interval(norm_fine.df, norm_fine.interval_hours, 15)
+        self.assertIsNotNone(agg)
+        pd.testing.assert_frame_equal(agg.df, norm_coarse.df[agg.df.columns])
+        self.assertEqual(agg.interval_hours, norm_coarse.interval_hours)
+        self.assertEqual(len(agg.block), len(fine))
+        np.testing.assert_array_equal(agg.block, np.arange(len(fine)) // 15)
+        np.testing.assert_array_equal(agg.fine_load_kw, norm_fine.df["load_kw"].to_numpy())
+
+        # Expanded series cover every original row; SOC lands on the coarse values at interval starts
+        coarse_soc = np.linspace(0.0, 100.0, len(coarse) + 1)
+        self.assertEqual(len(agg.expand(np.arange(len(coarse)))), len(fine))
+        fine_soc = agg.expand_boundaries(coarse_soc)
+        self.assertEqual(len(fine_soc), len(fine) + 1)
+        np.testing.assert_allclose(fine_soc[::15], coarse_soc)
+
+        # Already at (or coarser than) the demand interval: nothing to aggregate
+        self.assertIsNone(aggregate_to_demand_interval(norm_coarse.df, norm_coarse.interval_hours, 15))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import datetime as dt
+import math
+import pickle
+import sys
+import unittest
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, List, Sequence
+from unittest import mock
+
+import numpy as np
+
+PYTHON_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PYTHON_DIR))
+
+from everwatt_battery_engine import optimize as optimize_module  # noqa: E402
+from everwatt_battery_engine.battery_catalog import load_battery_catalog  # noqa: E402
+from everwatt_battery_engine.evaluation import (  # noqa: E402
+    build_site_context,
+    evaluate_dispatch,
+    savings_upper_bound,
+    scenarios_for_rate,
+)
+from everwatt_battery_engine.intervals import normalize_intervals  # noqa: E402
+from everwatt_battery_engine.optimize import _site_tasks, optimize_site  # noqa: E402
+from everwatt_battery_engine.parallel import DispatchPool  # noqa: E402
+from everwatt_battery_engine.types import Bundle, Interval, OptimizationConfig  # noqa: E402
+
+CATALOG = PYTHON_DIR.parent / "data" / "battery-catalog.csv"
+
+
+def _intervals(days: int) -> list[Interval]:
+    start = dt.datetime(2025, 7, 1, tzinfo=dt.timezone.utc)
+    out: list[Interval] = []
+    for i in range(days * 96):
+        t = start + dt.timedelta(minutes=15 * i)
+        hour = t.hour + t.minute / 60.0
+        kw = 120.0 + 10.0 * math.sin(2 * math.pi * hour / 24.0) + (90.0 + 7.0 * (i % 5) if 16 <= hour < 21 else 0.0)
+        out.append(Interval(timestamp=t.isoformat(), kw=kw))
+    return out
+
+
+def _minute_intervals(days: int) -> list[Interval]:
+    # Each 15-minute reading of _intervals, rounded to a 1/64 kW grid, as 15 one-minute readings
+    # whose mean is exactly that reading
+    deviation = np.arange(-7, 8) * 0.25
+    out: list[Interval] = []
+    for i in _intervals(days):
+        t = dt.datetime.fromisoformat(i.timestamp)
+        kw = round(i.kw * 64.0) / 64.0
+        out.extend(
+            Interval(timestamp=(t + dt.timedelta(minutes=m)).isoformat(), kw=kw + deviation[m]) for m in range(15)
+        )
+    return out
+
+
+def _ranking(results) -> list:
+    return [
+        (
+            r.scenario.id,
+            tuple(sorted(r.bundle.sku_qty.items())),
+            r.savings_usd_per_year,
+            tuple((o.mode, o.price_usd, o.expected_tsv) for o in r.offers),
+        )
+        for r in results
+    ]
+
+
+class TestWorkerCount(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        norm = normalize_intervals(_intervals(7), timezone="UTC", fill_gaps=False)
+        cls.df, cls.h = norm.df, norm.interval_hours
+        cls.skus = load_battery_catalog(str(CATALOG)).active
+
+    def _run(self, workers: int, prune: bool = True):
+        return optimize_site(
+            self.df, self.h, skus=self.skus, top_n=5, candidate_caps=6, variations_per_cap=3, workers=workers,
+            prune=prune,
+        )
+
+    def test_two_workers_rank_like_one(self) -> None:
+        for prune in (True, False):
+            with self.subTest(prune=prune):
+                serial = self._run(1, prune)
+                pooled = self._run(2, prune)
+                self.assertEqual(len(serial.results), 5)
+                self.assertEqual(_ranking(pooled.results), _ranking(serial.results))
+                # Series are re-solved for the pooled top N and match the in-process ones
+                for a, b in zip(serial.results, pooled.results):
+                    self.assertEqual(len(b.net_kw_series), len(self.df))
+                    self.assertEqual(b.net_kw_series, a.net_kw_series)
+                    self.assertEqual(b.charge_kw_series, a.charge_kw_series)
+                    self.assertEqual(b.discharge_kw_series, a.discharge_kw_series)
+                    self.assertEqual(b.soc_kwh_series, a.soc_kwh_series)
+
+    def test_pool_returns_scalar_summaries(self) -> None:
+        cfg = OptimizationConfig()
+        _bundles, scenarios, _ctx, tasks = _site_tasks(
+            self.df, self.h, skus=self.skus, tariff_rate_code="B-19", cfg=cfg, candidate_caps=6,
+            variations_per_cap=3, rate_plans=None,
+        )
+        with DispatchPool(df=self.df, interval_hours=self.h, scenarios=scenarios, cfg=cfg, workers=2) as pool:
+            scalars = list(pool.map(tasks[:4]))
+            full = list(pool.map(tasks[:4], series=True))
+        self.assertTrue(all(s.net_kw_series is None and s.soc_kwh_series is None for s in scalars))
+        self.assertTrue(any(s.net_kw_series is not None for s in full))
+        self.assertEqual([s.savings_usd_per_year for s in scalars], [s.savings_usd_per_year for s in full])
+
+
+class _SliceLog(Sequence):
+    # A task list that records how far the pool has read into it
+    def __init__(self, items: List[Any]) -> None:
+        self.items = items
+        self.read = 0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, k: Any) -> Any:
+        if isinstance(k, slice):
+            self.read = max(self.read, min(k.stop, len(self.items)))
+        return self.items[k]
+
+
+class TestDispatchPoolWindow(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        norm = normalize_intervals(_intervals(7), timezone="UTC", fill_gaps=False)
+        cls.df, cls.h = norm.df, norm.interval_hours
+        cls.cfg = OptimizationConfig()
+        _bundles, cls.scenarios, _ctx, tasks = _site_tasks(
+            cls.df, cls.h, skus=load_battery_catalog(str(CATALOG)).active, tariff_rate_code="B-19", cfg=cls.cfg,
+            candidate_caps=6, variations_per_cap=3, rate_plans=None,
+        )
+        # Enough tasks that an eager submit would queue several windows' worth
+        cls.tasks = (tasks * 4)[:48]
+
+    def test_submission_is_bounded(self) -> None:
+        tasks = _SliceLog(self.tasks)
+        with DispatchPool(df=self.df, interval_hours=self.h, scenarios=self.scenarios, cfg=self.cfg, workers=2) as pool:
+            summaries = pool.map(tasks)
+            first = next(summaries)
+            # 2 chunks per worker in flight, of 48 // (2 * 4) tasks each
+            self.assertEqual(tasks.read, 2 * 2 * 6)
+            rest = list(summaries)
+        self.assertEqual(tasks.read, len(self.tasks))
+        got = [(s.bundle_index, s.scenario_id) for s in [first, *rest]]
+        self.assertEqual(got, [(bi, sc.id) for bi, _b, sc in self.tasks])
+
+    def test_pool_replies_are_scalar_sized(self) -> None:
+        # What crosses IPC per task: scalars by default, four horizon-long arrays with series=True
+        task = max(self.tasks[:8], key=lambda t: t[1].total_energy_kwh)
+        with DispatchPool(df=self.df, interval_hours=self.h, scenarios=self.scenarios, cfg=self.cfg, workers=2) as pool:
+            (scalar,) = pool.map([task])
+            (full,) = pool.map([task], series=True)
+        self.assertGreater(full.savings_usd_per_year, 0.0)
+        self.assertLess(len(pickle.dumps(scalar)), 1024)
+        self.assertGreater(len(pickle.dumps(full)), 4 * 8 * len(self.df))
+
+
+class TestPruning(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        norm = normalize_intervals(_intervals(7), timezone="UTC", fill_gaps=False)
+        cls.df, cls.h = norm.df, norm.interval_hours
+        cls.skus = load_battery_catalog(str(CATALOG)).active
+
+    def test_pruned_ranking_equals_exhaustive(self) -> None:
+        real = optimize_module.generate_candidate_bundles
+
+        def twinned(*args: Any, **kwargs: Any) -> list:
+            # Every bundle twice, the copy marked by a zero-quantity key: each pair ties on every
+            # ranking key, so only the canonical task order can separate them.
+            return [t for b in real(*args, **kwargs) for t in (b, replace(b, sku_qty={**b.sku_qty, "twin": 0}))]
+
+        kwargs: dict = dict(skus=self.skus, top_n=8, candidate_caps=6, variations_per_cap=3)
+        with mock.patch.object(optimize_module, "generate_candidate_bundles", twinned):
+            pruned = optimize_site(self.df, self.h, prune=True, **kwargs)
+            full = optimize_site(self.df, self.h, prune=False, **kwargs)
+        self.assertGreater(pruned.stats.dispatch_skipped, 0)
+        self.assertEqual(full.stats.dispatch_skipped, 0)
+        self.assertEqual(_ranking(pruned.results), _ranking(full.results))
+        # Tied pairs come out original first
+        self.assertEqual(["twin" in r.bundle.sku_qty for r in full.results], [False, True] * 4)
+        for a, b in zip(full.results[::2], full.results[1::2]):
+            self.assertEqual(b.bundle.sku_qty, {**a.bundle.sku_qty, "twin": 0})
+
+    def test_savings_upper_bound_holds(self) -> None:
+        rng = np.random.default_rng(11)
+        scenarios = scenarios_for_rate("B-19")
+        for cfg in (OptimizationConfig(), replace(OptimizationConfig(), no_export=False, interconnect_kw=60.0)):
+            ctx = build_site_context(self.df, self.h, scenarios, cfg)
+            for k in range(12):
+                P = float(rng.uniform(10.0, 250.0))
+                bundle = Bundle(
+                    sku_qty={"x": 1},
+                    total_power_kw=P,
+                    total_energy_kwh=P * float(rng.uniform(0.5, 6.0)),
+                    capex_usd=1.0,
+                    round_trip_efficiency=float(rng.uniform(0.75, 0.98)),
+                )
+                for sc in scenarios:
+                    with self.subTest(no_export=cfg.no_export, k=k, scenario=sc.id):
+                        lp = evaluate_dispatch(ctx, 0, bundle, sc, series=False).savings_usd_per_year
+                        bound = savings_upper_bound(ctx, bundle, sc)
+                        self.assertGreaterEqual(bound, lp - 1e-6 * max(1.0, abs(lp)))
+
+
+class TestDemandInterval(unittest.TestCase):
+    def test_minute_data_equals_pre_aggregated(self) -> None:
+        fine = normalize_intervals(_minute_intervals(7), timezone="UTC", fill_gaps=False)
+        quarter = [Interval(timestamp=i.timestamp, kw=round(i.kw * 64.0) / 64.0) for i in _intervals(7)]
+        coarse = normalize_intervals(quarter, timezone="UTC", fill_gaps=False)
+        skus = load_battery_catalog(str(CATALOG)).active
+        kwargs: dict = dict(skus=skus, top_n=5, candidate_caps=6, variations_per_cap=3)
+        cfg = replace(OptimizationConfig(), demand_interval_minutes=15)
+        from_fine = optimize_site(fine.df, fine.interval_hours, cfg=cfg, **kwargs)
+        from_coarse = optimize_site(coarse.df, coarse.interval_hours, cfg=cfg, **kwargs)
+        self.assertEqual(_ranking(from_fine.results), _ranking(from_coarse.results))
+
+        n = len(fine.df)
+        for a, b in zip(from_fine.results, from_coarse.results):
+            self.assertEqual((len(a.charge_kw_series), len(a.discharge_kw_series), len(a.net_kw_series)), (n, n, n))
+            self.assertEqual(len(a.soc_kwh_series), n + 1)
+            np.testing.assert_array_equal(a.charge_kw_series, np.repeat(b.charge_kw_series, 15))
+            np.testing.assert_array_equal(a.discharge_kw_series, np.repeat(b.discharge_kw_series, 15))
+            np.testing.assert_allclose(
+                a.net_kw_series,
+                fine.df["load_kw"].to_numpy() + np.array(a.charge_kw_series) - np.array(a.discharge_kw_series),
+            )
+            np.testing.assert_allclose(a.soc_kwh_series[::15], b.soc_kwh_series, atol=1e-9)
+
+
+class TestSteeredSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        norm = normalize_intervals(_intervals(7), timezone="UTC", fill_gaps=False)
+        cls.df, cls.h = norm.df, norm.interval_hours
+        # One RTE across the catalog: the marginal-value planes are then strict bounds
+        cls.skus = [s for s in load_battery_catalog(str(CATALOG)).active if s.round_trip_efficiency == 0.9]
+
+    def test_single_rte_equals_exhaustive(self) -> None:
+        kwargs: dict = dict(skus=self.skus, candidate_caps=6, variations_per_cap=3)
+        for top_n in (1, 5):
+            with self.subTest(top_n=top_n):
+                cfg = replace(OptimizationConfig(), steered_search=True)
+                steered = optimize_site(self.df, self.h, cfg=cfg, top_n=top_n, **kwargs)
+                full = optimize_site(self.df, self.h, top_n=top_n, prune=False, **kwargs)
+                self.assertEqual(len(full.results), top_n)
+                self.assertEqual(_ranking(steered.results), _ranking(full.results))
+                self.assertLess(steered.stats.dispatch_solved, full.stats.dispatch_solved)
+                for a, b in zip(steered.results, full.results):
+                    self.assertEqual(a.net_kw_series, b.net_kw_series)
+
+    def test_annualized_marginal_values(self) -> None:
+        # $/kW-yr and $/kWh-yr are the finite differences of annual savings
+        scenarios = scenarios_for_rate("B-19")
+        ctx = build_site_context(self.df, self.h, scenarios, OptimizationConfig())
+        d = 1e-3
+        for P, E in ((40.0, 400.0), (50.0, 100.0)):
+            bundle = Bundle(
+                sku_qty={"x": 1}, total_power_kw=P, total_energy_kwh=E, capex_usd=1.0, round_trip_efficiency=0.9
+            )
+            with self.subTest(P=P, E=E):
+                s = evaluate_dispatch(ctx, 0, bundle, scenarios[0], marginal_values=True, series=False)
+                for mv, dP, dE in ((s.marginal_usd_per_kw_year, d, 0.0), (s.marginal_usd_per_kwh_year, 0.0, d)):
+                    moved = replace(bundle, total_power_kw=P + dP, total_energy_kwh=E + dE)
+                    up = evaluate_dispatch(ctx, 0, moved, scenarios[0], series=False).savings_usd_per_year
+                    self.assertAlmostEqual(mv, (up - s.savings_usd_per_year) / d, delta=1e-3 * max(1.0, mv))
+
+
+if __name__ == "__main__":
+    unittest.main()
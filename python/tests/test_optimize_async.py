@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import math
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+PYTHON_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PYTHON_DIR))
+
+from everwatt_battery_engine.optimize import aiter_battery_optimization  # noqa: E402
+from everwatt_battery_engine.types import Interval  # noqa: E402
+
+
+def _intervals(days: int) -> list[Interval]:
+    start = dt.datetime(2025, 7, 1, tzinfo=dt.timezone.utc)
+    out: list[Interval] = []
+    for i in range(days * 96):
+        t = start + dt.timedelta(minutes=15 * i)
+        hour = t.hour + t.minute / 60.0
+        kw = 120.0 + 10.0 * math.sin(2 * math.pi * hour / 24.0) + (90.0 + 7.0 * (i % 5) if 16 <= hour < 21 else 0.0)
+        out.append(Interval(timestamp=t.isoformat(), kw=kw))
+    return out
+
+
+class TestAiterCancellation(unittest.TestCase):
+    def test_cancelling_consumer_mid_run_stops_the_generator(self) -> None:
+        catalog = PYTHON_DIR.parent / "data" / "battery-catalog.csv"
+        seen: list[int] = []
+
+        async def consume() -> None:
+            async for _event in aiter_battery_optimization(
+                intervals=_intervals(7), battery_catalog_csv=str(catalog), workers=2
+            ):
+                seen.append(1)
+
+        async def main() -> float:
+            task = asyncio.create_task(consume())
+            while not seen:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            started = time.perf_counter()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+            return time.perf_counter() - started
+
+        threads_before = threading.active_count()
+        elapsed = asyncio.run(main())
+        self.assertGreater(len(seen), 0)
+        # Cleanup waits for at most the step in flight, not the rest of the run
+        self.assertLess(elapsed, 30.0)
+        # The generator's thread is gone once cancellation has been handled
+        deadline = time.time() + 5.0
+        while threading.active_count() > threads_before and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertLessEqual(threading.active_count(), threads_before)
+
+
+if __name__ == "__main__":
+    unittest.main()
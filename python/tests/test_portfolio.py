@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import datetime as dt
+import json
+import math
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+PYTHON_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PYTHON_DIR))
+
+from everwatt_battery_engine.intervals import KW_PARSE_WARNING  # noqa: E402
+from everwatt_battery_engine.portfolio import (  # noqa: E402
+    PortfolioSite,
+    discover_sites,
+    load_manifest,
+    optimize_portfolio,
+)
+
+CATALOG = PYTHON_DIR.parent / "data" / "battery-catalog.csv"
+
+
+def _write_site(path: Path, days: int, blank_every: int = 0) -> None:
+    start = dt.datetime(2025, 7, 1, tzinfo=dt.timezone.utc)
+    rows = []
+    for i in range(days * 96):
+        t = start + dt.timedelta(minutes=15 * i)
+        hour = t.hour + t.minute / 60.0
+        kw = 120.0 + 10.0 * math.sin(2 * math.pi * hour / 24.0) + (90.0 + 7.0 * (i % 5) if 16 <= hour < 21 else 0.0)
+        rows.append({"timestamp": t.isoformat(), "kw": "" if blank_every and i % blank_every == 0 else kw})
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+class TestDiscoverSites(unittest.TestCase):
+    def test_one_site_per_interval_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            d = Path(tmp)
+            for name in ("b.csv", "a.JSON", "notes.txt", "c.json"):
+                (d / name).write_text("", encoding="utf-8")
+            (d / "sub.csv").mkdir()
+            sites = discover_sites(str(d), tariff_rate_code="B-19")
+            self.assertEqual([s.site_id for s in sites], ["a", "b", "c"])
+            self.assertEqual(sites[1].intervals_path, str(d / "b.csv"))
+            self.assertTrue(all(s.tariff_rate_code == "B-19" for s in sites))
+
+
+class TestLoadManifest(unittest.TestCase):
+    def test_csv_and_json_manifests(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            d = Path(tmp)
+            (d / "m.csv").write_text(
+                "site_id,intervals_path,tariff_rate_code\ns1,data/s1.csv,\ns2,/abs/s2.json,B-19S\n", encoding="utf-8"
+            )
+            rows = [
+                {"siteId": "s1", "intervalsPath": "data/s1.csv"},
+                {"siteId": "s2", "intervalsPath": "/abs/s2.json", "tariffRateCode": "B-19S"},
+            ]
+            (d / "m.json").write_text(json.dumps({"sites": rows}), encoding="utf-8")
+            want = [
+                PortfolioSite(site_id="s1", intervals_path=str(d / "data" / "s1.csv"), tariff_rate_code="B-10"),
+                PortfolioSite(site_id="s2", intervals_path="/abs/s2.json", tariff_rate_code="B-19S"),
+            ]
+            for name in ("m.csv", "m.json"):
+                with self.subTest(manifest=name):
+                    self.assertEqual(load_manifest(str(d / name), default_tariff_rate_code="B-10"), want)
+
+    def test_rows_need_a_site_id_and_path(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "m.json"
+            path.write_text(json.dumps([{"siteId": "s1"}]), encoding="utf-8")
+            with self.assertRaises(ValueError):
+                load_manifest(str(path))
+
+
+class TestPortfolioErrorRecords(unittest.TestCase):
+    def test_failing_sites_become_error_records(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            d = Path(tmp)
+            _write_site(d / "good.csv", 2, blank_every=97)
+            (d / "blank.csv").write_text("timestamp,kw\n2025-07-01T00:00:00Z,\n", encoding="utf-8")
+            (d / "nokw.csv").write_text("timestamp,load\n2025-07-01T00:00:00Z,1\n", encoding="utf-8")
+            sites = discover_sites(str(d)) + [PortfolioSite(site_id="missing", intervals_path=str(d / "missing.csv"))]
+            records = []
+            summary = optimize_portfolio(
+                sites,
+                battery_catalog_csv=str(CATALOG),
+                output_path=str(d / "out" / "results.jsonl"),
+                top_n=2,
+                candidate_caps=2,
+                variations_per_cap=1,
+                on_record=records.append,
+            )
+            self.assertEqual((summary.sites_total, summary.sites_ok, summary.sites_failed), (4, 1, 3))
+            written = [json.loads(line) for line in (d / "out" / "results.jsonl").read_text().splitlines()]
+            self.assertEqual(written, json.loads(json.dumps(records)))
+            by_id = {r["siteId"]: r for r in written}
+
+            good = by_id["good"]
+            self.assertEqual(good["status"], "ok")
+            self.assertIn(KW_PARSE_WARNING, good["warnings"])
+            self.assertTrue(good["results"])
+            for site_id, error in (
+                ("blank", "ValueError: no parseable intervals"),
+                ("nokw", "ValueError:"),
+                ("missing", "FileNotFoundError:"),
+            ):
+                with self.subTest(site=site_id):
+                    record = by_id[site_id]
+                    self.assertEqual(record["status"], "error")
+                    self.assertTrue(record["error"].startswith(error), record["error"])
+                    self.assertIn("Traceback", record["traceback"])
+                    (site,) = [s for s in sites if s.site_id == site_id]
+                    self.assertEqual(record["intervalsPath"], site.intervals_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import sys
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from everwatt_battery_engine.pricing import close_probability_model, make_offers, make_offers_batch  # noqa: E402
+from everwatt_battery_engine.types import OptimizationConfig, OptimizationMode  # noqa: E402
+
+GOLDEN = replace(OptimizationConfig(), engine_price_golden_section=True)
+
+
+def _cases() -> list:
+    rng = np.random.default_rng(7)
+    cases = []
+    for _ in range(40):
+        cfg = replace(
+            GOLDEN,
+            payback_ceiling_years=float(rng.uniform(4.0, 15.0)),
+            close_prob_mid_payback_years=float(rng.uniform(2.0, 12.0)),
+            close_prob_steepness=float(rng.uniform(0.3, 4.0)),
+        )
+        cases.append((float(rng.uniform(2e4, 4e5)), float(rng.uniform(2e3, 8e4)), int(rng.integers(1, 30)), cfg))
+    # Expected TSV still rising at the payback ceiling: the optimum is the ceiling itself
+    cases.append((1e5, 2e4, 1, replace(GOLDEN, payback_ceiling_years=6.0, close_prob_mid_payback_years=40.0)))
+    return cases
+
+
+def _dense_grid_best(C: float, S: float, units: int, cfg: OptimizationConfig, n: int = 10_001) -> float:
+    best = 0.0
+    for x in np.linspace(C, cfg.payback_ceiling_years * S, n).tolist():
+        best = max(best, close_probability_model(x / S, units, cfg) * S * (1.0 - C / x))
+    return best
+
+
+def _engine(offers: list):
+    (engine,) = [o for o in offers if o.mode == OptimizationMode.EVERWATT_ENGINE]
+    return engine
+
+
+class TestGoldenSection(unittest.TestCase):
+    def test_beats_a_dense_grid(self) -> None:
+        checked = 0
+        for C, S, units, cfg in _cases():
+            offers = make_offers(capex_usd=C, savings_usd_per_year=S, sku_unit_count=units, cfg=cfg)
+            if not offers:
+                continue
+            checked += 1
+            grid_best = _dense_grid_best(C, S, units, cfg)
+            (batch,) = make_offers_batch(capex_usd=[C], savings_usd_per_year=[S], sku_unit_count=[units], cfg=cfg)
+            for engine in (_engine(offers), _engine(batch)):
+                with self.subTest(C=C, S=S, units=units):
+                    self.assertGreaterEqual(engine.expected_tsv, grid_best * (1.0 - 1e-12))
+                    self.assertLessEqual(engine.price_usd, cfg.payback_ceiling_years * S)
+                    self.assertGreaterEqual(engine.price_usd, C)
+        self.assertGreater(checked, 20)
+
+    def test_scalar_and_batch_agree(self) -> None:
+        cases = _cases()
+        batch = make_offers_batch(
+            capex_usd=[c[0] for c in cases],
+            savings_usd_per_year=[c[1] for c in cases],
+            sku_unit_count=[c[2] for c in cases],
+            cfg=GOLDEN,
+        )
+        for (C, S, units, _cfg), row in zip(cases, batch):
+            single = make_offers(capex_usd=C, savings_usd_per_year=S, sku_unit_count=units, cfg=GOLDEN)
+            self.assertEqual([o.mode for o in single], [o.mode for o in row])
+            for a, b in zip(single, row):
+                self.assertAlmostEqual(a.price_usd, b.price_usd, delta=1e-6 * max(1.0, abs(b.price_usd)))
+                if b.expected_tsv is not None:
+                    self.assertAlmostEqual(a.expected_tsv, b.expected_tsv, delta=1e-9 * max(1.0, b.expected_tsv))
+
+
+if __name__ == "__main__":
+    unittest.main()
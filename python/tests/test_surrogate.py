@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import datetime as dt
+import math
+import sys
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+import numpy as np
+
+PYTHON_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PYTHON_DIR))
+
+from everwatt_battery_engine.battery_catalog import load_battery_catalog  # noqa: E402
+from everwatt_battery_engine.intervals import normalize_intervals  # noqa: E402
+from everwatt_battery_engine.optimize import optimize_site  # noqa: E402
+from everwatt_battery_engine.surrogate import fit_savings_surface, select_design, unit_box  # noqa: E402
+from everwatt_battery_engine.types import Interval, OptimizationConfig  # noqa: E402
+
+CATALOG = PYTHON_DIR.parent / "data" / "battery-catalog.csv"
+
+
+def _intervals(days: int) -> list[Interval]:
+    start = dt.datetime(2025, 7, 1, tzinfo=dt.timezone.utc)
+    out: list[Interval] = []
+    for i in range(days * 96):
+        t = start + dt.timedelta(minutes=15 * i)
+        hour = t.hour + t.minute / 60.0
+        kw = 120.0 + 10.0 * math.sin(2 * math.pi * hour / 24.0) + (90.0 + 7.0 * (i % 5) if 16 <= hour < 21 else 0.0)
+        out.append(Interval(timestamp=t.isoformat(), kw=kw))
+    return out
+
+
+def _candidates(n: int, *, rtes: tuple = (0.85, 0.9, 0.95), seed: int = 2) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    P = rng.uniform(50.0, 1000.0, n)
+    return np.column_stack([P, P * rng.uniform(1.0, 4.0, n), rng.choice(rtes, n)])
+
+
+class TestSavingsSurface(unittest.TestCase):
+    def test_interpolates_design_points(self) -> None:
+        # The catalog's own shape: several RTEs, then a single RTE (a constant, collinear dimension)
+        for rtes in ((0.85, 0.9, 0.95), (0.9,)):
+            with self.subTest(rtes=rtes):
+                X = _candidates(200, rtes=rtes)
+                y = 40.0 * X[:, 0] + 3.0 * np.sqrt(X[:, 1]) * X[:, 2] - 0.01 * X[:, 0] ** 1.5
+                design = select_design(X, 24)
+                lo, scale = unit_box(X)
+                surface = fit_savings_surface(X[design], y[design], lo=lo, scale=scale)
+                np.testing.assert_allclose(surface.predict(X[design]), y[design], rtol=1e-8, atol=1e-6)
+                rest = np.setdiff1d(np.arange(len(X)), design)
+                self.assertTrue(np.all(np.isfinite(surface.predict(X[rest]))))
+
+
+class TestSelectDesign(unittest.TestCase):
+    def test_distinct_indices_with_extremes(self) -> None:
+        X = _candidates(300)
+        for n_points in (1, 4, 6, 20, 60):
+            with self.subTest(n_points=n_points):
+                design = select_design(X, n_points)
+                self.assertEqual(len(design), n_points)
+                self.assertEqual(len(set(design)), n_points)
+                self.assertTrue(all(0 <= k < len(X) for k in design))
+                self.assertEqual(design, select_design(X, n_points))
+                if n_points >= 6:
+                    for d in range(X.shape[1]):
+                        self.assertIn(X[:, d].min(), X[design, d])
+                        self.assertIn(X[:, d].max(), X[design, d])
+
+    def test_small_and_duplicate_sets(self) -> None:
+        X = _candidates(5)
+        self.assertEqual(select_design(X, 8), [0, 1, 2, 3, 4])
+        self.assertEqual(select_design(X, 0), [])
+        self.assertEqual(select_design(X[:0], 3), [])
+        # Only two distinct points: duplicates are never picked twice
+        dup = np.repeat(X[:2], 10, axis=0)
+        design = select_design(dup, 6)
+        self.assertEqual(len(design), 2)
+        self.assertEqual({tuple(x) for x in dup[design]}, {tuple(X[0]), tuple(X[1])})
+
+
+class TestSurrogateSizing(unittest.TestCase):
+    def test_top_n_is_lp_confirmed(self) -> None:
+        norm = normalize_intervals(_intervals(7), timezone="UTC", fill_gaps=False)
+        skus = load_battery_catalog(str(CATALOG)).active
+        kwargs: dict = dict(skus=skus, candidate_caps=6, variations_per_cap=3)
+        cfg = replace(OptimizationConfig(), surrogate_design_points=6, surrogate_shortlist_factor=1.5)
+        surrogate = optimize_site(norm.df, norm.interval_hours, cfg=cfg, top_n=5, **kwargs)
+        # Every task solved and ranked: the reference LP savings and offers
+        full = optimize_site(norm.df, norm.interval_hours, top_n=10_000, prune=False, **kwargs)
+
+        self.assertLess(surrogate.stats.dispatch_solved, full.stats.dispatch_solved)
+        self.assertIsNotNone(surrogate.stats.surrogate_savings_error_frac)
+        self.assertEqual(len(surrogate.results), 5)
+
+        def key(r) -> tuple:
+            return r.scenario.id, tuple(sorted(r.bundle.sku_qty.items()))
+
+        reference = {key(r): (k, r) for k, r in enumerate(full.results)}
+        positions = []
+        for r in surrogate.results:
+            with self.subTest(result=key(r)):
+                self.assertIn(key(r), reference)
+                k, lp = reference[key(r)]
+                positions.append(k)
+                self.assertEqual(r.savings_usd_per_year, lp.savings_usd_per_year)
+                self.assertEqual([(o.mode, o.price_usd) for o in r.offers], [(o.mode, o.price_usd) for o in lp.offers])
+                self.assertEqual(r.net_kw_series, lp.net_kw_series)
+        # Ranked as the exhaustive run ranks the same results
+        self.assertEqual(positions, sorted(positions))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import datetime as dt
+import math
+import sys
+import unittest
+from dataclasses import replace
+from pathlib import Path
+
+PYTHON_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PYTHON_DIR))
+
+from everwatt_battery_engine.optimize import optimize_battery_solutions  # noqa: E402
+from everwatt_battery_engine.sweep import _sku_qty_key, config_grid, sweep_battery_offers  # noqa: E402
+from everwatt_battery_engine.types import Interval, OptimizationConfig  # noqa: E402
+
+CATALOG = PYTHON_DIR.parent / "data" / "battery-catalog.csv"
+
+
+def _intervals(days: int) -> list[Interval]:
+    start = dt.datetime(2025, 7, 1, tzinfo=dt.timezone.utc)
+    out: list[Interval] = []
+    for i in range(days * 96):
+        t = start + dt.timedelta(minutes=15 * i)
+        hour = t.hour + t.minute / 60.0
+        kw = 120.0 + 10.0 * math.sin(2 * math.pi * hour / 24.0) + (90.0 + 7.0 * (i % 5) if 16 <= hour < 21 else 0.0)
+        out.append(Interval(timestamp=t.isoformat(), kw=kw))
+    return out
+
+
+class TestSweep(unittest.TestCase):
+    def test_variant_ranking_equals_optimizer(self) -> None:
+        intervals = _intervals(4)
+        variants = config_grid(payback_ceiling_years=[6.0, 10.0], install_adder_frac=[0.3])
+        variants.append(replace(OptimizationConfig(), engine_price_golden_section=True, close_prob_steepness=2.5))
+        kwargs = dict(top_n=5, candidate_caps=6, variations_per_cap=3)
+        sweep = sweep_battery_offers(
+            intervals=intervals, battery_catalog_csv=str(CATALOG), variants=variants, **kwargs
+        )
+        for k, cfg in enumerate(variants):
+            with self.subTest(variant=k):
+                results = optimize_battery_solutions(
+                    intervals=intervals, battery_catalog_csv=str(CATALOG), cfg=cfg, **kwargs
+                )
+                rows = sweep[sweep["variant"] == k]
+                self.assertEqual(sorted(set(rows["rank"])), list(range(1, len(results) + 1)))
+                self.assertGreater(len(results), 0)
+                for rank, r in enumerate(results, start=1):
+                    got = rows[rows["rank"] == rank]
+                    self.assertEqual(set(got["scenario_id"]), {r.scenario.id})
+                    self.assertEqual(set(got["sku_qty"]), {_sku_qty_key(r.bundle.sku_qty)})
+                    self.assertAlmostEqual(got["savings_usd_per_year"].iloc[0], r.savings_usd_per_year, places=6)
+                    self.assertEqual(list(got["mode"]), [o.mode.value for o in r.offers])
+                    for (_i, row), offer in zip(got.iterrows(), r.offers):
+                        self.assertAlmostEqual(row["price_usd"], offer.price_usd, delta=1e-6 * offer.price_usd)
+
+    def test_config_grid(self) -> None:
+        grid = config_grid(payback_ceiling_years=[6.0, 8.0], install_adder_frac=[0.0, 0.15, 0.3])
+        self.assertEqual(
+            [(c.payback_ceiling_years, c.install_adder_frac) for c in grid],
+            [(p, a) for p in (6.0, 8.0) for a in (0.0, 0.15, 0.3)],
+        )
+        self.assertTrue(all(c.no_export == OptimizationConfig().no_export for c in grid))
+
+    def test_config_grid_rejects_dispatch_fields(self) -> None:
+        for axes in ({"no_export": [True, False]}, {"interconnect_kw": [None, 50.0]}, {"bogus": [1]}):
+            with self.subTest(axes=list(axes)):
+                with self.assertRaises(ValueError):
+                    config_grid(payback_ceiling_years=[6.0], **axes)
+
+    def test_sweep_rejects_dispatch_changes(self) -> None:
+        variants = [OptimizationConfig(), replace(OptimizationConfig(), no_export=False)]
+        with self.assertRaisesRegex(ValueError, "no_export"):
+            sweep_battery_offers(intervals=_intervals(1), battery_catalog_csv=str(CATALOG), variants=variants)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import datetime as dt
+import math
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+PYTHON_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PYTHON_DIR))
+
+from everwatt_battery_engine.battery_catalog import load_battery_catalog  # noqa: E402
+from everwatt_battery_engine.evaluation import build_site_context, scenarios_for_rate  # noqa: E402
+from everwatt_battery_engine.intervals import normalize_intervals  # noqa: E402
+from everwatt_battery_engine.optimize import optimize_site  # noqa: E402
+from everwatt_battery_engine.types import Interval, OptimizationConfig  # noqa: E402
+from everwatt_battery_engine.uncertainty import (  # noqa: E402
+    SAVINGS_PERIODS,
+    PeriodSavings,
+    bootstrap_annual_savings,
+    escalated_payback_years,
+    offer_uncertainty,
+    period_savings,
+)
+
+CATALOG = PYTHON_DIR.parent / "data" / "battery-catalog.csv"
+
+
+def _intervals(days: int) -> list[Interval]:
+    # Starts late in July so the data spans two billing months
+    start = dt.datetime(2025, 7, 26, tzinfo=dt.timezone.utc)
+    out: list[Interval] = []
+    for i in range(days * 96):
+        t = start + dt.timedelta(minutes=15 * i)
+        hour = t.hour + t.minute / 60.0
+        kw = 120.0 + 10.0 * math.sin(2 * math.pi * hour / 24.0) + (90.0 + 7.0 * (i % 5) if 16 <= hour < 21 else 0.0)
+        out.append(Interval(timestamp=t.isoformat(), kw=kw * (1.0 + 0.1 * ((i // 96) % 3))))
+    return out
+
+
+class TestPeriodSavings(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        norm = normalize_intervals(_intervals(12), timezone="UTC", fill_gaps=False)
+        cls.df, cls.h = norm.df, norm.interval_hours
+        cls.cfg = OptimizationConfig()
+        cls.results = optimize_site(
+            cls.df, cls.h, skus=load_battery_catalog(str(CATALOG)).active, cfg=cls.cfg, top_n=4, candidate_caps=6,
+            variations_per_cap=3,
+        ).results
+        cls.ctx = build_site_context(cls.df, cls.h, scenarios_for_rate("B-19"), cls.cfg)
+
+    def test_periods_sum_to_annual_savings(self) -> None:
+        self.assertEqual(len(self.results), 4)
+        for period in SAVINGS_PERIODS:
+            for r in self.results:
+                with self.subTest(period=period, scenario=r.scenario.id, sku_qty=r.bundle.sku_qty):
+                    ps = period_savings(
+                        self.ctx.dispatch_intervals,
+                        np.asarray(r.net_kw_series),
+                        self.ctx.rate_plans[r.scenario.kind],
+                        interval_hours=self.h,
+                        period=period,
+                    )
+                    self.assertEqual(len(ps.period_keys), 2 if period == "month" else 12)
+                    self.assertEqual(float(ps.days.sum()), 12.0)
+                    annual = float(ps.savings_usd.sum()) * self.ctx.annualization_factor
+                    tol = 1e-8 * max(1.0, r.savings_usd_per_year)
+                    self.assertAlmostEqual(annual, r.savings_usd_per_year, delta=tol)
+
+    def test_offer_uncertainty_is_seeded(self) -> None:
+        kwargs: dict = dict(period="day", draws=500, escalation_mean=0.02, escalation_sd=0.03)
+        a = offer_uncertainty(self.results, self.df, self.h, self.cfg, seed=5, **kwargs)
+        b = offer_uncertainty(self.results, self.df, self.h, self.cfg, seed=5, **kwargs)
+        c = offer_uncertainty(self.results, self.df, self.h, self.cfg, seed=6, **kwargs)
+        np.testing.assert_array_equal(a.savings_usd_per_year, b.savings_usd_per_year)
+        self.assertFalse(np.array_equal(a.savings_usd_per_year, c.savings_usd_per_year))
+        for mode, offer in a.offers.items():
+            np.testing.assert_array_equal(offer.payback_years, b.offers[mode].payback_years)
+            np.testing.assert_array_equal(offer.expected_tsv, b.offers[mode].expected_tsv)
+
+
+class TestBootstrap(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = np.random.default_rng(1)
+        self.ps = PeriodSavings(
+            period="day",
+            period_keys=[f"d{k}" for k in range(30)],
+            days=np.ones(30),
+            savings_usd=rng.uniform(0.0, 100.0, (3, 30)),
+        )
+
+    def test_same_seed_same_draws(self) -> None:
+        a = bootstrap_annual_savings(self.ps, draws=1000, seed=3)
+        self.assertEqual(a.shape, (3, 1000))
+        np.testing.assert_array_equal(a, bootstrap_annual_savings(self.ps, draws=1000, seed=3))
+        self.assertFalse(np.array_equal(a, bootstrap_annual_savings(self.ps, draws=1000, seed=4)))
+        # The draws centre on the annualized mean
+        np.testing.assert_allclose(a.mean(axis=1), self.ps.savings_usd.mean(axis=1) * 365.0, rtol=0.02)
+
+    def test_constant_periods_have_no_spread(self) -> None:
+        months = PeriodSavings(
+            period="month", period_keys=["a", "b", "c"], days=np.array([31.0, 30.0, 31.0]),
+            savings_usd=np.array([[31.0, 30.0, 31.0]]),
+        )
+        np.testing.assert_allclose(bootstrap_annual_savings(months, draws=200), 365.0, rtol=1e-12)
+
+    def test_rejects_empty(self) -> None:
+        empty = PeriodSavings(period="day", period_keys=[], days=np.ones(0), savings_usd=np.zeros((1, 0)))
+        with self.assertRaises(ValueError):
+            bootstrap_annual_savings(empty, draws=10)
+        with self.assertRaises(ValueError):
+            bootstrap_annual_savings(self.ps, draws=0)
+
+
+class TestEscalatedPayback(unittest.TestCase):
+    def test_zero_escalation_is_simple_payback(self) -> None:
+        P = np.array([1e5, 2.5e5, 40.0])
+        S = np.array([2e4, 1.1e4, 3.0])
+        np.testing.assert_array_equal(escalated_payback_years(P, S, 0.0), P / S)
+        np.testing.assert_allclose(escalated_payback_years(P, S, 1e-9), P / S, rtol=1e-6)
+
+    def test_escalated_savings_add_up_to_the_price(self) -> None:
+        P, S = 1e5, 1.5e4
+        for g in (-0.05, 0.02, 0.1):
+            with self.subTest(g=g):
+                y = float(escalated_payback_years(P, S, g))
+                self.assertAlmostEqual(S * ((1.0 + g) ** y - 1.0) / g, P, delta=1e-6 * P)
+                # Growing savings pay back sooner, shrinking ones later
+                self.assertEqual(y < P / S, g > 0)
+
+    def test_never_paid_back_is_inf(self) -> None:
+        # No savings, negative savings, and savings shrinking too fast to ever reach the price
+        years = escalated_payback_years(1e5, np.array([0.0, -10.0, 1e3]), np.array([0.0, 0.0, -0.5]))
+        self.assertTrue(np.all(np.isinf(years)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,4 @@
-import { spawn } from 'child_process';
+import { spawn, type ChildProcessWithoutNullStreams } from 'child_process';
 import path from 'path';
 import type { LoadInterval } from './types';
 import { pgeDrPrograms } from '../../data/dr-programs/pge';
@@ -97,16 +97,112 @@ function computeMoney(params: {
   };
 }
 
-async function runPythonDeliverables(params: {
-  intervals: Array<{ ts: string; kw: number; temp?: number }>;
+type DrDeliverablesPayload = {
+  /** Columnar intervals; ts are ISO strings or epoch milliseconds (parsed far faster in Python) */
+  intervals: { ts: Array<string | number>; kw: number[]; temp?: Array<number | null> };
   battery: { power_kw: number; energy_kwh: number; round_trip_efficiency: number };
   window: { startHour: number; endHour: number; weekdaysOnly: boolean; months?: number[] };
   options: { topHotDaysN: number; noExport: boolean; soc0Frac: number };
-}): Promise<DrDeliverables> {
-  const script = path.join(process.cwd(), 'python', 'run_dr_deliverable.py');
-  const payload = JSON.stringify(params);
+};
+
+type PendingDrRequest = { resolve: (result: unknown) => void; reject: (err: Error) => void };
+
+/**
+ * One long-lived `run_dr_deliverable.py --serve` process shared by all DR panel requests, so
+ * each request pays only its compute time (not interpreter start + pandas/NumPy imports).
+ * Requests and responses are JSON lines matched by id. If the process exits, pending requests
+ * fail and the next request starts a fresh one.
+ */
+class DrPythonServer {
+  private child: ChildProcessWithoutNullStreams | null = null;
+  private pending = new Map<number, PendingDrRequest>();
+  private nextId = 1;
+  private buffer = '';
+  private stderr = '';
+
+  request(op: 'deliverables' | 'health', payload?: DrDeliverablesPayload): Promise<unknown> {
+    const child = this.ensureChild();
+    const id = this.nextId++;
+    return new Promise((resolve, reject) => {
+      this.pending.set(id, { resolve, reject });
+      this.setRef(true);
+      child.stdin.write(JSON.stringify({ id, op, payload }) + '\n', (err) => {
+        if (!err) return;
+        // e.g. EPIPE when the process died between requests: retire it so the next request
+        // starts a fresh one, and fail this request even if that child was already retired
+        this.onExit(child, err);
+        if (this.pending.delete(id)) {
+          if (this.pending.size === 0) this.setRef(false);
+          reject(err);
+        }
+      });
+    });
+  }
+
+  private ensureChild(): ChildProcessWithoutNullStreams {
+    if (this.child) return this.child;
+    const script = path.join(process.cwd(), 'python', 'run_dr_deliverable.py');
+    const workers = String(process.env.EVERWATT_DR_PYTHON_WORKERS || '1');
+    const child = spawn('python', [script, '--serve', '--workers', workers], { stdio: ['pipe', 'pipe', 'pipe'] });
+    this.child = child;
+    this.buffer = '';
+    this.stderr = '';
+    child.stdout.on('data', (d) => this.onData(d.toString()));
+    child.stderr.on('data', (d) => (this.stderr = (this.stderr + d.toString()).slice(-4000)));
+    child.on('error', (err) => this.onExit(child, err));
+    // Without a listener a failed write (EPIPE, destroyed stream) would crash the Node process
+    child.stdin.on('error', (err) => this.onExit(child, err));
+    child.on('close', (code) => this.onExit(child, new Error(`DR deliverable python failed (code=${code}). ${this.stderr}`.trim())));
+    // An idle server must not keep the Node process alive
+    this.setRef(false);
+    return child;
+  }
+
+  private onData(chunk: string): void {
+    this.buffer += chunk;
+    let nl: number;
+    while ((nl = this.buffer.indexOf('\n')) >= 0) {
+      const line = this.buffer.slice(0, nl).trim();
+      this.buffer = this.buffer.slice(nl + 1);
+      if (!line) continue;
+      let msg: { id?: number; ok?: boolean; result?: unknown; error?: string };
+      try {
+        msg = JSON.parse(line);
+      } catch {
+        continue;
+      }
+      const waiter = typeof msg.id === 'number' ? this.pending.get(msg.id) : undefined;
+      if (!waiter) continue;
+      this.pending.delete(msg.id as number);
+      if (msg.ok) waiter.resolve(msg.result);
+      else waiter.reject(new Error(`DR deliverable python failed. ${msg.error ?? ''}`.trim()));
+    }
+    if (this.pending.size === 0) this.setRef(false);
+  }
+
+  private onExit(child: ChildProcessWithoutNullStreams, err: Error): void {
+    if (this.child !== child) return;
+    this.child = null;
+    if (child.exitCode === null && child.signalCode === null) child.kill();
+    const waiters = [...this.pending.values()];
+    this.pending.clear();
+    for (const w of waiters) w.reject(err);
+  }
 
-  const out = await new Promise<string>((resolve, reject) => {
+  private setRef(on: boolean): void {
+    // The process handle too: a pending request must still see 'close' if Python exits unanswered
+    const streams = [this.child, this.child?.stdin, this.child?.stdout, this.child?.stderr] as Array<
+      { ref?: () => void; unref?: () => void } | undefined
+    >;
+    for (const s of streams) (on ? s?.ref : s?.unref)?.call(s);
+  }
+}
+
+const drPythonServer = new DrPythonServer();
+
+function runPythonOnce(payload: DrDeliverablesPayload): Promise<unknown> {
+  const script = path.join(process.cwd(), 'python', 'run_dr_deliverable.py');
+  return new Promise<unknown>((resolve, reject) => {
     const child = spawn('python', [script], { stdio: ['pipe', 'pipe', 'pipe'] });
     let stdout = '';
     let stderr = '';
@@ -117,13 +213,29 @@ async function runPythonDeliverables(params: {
       if (code !== 0) {
         return reject(new Error(`DR deliverable python failed (code=${code}). ${stderr}`.trim()));
       }
-      resolve(stdout);
+      try {
+        resolve(JSON.parse(stdout || '{}'));
+      } catch (err) {
+        reject(err);
+      }
     });
-    child.stdin.write(payload);
+    child.stdin.write(JSON.stringify(payload));
     child.stdin.end();
   });
+}
 
-  const parsed = JSON.parse(out || '{}');
+/** Health of the persistent DR python process (starts it if needed). */
+export async function drPythonHealth(): Promise<Record<string, unknown>> {
+  return (await drPythonServer.request('health')) as Record<string, unknown>;
+}
+
+async function runPythonDeliverables(params: DrDeliverablesPayload): Promise<DrDeliverables> {
+  // EVERWATT_DR_PYTHON_SERVER=0 falls back to one process per request
+  const oneShot = String(process.env.EVERWATT_DR_PYTHON_SERVER ?? '').trim() === '0';
+  const parsed = ((oneShot ? await runPythonOnce(params) : await drPythonServer.request('deliverables', params)) ?? {}) as Record<
+    string,
+    any
+  >;
   return {
     deliverableOpsKw: Number(parsed.deliverableOpsKw) || 0,
     deliverableTotalKw: Number(parsed.deliverableTotalKw) || 0,
@@ -150,12 +262,20 @@ export async function computeDrPanel(params: {
     temp: typeof (i as any).temperature === 'number' ? (i as any).temperature : undefined,
   }));
 
+  const hasTemperatureData = intervals.some((i) => typeof i.temp === 'number' && Number.isFinite(i.temp));
+  const allDates = params.loadIntervals.every((i: any) => i.timestamp instanceof Date);
+  const intervalColumns: DrDeliverablesPayload['intervals'] = {
+    ts: allDates ? params.loadIntervals.map((i: any) => (i.timestamp as Date).getTime()) : intervals.map((i) => i.ts),
+    kw: intervals.map((i) => i.kw),
+    ...(hasTemperatureData ? { temp: intervals.map((i) => (typeof i.temp === 'number' ? i.temp : null)) } : {}),
+  };
+
   // Use a default PG&E-ish window (v1): summer weekdays 16-21
   const window = { startHour: 16, endHour: 21, weekdaysOnly: true, months: [6, 7, 8, 9] };
   const windowDurationHours =
     window.endHour >= window.startHour ? window.endHour - window.startHour : 24 - window.startHour + window.endHour;
   const deliverables = await runPythonDeliverables({
-    intervals,
+    intervals: intervalColumns,
     battery: {
       power_kw: params.battery.powerKw,
       energy_kwh: params.battery.energyKwh,
@@ -166,7 +286,6 @@ export async function computeDrPanel(params: {
   });
 
   const batteryDurationHours = params.battery.powerKw > 0 ? params.battery.energyKwh / params.battery.powerKw : 0;
-  const hasTemperatureData = intervals.some((i) => typeof i.temp === 'number' && Number.isFinite(i.temp));
   let hasIntervalGaps = false;
   const tsMs: number[] = intervals
     .map((i) => Date.parse(i.ts))